@@ -0,0 +1,87 @@
+import hashlib
+import json
+from typing import Dict, NamedTuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class LabelArrays(NamedTuple):
+    """
+    Labels of a lab experiment as parallel arrays: scores[i] is the label of ids[i].
+    """
+    ids: np.ndarray
+    scores: np.ndarray
+    available_tokens: int
+
+
+def validate_ids(ids, name: str = "ids") -> np.ndarray:
+    """
+    Validates ids given as a list or a NumPy array of integers or numeric strings and
+    returns them as an int64 array, without a Python loop for int and str arrays.
+    """
+    if not isinstance(ids, (list, np.ndarray)):
+        raise ValueError(f"{name} should be a list")
+    try:
+        array = np.asarray(ids)
+    except ValueError:
+        raise ValueError("Indexes should be a list of integers or numeric strings")
+    if array.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if array.ndim != 1:
+        raise ValueError("Indexes should be a list of integers or numeric strings")
+    try:
+        if array.dtype.kind == "u" and array.max() > np.iinfo(np.int64).max:
+            raise OverflowError
+        if array.dtype.kind in "iub":
+            return array.astype(np.int64, copy=False)
+        if array.dtype.kind == "U" and np.char.isdigit(array).all():
+            return array.astype(np.int64)
+        if array.dtype.kind == "O" and all(
+            isinstance(idx, (int, np.integer)) or (isinstance(idx, str) and idx.isdigit()) for idx in array
+        ):
+            return array.astype(np.int64)
+    except OverflowError:
+        raise ValueError("Indexes should fit in a 64-bit signed integer")
+    raise ValueError("Indexes should be a list of integers or numeric strings")
+
+
+def submission_digest(ids: np.ndarray) -> str:
+    """
+    Order-independent digest of a submission: the sha256 of its sorted int64 ids.
+    Raises ValueError when an id is repeated, which would waste a slot of the submission.
+    """
+    ordered = np.sort(ids.astype("<i8", copy=False))
+    if (ordered[1:] == ordered[:-1]).any():
+        raise ValueError("ids should not contain duplicates")
+    return hashlib.sha256(ordered.tobytes()).hexdigest()
+
+
+def dumps(payload: dict) -> bytes:
+    """
+    JSON body of a request. orjson serializes NumPy arrays natively; the json fallback
+    converts them to lists first.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps({key: value.tolist() if isinstance(value, np.ndarray) else value
+                       for key, value in payload.items()}).encode()
+
+
+def loads(content: bytes):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def labels_to_arrays(labels: Dict[str, float]):
+    """
+    Splits a labels dict of the API into int64 ids and float64 scores.
+    """
+    ids = np.fromstring(",".join(labels), dtype=np.int64, sep=",") if labels else np.empty(0, dtype=np.int64)
+    scores = np.fromiter(labels.values(), dtype=np.float64, count=len(labels))
+    return ids, scores
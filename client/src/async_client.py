@@ -0,0 +1,277 @@
+import asyncio
+import gzip
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import httpx
+import numpy as np
+
+from .arrays import LabelArrays, dumps, labels_to_arrays, loads, validate_ids
+from .client import (
+    APIErrorResponse,
+    LabExperimentResponse,
+    RemainedBudgetResponse,
+    RequestedIDsResponse,
+    SubmitResponse,
+)
+from .configs import Config
+from .scheduler import LabExperimentJob, TokenBucket, rate_limit_cost
+from .transport import DEDUPED_RETRY_STATUSES, RETRY_STATUSES, full_jitter, retry_after
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _error_response(response: httpx.Response) -> APIErrorResponse:
+    try:
+        error_json = response.json()
+    except ValueError:
+        error_json = {}
+    return APIErrorResponse(
+        error=error_json.get('error', 'HTTP Error'),
+        message=error_json.get('message', 'An error occurred'),
+        status_code=response.status_code
+    )
+
+
+class AsyncDOChallengeClient:
+    """
+    Asyncio counterpart of DOChallengeClient, for orchestrators that drive many teams or
+    strategies from one event loop. Calls share one pooled httpx.AsyncClient (HTTP/2 when
+    h2 is installed), at most max_concurrency of them are in flight at once, and they
+    return the same response models as the synchronous client.
+    """
+
+    def __init__(
+        self,
+        secret_key: str,
+        max_concurrency: int = Config.MAX_CONCURRENCY,
+        timeout=Config.TIMEOUT,
+        max_retries: int = Config.MAX_RETRIES,
+        backoff_factor: float = Config.BACKOFF_FACTOR,
+        max_backoff: float = Config.MAX_BACKOFF,
+        http2: bool = Config.HTTP2,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        if not secret_key:
+            raise ValueError("secret_key should not be empty")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency should be at least 1")
+        self.base_url = Config.BASE_URL
+        self.secret_key = secret_key
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        connect_timeout, read_timeout = timeout
+        self.client = client or httpx.AsyncClient(
+            http2=http2 and HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=Config.POOL_SIZE, max_keepalive_connections=Config.POOL_SIZE),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._etag_cache: Dict[str, tuple] = {}
+        self.lab_rate_limiter = TokenBucket(*Config.RATE_LIMIT_LAB_EXPERIMENT)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _send(self, request: httpx.Request, stream: bool = False) -> httpx.Response:
+        """
+        Sends a request with the same retry policy as HTTPTransport. The concurrency slot
+        is released while backing off, and cancelling the calling task aborts the request
+        or the sleep and closes the connection.
+        """
+        retry_statuses = DEDUPED_RETRY_STATUSES if 'Idempotency-Key' in request.headers else RETRY_STATUSES
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await self.client.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+                delay = full_jitter(attempt, self.backoff_factor, self.max_backoff)
+            else:
+                if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                    return response
+                delay = retry_after(response)
+                if delay is None:
+                    delay = full_jitter(attempt, self.backoff_factor, self.max_backoff)
+                else:
+                    delay = min(delay, Config.MAX_RETRY_AFTER)
+                await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _post_request(self, url: str, payload: dict, headers: dict) -> httpx.Request:
+        body = dumps(payload)
+        headers = {**headers, 'Content-Type': 'application/json', 'Idempotency-Key': str(uuid.uuid4())}
+        if len(body) >= Config.COMPRESS_MIN_SIZE:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        return self.client.build_request('POST', url, headers=headers, content=body)
+
+    async def _get(self, url: str, headers: dict) -> httpx.Response:
+        """
+        Conditional GET with the ETag of the last response for this URL, like DOChallengeClient.
+        """
+        cached = self._etag_cache.get(url)
+        if cached:
+            headers = {**headers, 'If-None-Match': cached[0]}
+        response = await self._send(self.client.build_request('GET', url, headers=headers))
+
+        if response.status_code == 304 and cached:
+            return httpx.Response(200, headers=response.headers, content=cached[1], request=response.request)
+        if response.status_code == 200 and response.headers.get('ETag'):
+            self._etag_cache[url] = (response.headers['ETag'], response.content)
+        return response
+
+    async def submit(self, submission_ids: Union[List[int], np.ndarray]) -> Any:
+        """
+        Submits a list of submission IDs to the server.
+        Returns:
+            SubmitResponse: On success.
+            APIErrorResponse: On error.
+        """
+        validated_ids = validate_ids(submission_ids, "ids")
+        if len(validated_ids) != Config.SUBMISSION_LENGTH:
+            raise ValueError(f"ids length should be {Config.SUBMISSION_LENGTH}")
+
+        request = self._post_request(f"{self.base_url}/submit", {'ids': validated_ids},
+                                     {'x-token': self.secret_key})
+        response = await self._send(request)
+        if response.is_error:
+            return _error_response(response)
+        return SubmitResponse(**response.json())
+
+    async def lab_experiment(
+        self,
+        experiment_ids: Union[List[int], np.ndarray],
+        stream: bool = False,
+        on_labels: Optional[Callable[[Dict[str, float]], None]] = None,
+    ) -> Any:
+        """
+        Conducts a lab experiment with the given list of experiment IDs.
+        With stream=True the labels arrive as NDJSON chunks and each chunk is passed
+        to on_labels as soon as it arrives.
+        Returns:
+            LabExperimentResponse: On success.
+            APIErrorResponse: On error.
+        """
+        validated_ids = validate_ids(experiment_ids, "experiment_ids")
+        headers = {'x-token': self.secret_key}
+        if stream:
+            headers['Accept'] = 'application/x-ndjson'
+        request = self._post_request(f"{self.base_url}/lab_experiment", {'ids': validated_ids}, headers)
+        response = await self._send(request, stream=stream)
+
+        try:
+            if response.is_error:
+                await response.aread()
+                return _error_response(response)
+            if not stream:
+                return LabExperimentResponse.model_construct_labels(loads(response.content))
+
+            labels = {}
+            available_tokens = None
+            tokens_spent = None
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                record = loads(line)
+                if 'labels' in record:
+                    labels.update(record['labels'])
+                    if on_labels:
+                        on_labels(record['labels'])
+                if 'available_tokens' in record:
+                    available_tokens = record['available_tokens']
+                    tokens_spent = record.get('tokens_spent')
+        except (httpx.HTTPError, ValueError) as err:
+            return APIErrorResponse(
+                error='Exception',
+                message=f'Other error occurred: {err}'
+            )
+        finally:
+            await response.aclose()
+        if available_tokens is None:
+            return APIErrorResponse(
+                error='Exception',
+                message='Lab experiment stream ended before the trailer record'
+            )
+        return LabExperimentResponse(available_tokens=available_tokens, labels=labels, tokens_spent=tokens_spent)
+
+    async def lab_experiment_array(self, experiment_ids: Union[List[int], np.ndarray]) -> Any:
+        """
+        Like DOChallengeClient.lab_experiment_array.
+        Returns:
+            LabelArrays: Parallel int64 ids and float64 scores, and the available tokens.
+            APIErrorResponse: On error.
+        """
+        response = await self.lab_experiment(experiment_ids)
+        if isinstance(response, APIErrorResponse):
+            return response
+        ids, scores = labels_to_arrays(response.labels)
+        return LabelArrays(ids, scores, response.available_tokens)
+
+    async def lab_experiment_batched(
+        self,
+        experiment_ids: Union[List[int], LabExperimentJob],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Any:
+        """
+        Batched lab experiment like DOChallengeClient.lab_experiment_batched, with the
+        batches sent as concurrent tasks bounded by max_concurrency.
+        """
+        job = experiment_ids if isinstance(experiment_ids, LabExperimentJob) else LabExperimentJob(experiment_ids)
+        failed = asyncio.Event()
+
+        async def run_batch(batch):
+            if failed.is_set():
+                return
+            await asyncio.sleep(self.lab_rate_limiter.reserve(rate_limit_cost(batch)))
+            if failed.is_set():
+                return
+            try:
+                response = await self.lab_experiment(batch)
+            except httpx.HTTPError as err:
+                response = APIErrorResponse(error='Exception', message=f'Other error occurred: {err}')
+            if not job.record(batch, response):
+                failed.set()
+            elif on_progress:
+                on_progress(job.labeled, job.total)
+
+        await asyncio.gather(*[run_batch(batch) for batch in list(job.pending)])
+        return job.result()
+
+    async def remained_budget(self) -> Any:
+        """
+        Fetches the remaining budget from the server.
+        Returns:
+            RemainedBudgetResponse: On success.
+            APIErrorResponse: On error.
+        """
+        response = await self._get(f"{self.base_url}/remained_budget", {'x-token': self.secret_key})
+        if response.is_error:
+            return _error_response(response)
+        return RemainedBudgetResponse(**response.json())
+
+    async def requested_ids(self) -> Any:
+        """
+        Fetches the requested IDs from the server.
+        Returns:
+            RequestedIDsResponse: On success.
+            APIErrorResponse: On error.
+        """
+        response = await self._get(f"{self.base_url}/requested_ids", {'x-token': self.secret_key})
+        if response.is_error:
+            return _error_response(response)
+        return RequestedIDsResponse(**response.json())
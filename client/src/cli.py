@@ -0,0 +1,226 @@
+import argparse
+import contextlib
+import csv
+import heapq
+import os
+import sys
+import time
+from typing import Iterator, List, Optional
+
+from .client import APIErrorResponse, DOChallengeClient
+from .configs import Config
+from .label_cache import LabelCache
+
+SECRET_KEY_ENV = "DO_CHALLENGE_SECRET_KEY"
+
+
+def iter_id_chunks(stream, chunk_size: int) -> Iterator[List[int]]:
+    """
+    Reads ids from a text stream, one per line or in the first column of a CSV, and yields
+    them in lists of chunk_size without reading the whole stream. Lines whose first field
+    is not a number, such as a header, are skipped.
+    """
+    chunk = []
+    for line in stream:
+        field = line.split(",", 1)[0].strip()
+        if not field.isdigit():
+            continue
+        chunk.append(int(field))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def top_scored_ids(stream, count: int, ascending: bool = False) -> List[int]:
+    """
+    The ids of the count best scores in a CSV of id and score columns, highest first
+    (lowest first when ascending). Keeps only count rows in memory; when an id appears
+    more than once, its first row counts.
+    """
+    reader = csv.reader(stream)
+    id_column, score_column = 0, 1
+    heap, in_heap = [], set()
+    for row in reader:
+        if not row:
+            continue
+        if not row[id_column].strip().isdigit():
+            header = [name.strip().lower() for name in row]
+            if "id" in header and "score" in header:
+                id_column, score_column = header.index("id"), header.index("score")
+            continue
+        idx, score = int(row[id_column]), float(row[score_column])
+        if idx in in_heap:
+            continue
+        key = -score if ascending else score
+        if len(heap) < count:
+            heapq.heappush(heap, (key, idx))
+            in_heap.add(idx)
+        elif key > heap[0][0]:
+            _, dropped = heapq.heapreplace(heap, (key, idx))
+            in_heap.discard(dropped)
+            in_heap.add(idx)
+    return [idx for _, idx in sorted(heap, reverse=True)]
+
+
+class LabelWriter:
+    """
+    Appends id and score rows to a CSV file (or stdout for "-") or a Parquet file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        if self.parquet:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow, pip install pyarrow")
+            self.pyarrow = pyarrow
+            self.schema = pyarrow.schema([("id", pyarrow.int64()), ("score", pyarrow.float64())])
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.file = sys.stdout if path == "-" else open(path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["id", "score"])
+
+    def write(self, labels: dict):
+        if self.parquet:
+            table = self.pyarrow.table({"id": [int(idx) for idx in labels], "score": list(labels.values())},
+                                       schema=self.schema)
+            self.writer.write_table(table)
+        else:
+            self.writer.writerows(labels.items())
+
+    def close(self):
+        if self.parquet:
+            self.writer.close()
+        elif self.file is not sys.stdout:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+def _open_input(path: str):
+    return contextlib.nullcontext(sys.stdin) if path == "-" else open(path, newline="")
+
+
+def _fail(response: APIErrorResponse) -> int:
+    print(f"{response.error}: {response.message}", file=sys.stderr)
+    return 1
+
+
+def budget(client: DOChallengeClient, args) -> int:
+    last = None
+    iterations = 0
+    while True:
+        response = client.remained_budget()
+        if isinstance(response, APIErrorResponse):
+            return _fail(response)
+        if response != last:
+            print(f"{time.strftime('%H:%M:%S')} tokens={response.available_tokens} "
+                  f"benchmarks={response.available_benchmarks} scores={response.benchmarks}", flush=True)
+            last = response
+        iterations += 1
+        if not args.watch or (args.iterations and iterations >= args.iterations):
+            return 0
+        time.sleep(args.watch)
+
+
+def labels(client: DOChallengeClient, args) -> int:
+    writer = LabelWriter(args.output)
+    labeled = 0
+    try:
+        with _open_input(args.ids) as stream:
+            for chunk in iter_id_chunks(stream, args.chunk_size):
+                response = client.lab_experiment_batched(chunk, max_workers=args.workers)
+                if isinstance(response, APIErrorResponse):
+                    return _fail(response)
+                writer.write(response.labels)
+                labeled += len(response.labels)
+                print(f"labeled={labeled} tokens={response.available_tokens}", file=sys.stderr, flush=True)
+    finally:
+        writer.close()
+    return 0
+
+
+def submit(client: DOChallengeClient, args) -> int:
+    with _open_input(args.scores) as stream:
+        ids = top_scored_ids(stream, args.top, ascending=args.ascending)
+    if len(ids) != args.top:
+        print(f"The scores file has {len(ids)} distinct ids, {args.top} are needed", file=sys.stderr)
+        return 1
+    if args.dry_run:
+        print(f"Would submit {len(ids)} ids, best first: {ids[:5]}")
+        return 0
+    response = client.submit(ids)
+    if isinstance(response, APIErrorResponse):
+        return _fail(response)
+    print(f"score={response.last_benchmark_score} best={response.best_benchmark_score} "
+          f"benchmarks={response.available_benchmarks}")
+    return 0
+
+
+def sync(client: DOChallengeClient, args) -> int:
+    before = len(client.label_cache.ids(client.secret_key))
+    response = client.reconcile_label_cache()
+    if isinstance(response, APIErrorResponse):
+        return _fail(response)
+    after = len(client.label_cache.ids(client.secret_key))
+    print(f"cached={after} fetched={len(response.labels)} dropped={before + len(response.labels) - after}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src", description="Command-line client of the DO Challenge.")
+    parser.add_argument("--secret-key", default=os.environ.get(SECRET_KEY_ENV),
+                        help=f"Team secret key, ${SECRET_KEY_ENV} by default")
+    parser.add_argument("--base-url", default=Config.BASE_URL)
+    parser.add_argument("--cache", help="SQLite label cache file, see LabelCache")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("budget", help="Show the remaining budget")
+    command.add_argument("--watch", type=float, metavar="SECONDS", help="Poll and print every change")
+    command.add_argument("--iterations", type=int, help="Stop watching after this many polls")
+    command.set_defaults(run=budget)
+
+    command = commands.add_parser("labels", help="Fetch the labels of the ids in a file")
+    command.add_argument("ids", help="File with one id per line or ids in the first CSV column, - for stdin")
+    command.add_argument("--output", "-o", default="-", help="CSV or .parquet file, stdout by default")
+    command.add_argument("--chunk-size", type=int, default=50000, help="Ids read and fetched at a time")
+    command.add_argument("--workers", type=int, default=Config.BATCH_WORKERS, help="Concurrent requests")
+    command.set_defaults(run=labels)
+
+    command = commands.add_parser("submit", help="Submit the top ids of a scores file")
+    command.add_argument("scores", help="CSV with id and score columns, - for stdin")
+    command.add_argument("--top", type=int, default=Config.SUBMISSION_LENGTH)
+    command.add_argument("--ascending", action="store_true", help="Lower scores are better")
+    command.add_argument("--dry-run", action="store_true", help="Show the submission without sending it")
+    command.set_defaults(run=submit)
+
+    command = commands.add_parser("sync", help="Sync the label cache with the requested ids")
+    command.set_defaults(run=sync)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.secret_key:
+        parser.error(f"--secret-key or ${SECRET_KEY_ENV} is required")
+    if args.command == "sync" and not args.cache:
+        parser.error("sync needs --cache")
+
+    label_cache = LabelCache(args.cache) if args.cache else None
+    client = DOChallengeClient(args.secret_key, label_cache=label_cache)
+    client.base_url = args.base_url.rstrip("/")
+    try:
+        return args.run(client, args)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        client.close()
+        if label_cache is not None:
+            label_cache.close()
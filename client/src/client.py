@@ -1,10 +1,18 @@
+import gzip
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import requests
+from .arrays import LabelArrays, dumps, labels_to_arrays, loads, submission_digest, validate_ids
 from .configs import Config
+from .label_cache import LabelCache
+from .scheduler import LabExperimentJob, TokenBucket, rate_limit_cost
+from .telemetry import Hooks, instrumented
+from .transport import HTTPTransport
 
-from typing import List, Any, Optional
-from pydantic import BaseModel
-
-from typing import Any, List, Optional, Dict
+from typing import Any, Callable, List, Optional, Dict, Union
 from pydantic import BaseModel, Field
 
 
@@ -48,6 +56,19 @@ class LabExperimentResponse(BaseModel):
         ...,
         description="A dictionary mapping label names to their corresponding float values."
     )
+    tokens_spent: Optional[int] = Field(
+        None,
+        description="The number of tokens the lab experiment spent, when the server reports it."
+    )
+
+    @classmethod
+    def model_construct_labels(cls, payload: dict) -> "LabExperimentResponse":
+        """
+        Builds the response without validating the labels, which can run into the hundreds of
+        thousands. Only available_tokens, which the server sends as a float, is coerced.
+        """
+        return cls.model_construct(available_tokens=int(payload['available_tokens']), labels=payload['labels'],
+                                   tokens_spent=payload.get('tokens_spent'))
 
 
 class SubmitResponse(BaseModel):
@@ -97,34 +118,88 @@ class APIErrorResponse(BaseModel):
 class DOChallengeClient:
     """DOChallengeClient class to interact with the challenge server."""
 
-    def __init__(self, secret_key: str):
+    def __init__(
+        self,
+        secret_key: str,
+        transport: Optional[HTTPTransport] = None,
+        label_cache: Optional[LabelCache] = None,
+        hooks: Optional[Hooks] = None,
+    ):
         self.base_url = Config.BASE_URL
         if not secret_key:
             raise ValueError("secret_key should not be empty")
         self.secret_key = secret_key
+        self.transport = transport or HTTPTransport()
+        self.label_cache = label_cache
+        self.hooks = hooks
+        self._etag_cache: Dict[str, tuple] = {}
+        # score of every submission benchmarked by this client, by submission_digest
+        self.submissions: Dict[str, float] = {}
+        self._last_submit: Optional[SubmitResponse] = None
+        # share one bucket between the clients of a team to pace them together
+        self.lab_rate_limiter = TokenBucket(*Config.RATE_LIMIT_LAB_EXPERIMENT)
 
-    def submit(self, submission_ids: List[int]) -> Any:
+    def close(self):
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _post(self, url: str, payload: dict, headers: dict, **kwargs) -> requests.Response:
+        """
+        Posts a JSON payload, gzip-compressing bodies above Config.COMPRESS_MIN_SIZE.
+        Compressed responses (gzip, or zstd when zstandard is installed) are
+        negotiated and decoded by requests. Every call gets an Idempotency-Key, so the
+        server dedupes retries and they never spend tokens or benchmarks twice.
+        """
+        body = dumps(payload)
+        headers = {**headers, 'Content-Type': 'application/json', 'Idempotency-Key': str(uuid.uuid4())}
+        if len(body) >= Config.COMPRESS_MIN_SIZE:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        return self.transport.request('POST', url, headers, retry=True, data=body, **kwargs)
+
+    def _get(self, url: str, headers: dict) -> requests.Response:
+        """
+        Sends a conditional GET with the ETag of the last response for this URL.
+        A 304 Not Modified is answered with the cached body as a regular 200 response.
         """
-        Submits a list of submission IDs to the server.
+        cached = self._etag_cache.get(url)
+        if cached:
+            headers = {**headers, 'If-None-Match': cached[0]}
+        response = self.transport.request('GET', url, headers, retry=True)
+
+        if response.status_code == 304 and cached:
+            response.status_code = 200
+            response._content = cached[1]
+        elif response.status_code == 200 and response.headers.get('ETag'):
+            self._etag_cache[url] = (response.headers['ETag'], response.content)
+        return response
+
+    @instrumented
+    def submit(self, submission_ids: Union[List[int], np.ndarray]) -> Any:
+        """
+        Submits a list or an integer array of submission IDs to the server.
+        Ids that were already submitted by this client, in any order, are answered
+        locally with the score they received and do not spend a benchmark; the other
+        fields are those of the last response of the server.
         Returns:
             SubmitResponse: On success.
             APIErrorResponse: On error.
         """
-        if not isinstance(submission_ids, list):
-            raise ValueError("ids should be a list")
-
-        if len(submission_ids) != Config.SUBMISSION_LENGTH:
+        if isinstance(submission_ids, (list, np.ndarray)) and len(submission_ids) != Config.SUBMISSION_LENGTH:
             raise ValueError(f"ids length should be {Config.SUBMISSION_LENGTH}")
-
-        validated_ids = []
-        for idx in submission_ids:
-            if not (isinstance(idx, int) or (isinstance(idx, str) and idx.isdigit())):
-                raise ValueError("Indexes should be a list of integers or numeric strings")
-            validated_ids.append(int(idx))
+        validated_ids = validate_ids(submission_ids, "ids")
+        digest = submission_digest(validated_ids)
+        if digest in self.submissions and self._last_submit is not None:
+            return self._last_submit.model_copy(update={'last_benchmark_score': self.submissions[digest]})
 
         url = f"{self.base_url}/submit"
         headers = {'x-token': self.secret_key}
-        response = requests.post(url, json={'ids': validated_ids}, headers=headers)
+        response = self._post(url, {'ids': validated_ids}, headers)
 
         try:
             response.raise_for_status()
@@ -140,27 +215,64 @@ class DOChallengeClient:
                 error='Exception',
                 message=f'Other error occurred: {err}'
             )
-        return SubmitResponse(**response.json())
+        submitted = SubmitResponse(**response.json())
+        self.submissions[digest] = submitted.last_benchmark_score
+        self._last_submit = submitted
+        return submitted
 
-    def lab_experiment(self, experiment_ids: List[int]) -> Any:
+    @instrumented
+    def lab_experiment(
+        self,
+        experiment_ids: Union[List[int], np.ndarray],
+        stream: bool = False,
+        on_labels: Optional[Callable[[Dict[str, float]], None]] = None,
+    ) -> Any:
         """
-        Conducts a lab experiment with the given list of experiment IDs.
+        Conducts a lab experiment with the given list or integer array of experiment IDs.
+        With stream=True the server sends labels as NDJSON chunks, and each chunk
+        is passed to on_labels as soon as it arrives.
+        With a label_cache, cached ids are answered locally and only the others are
+        sent to the server; the labels it returns are added to the cache.
         Returns:
             LabExperimentResponse: On success.
             APIErrorResponse: On error.
         """
-        if not isinstance(experiment_ids, list):
-            raise ValueError("experiment_ids should be a list")
+        validated_ids = validate_ids(experiment_ids, "experiment_ids")
+        if self.label_cache is None:
+            return self._lab_experiment(validated_ids, stream, on_labels)
+
+        validated_ids = validated_ids.tolist()
+        cached = self.label_cache.get(self.secret_key, validated_ids)
+        cached_labels = {str(idx): score for idx, score in cached.items()}
+        missing_ids = [idx for idx in dict.fromkeys(validated_ids) if idx not in cached]
+        if cached_labels and stream and on_labels:
+            on_labels(cached_labels)
+        if not missing_ids:
+            available_tokens = self.label_cache.available_tokens(self.secret_key)
+            if available_tokens is None:
+                budget = self.remained_budget()
+                if isinstance(budget, APIErrorResponse):
+                    return budget
+                available_tokens = budget.available_tokens
+            return LabExperimentResponse(available_tokens=available_tokens, labels=cached_labels, tokens_spent=0)
 
-        validated_ids = []
-        for idx in experiment_ids:
-            if not (isinstance(idx, int) or (isinstance(idx, str) and idx.isdigit())):
-                raise ValueError("Indexes should be a list of integers or numeric strings")
-            validated_ids.append(int(idx))
+        response = self._lab_experiment(missing_ids, stream, on_labels)
+        if isinstance(response, LabExperimentResponse):
+            self.label_cache.put(self.secret_key, response.labels, response.available_tokens)
+            response.labels = {**cached_labels, **response.labels}
+        return response
 
+    def _lab_experiment(
+        self,
+        validated_ids: Union[List[int], np.ndarray],
+        stream: bool,
+        on_labels: Optional[Callable[[Dict[str, float]], None]],
+    ) -> Any:
         url = f"{self.base_url}/lab_experiment"
         headers = {'x-token': self.secret_key}
-        response = requests.post(url, json={'ids': validated_ids}, headers=headers)
+        if stream:
+            headers['Accept'] = 'application/x-ndjson'
+        response = self._post(url, {'ids': validated_ids}, headers, stream=stream)
 
         try:
             response.raise_for_status()
@@ -176,8 +288,132 @@ class DOChallengeClient:
                 error='Exception',
                 message=f'Other error occurred: {err}'
             )
-        return LabExperimentResponse(**response.json())
+        if not stream:
+            return LabExperimentResponse.model_construct_labels(loads(response.content))
+
+        labels = {}
+        available_tokens = None
+        tokens_spent = None
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                record = loads(line)
+                if 'labels' in record:
+                    labels.update(record['labels'])
+                    if on_labels:
+                        on_labels(record['labels'])
+                if 'available_tokens' in record:
+                    available_tokens = record['available_tokens']
+                    tokens_spent = record.get('tokens_spent')
+        except Exception as err:
+            return APIErrorResponse(
+                error='Exception',
+                message=f'Other error occurred: {err}'
+            )
+        finally:
+            response.close()
+        if available_tokens is None:
+            return APIErrorResponse(
+                error='Exception',
+                message='Lab experiment stream ended before the trailer record'
+            )
+        return LabExperimentResponse(available_tokens=available_tokens, labels=labels, tokens_spent=tokens_spent)
+
+    def lab_experiment_array(self, experiment_ids: Union[List[int], np.ndarray]) -> Any:
+        """
+        lab_experiment for NumPy code: takes a list or an integer array of ids.
+        Returns:
+            LabelArrays: Parallel int64 ids and float64 scores, and the available tokens.
+            APIErrorResponse: On error.
+        """
+        response = self.lab_experiment(experiment_ids)
+        if isinstance(response, APIErrorResponse):
+            return response
+        ids, scores = labels_to_arrays(response.labels)
+        return LabelArrays(ids, scores, response.available_tokens)
+
+    def lab_experiment_frame(self, experiment_ids: Union[List[int], np.ndarray]) -> Any:
+        """
+        lab_experiment as a pandas DataFrame with a `score` column indexed by id.
+        The available tokens are in `frame.attrs['available_tokens']`.
+        Returns:
+            pandas.DataFrame: On success.
+            APIErrorResponse: On error.
+        """
+        import pandas as pd
+
+        response = self.lab_experiment_array(experiment_ids)
+        if isinstance(response, APIErrorResponse):
+            return response
+        frame = pd.DataFrame({'score': response.scores}, index=pd.Index(response.ids, name='id'))
+        frame.attrs['available_tokens'] = response.available_tokens
+        return frame
+
+    def lab_experiment_batched(
+        self,
+        experiment_ids: Union[List[int], LabExperimentJob],
+        max_workers: int = Config.BATCH_WORKERS,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Any:
+        """
+        Runs a lab experiment over any number of ids as concurrent batches paced by
+        lab_rate_limiter, and merges them into one response. on_progress(labeled, total)
+        is called after every batch. Pass a LabExperimentJob instead of ids to resume it
+        after a failure: only its pending batches are sent again.
+        Returns:
+            LabExperimentResponse: With the labels of every batch and the final available_tokens.
+            APIErrorResponse: The last error when a batch failed; the other batches stop early.
+        """
+        job = experiment_ids if isinstance(experiment_ids, LabExperimentJob) else LabExperimentJob(experiment_ids)
+        failed = threading.Event()
+
+        def run_batch(batch):
+            if failed.is_set():
+                return
+            self.lab_rate_limiter.acquire(rate_limit_cost(batch))
+            if failed.is_set():
+                return
+            try:
+                response = self.lab_experiment(batch)
+            except requests.RequestException as err:
+                response = APIErrorResponse(error='Exception', message=f'Other error occurred: {err}')
+            if not job.record(batch, response):
+                failed.set()
+            elif on_progress:
+                on_progress(job.labeled, job.total)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(run_batch, list(job.pending)))
+        return job.result()
+
+    def reconcile_label_cache(self) -> Any:
+        """
+        Brings the label cache in line with /requested_ids, e.g. when an agent starts.
+        Cached ids the server does not list are dropped, and the labels of ids bought
+        before the cache existed are fetched again, which costs no tokens.
+        Returns:
+            LabExperimentResponse: With the labels that were fetched.
+            APIErrorResponse: On error.
+        """
+        if self.label_cache is None:
+            raise ValueError("The client has no label_cache")
+        requested = self.requested_ids()
+        if isinstance(requested, APIErrorResponse):
+            return requested
+        requested_ids = set(requested.requested_ids)
+        cached_ids = set(self.label_cache.ids(self.secret_key))
+        self.label_cache.discard(self.secret_key, cached_ids - requested_ids)
+
+        missing_ids = sorted(requested_ids - cached_ids)
+        if not missing_ids:
+            budget = self.remained_budget()
+            if isinstance(budget, APIErrorResponse):
+                return budget
+            return LabExperimentResponse(available_tokens=budget.available_tokens, labels={}, tokens_spent=0)
+        return self.lab_experiment_batched(missing_ids)
 
+    @instrumented
     def remained_budget(self) -> Any:
         """
         Fetches the remaining budget from the server.
@@ -187,7 +423,7 @@ class DOChallengeClient:
         """
         url = f"{self.base_url}/remained_budget"
         headers = {'x-token': self.secret_key}
-        response = requests.get(url, headers=headers)
+        response = self._get(url, headers)
 
         try:
             response.raise_for_status()
@@ -205,6 +441,7 @@ class DOChallengeClient:
             )
         return RemainedBudgetResponse(**response.json())
 
+    @instrumented
     def requested_ids(self) -> Any:
         """
         Fetches the requested IDs from the server.
@@ -214,7 +451,7 @@ class DOChallengeClient:
         """
         url = f"{self.base_url}/requested_ids"
         headers = {'x-token': self.secret_key}
-        response = requests.get(url, headers=headers)
+        response = self._get(url, headers)
 
         try:
             response.raise_for_status()
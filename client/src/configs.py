@@ -1,3 +1,24 @@
 class Config:
     BASE_URL = "http://localhost:5000/api"
-    SUBMISSION_LENGTH = 3000
\ No newline at end of file
+    SUBMISSION_LENGTH = 3000
+    COMPRESS_MIN_SIZE = 1024
+
+    # (connect, read) timeouts in seconds
+    TIMEOUT = (5, 120)
+    MAX_RETRIES = 5
+    BACKOFF_FACTOR = 0.5
+    MAX_BACKOFF = 30
+    MAX_RETRY_AFTER = 120
+    POOL_SIZE = 16
+
+    # AsyncDOChallengeClient: requests in flight at once, and HTTP/2 when h2 is installed
+    MAX_CONCURRENCY = 8
+    HTTP2 = True
+
+    # Server limit of lab experiments: units per period in seconds, one unit per started
+    # RATE_LIMIT_IDS_PER_UNIT ids. Batched lab experiments send LAB_BATCH_SIZE ids at most
+    # per request, BATCH_WORKERS requests at a time.
+    RATE_LIMIT_LAB_EXPERIMENT = (300, 60)
+    RATE_LIMIT_IDS_PER_UNIT = 1000
+    LAB_BATCH_SIZE = 5000
+    BATCH_WORKERS = 4
@@ -0,0 +1,98 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# stays under the SQLite limit of host parameters per statement on old builds
+QUERY_CHUNK_SIZE = 900
+
+
+def team_key(secret_key: str) -> str:
+    """
+    Cache key of a team. The secret key itself is never written to disk.
+    """
+    return hashlib.sha256(secret_key.encode()).hexdigest()
+
+
+class LabelCache:
+    """
+    SQLite store of the labels a team has bought, keyed by team and id, so that an agent
+    keeps its labels across restarts. Safe to share between threads and clients.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            if path != ":memory:":
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS labels ("
+                "team TEXT NOT NULL, id INTEGER NOT NULL, score REAL NOT NULL, PRIMARY KEY (team, id)"
+                ") WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS budgets (team TEXT PRIMARY KEY, available_tokens INTEGER NOT NULL)"
+            )
+
+    def get(self, secret_key: str, ids: Iterable[int]) -> Dict[int, float]:
+        """
+        Cached scores of the given ids; ids that are not cached are left out.
+        """
+        team = team_key(secret_key)
+        ids = list(ids)
+        scores = {}
+        with self.lock:
+            for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+                chunk = ids[start:start + QUERY_CHUNK_SIZE]
+                rows = self.connection.execute(
+                    f"SELECT id, score FROM labels WHERE team = ? AND id IN ({','.join('?' * len(chunk))})",
+                    [team, *chunk],
+                )
+                scores.update(rows)
+        return scores
+
+    def put(self, secret_key: str, labels: Dict[str, float], available_tokens: Optional[int] = None):
+        team = team_key(secret_key)
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO labels (team, id, score) VALUES (?, ?, ?)",
+                [(team, int(idx), score) for idx, score in labels.items()],
+            )
+            if available_tokens is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO budgets (team, available_tokens) VALUES (?, ?)",
+                    (team, available_tokens),
+                )
+
+    def available_tokens(self, secret_key: str) -> Optional[int]:
+        """
+        Tokens left after the last lab experiment, or None if there was none yet.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT available_tokens FROM budgets WHERE team = ?", (team_key(secret_key),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def ids(self, secret_key: str) -> List[int]:
+        with self.lock:
+            rows = self.connection.execute("SELECT id FROM labels WHERE team = ?", (team_key(secret_key),))
+            return [idx for idx, in rows]
+
+    def discard(self, secret_key: str, ids: Iterable[int]):
+        team = team_key(secret_key)
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM labels WHERE team = ? AND id = ?",
+                                        [(team, idx) for idx in ids])
+
+    def clear(self, secret_key: str):
+        team = team_key(secret_key)
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM labels WHERE team = ?", (team,))
+            self.connection.execute("DELETE FROM budgets WHERE team = ?", (team,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .arrays import validate_ids
+from .configs import Config
+
+
+class TokenBucket:
+    """
+    Client-side mirror of a server rate limit of `rate` units per `period` seconds.
+    Callers reserve units before sending a request and wait for the returned delay, so
+    concurrent callers queue up behind each other instead of tripping the server limiter.
+    """
+
+    def __init__(self, rate: int, period: float, capacity: Optional[int] = None, clock=time.monotonic):
+        self.rate = rate / period
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self, cost: int = 1) -> float:
+        """
+        Takes `cost` units and returns the seconds to wait before they are available.
+        The bucket may go negative, which queues the reservations of later callers.
+        """
+        cost = min(cost, self.capacity)
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, cost: int = 1):
+        time.sleep(self.reserve(cost))
+
+
+def rate_limit_cost(batch: List[int]) -> int:
+    """
+    Units the server charges a lab experiment against its limit: one per started
+    Config.RATE_LIMIT_IDS_PER_UNIT ids.
+    """
+    return max(1, -(-len(batch) // Config.RATE_LIMIT_IDS_PER_UNIT))
+
+
+def chunk_ids(ids: List[int], batch_size: int) -> List[List[int]]:
+    """
+    Splits ids into the fewest batches of at most batch_size ids, with sizes balanced and
+    rounded up to whole rate limit units, so no batch pays for a mostly empty unit.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size should be at least 1")
+    if not ids:
+        return []
+    batches = -(-len(ids) // batch_size)
+    size = -(-len(ids) // batches)
+    unit = Config.RATE_LIMIT_IDS_PER_UNIT
+    if batch_size >= unit:
+        size = min(batch_size, -(-size // unit) * unit)
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+
+class LabExperimentJob:
+    """
+    A lab experiment over many ids, sent as batches. The labels of finished batches are
+    kept and failed or unsent batches stay in `pending`, so running the job again resumes
+    it without buying anything twice. Jobs can be saved to and loaded from a JSON file.
+    """
+
+    def __init__(self, experiment_ids, batch_size: int = Config.LAB_BATCH_SIZE):
+        unique_ids = list(dict.fromkeys(validate_ids(experiment_ids, "experiment_ids").tolist()))
+        if not unique_ids:
+            raise ValueError("experiment_ids should not be empty")
+        self.total = len(unique_ids)
+        self.pending: List[List[int]] = chunk_ids(unique_ids, batch_size)
+        self.labels: Dict[str, float] = {}
+        self.available_tokens: Optional[int] = None
+        self.tokens_spent = 0
+        self.errors: List[Any] = []
+        self.lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    @property
+    def labeled(self) -> int:
+        with self.lock:
+            return self.total - sum(len(batch) for batch in self.pending)
+
+    def record(self, batch: List[int], response: Any) -> bool:
+        """
+        Records the response to a batch. Returns whether the batch succeeded.
+        """
+        from .client import LabExperimentResponse
+
+        with self.lock:
+            if not isinstance(response, LabExperimentResponse):
+                self.errors.append(response)
+                return False
+            self.labels.update(response.labels)
+            self.tokens_spent += response.tokens_spent or 0
+            # concurrent batches finish in any order, and tokens only ever go down
+            if self.available_tokens is None or response.available_tokens < self.available_tokens:
+                self.available_tokens = response.available_tokens
+            self.pending.remove(batch)
+            return True
+
+    def result(self) -> Any:
+        """
+        LabExperimentResponse with the merged labels once every batch is done,
+        otherwise the last error.
+        """
+        from .client import APIErrorResponse, LabExperimentResponse
+
+        if self.pending:
+            if self.errors:
+                return self.errors[-1]
+            return APIErrorResponse(error='Exception', message=f'{len(self.pending)} batches were not sent')
+        return LabExperimentResponse(available_tokens=self.available_tokens, labels=self.labels,
+                                     tokens_spent=self.tokens_spent)
+
+    def save(self, path: str):
+        with self.lock:
+            state = {'total': self.total, 'pending': self.pending, 'labels': self.labels,
+                     'available_tokens': self.available_tokens, 'tokens_spent': self.tokens_spent}
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path: str) -> "LabExperimentJob":
+        with open(path) as f:
+            state = json.load(f)
+        job = cls.__new__(cls)
+        job.errors = []
+        job.lock = threading.Lock()
+        job.total = state['total']
+        job.pending = state['pending']
+        job.labels = state['labels']
+        job.available_tokens = state['available_tokens']
+        job.tokens_spent = state.get('tokens_spent', 0)
+        return job
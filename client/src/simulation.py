@@ -0,0 +1,296 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from . import telemetry
+from .arrays import dumps, loads
+from .configs import Config
+
+
+class SimulatedTeam:
+    def __init__(self, tokens: int, benchmarks: int):
+        self.available_tokens = tokens
+        self.available_benchmarks = benchmarks
+        self.benchmarks = []
+        self.best_benchmark_score = None
+        self.last_benchmark_hash = None
+        self.requested_ids = []
+        self.requested_set = set()
+        self.status = "pending"
+        self.idempotent_responses: Dict[str, tuple] = {}
+
+
+class SimulationError(Exception):
+    def __init__(self, status_code: int, error: str, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.error = error
+        self.message = message
+
+
+def _bad_request(message: str):
+    return SimulationError(400, "Bad Request", message)
+
+
+class ChallengeSimulation:
+    """
+    In-process copy of the challenge server rules: token budget and label price,
+    deduped label purchases, the submission length, replays of an unchanged submission,
+    the number of benchmarks and the top-K score. Teams see the dataset ids directly,
+    as if their id mapping were the identity.
+    """
+
+    def __init__(
+        self,
+        ids,
+        scores,
+        top_ids,
+        tokens: int = 100000,
+        benchmarks: int = 3,
+        label_price: int = 1,
+        submission_length: int = Config.SUBMISSION_LENGTH,
+        stream_chunk_size: int = 1000,
+    ):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids)
+        self.ids = ids[order]
+        self.scores = np.asarray(scores, dtype=np.float64)[order]
+        if len(self.ids) > 1 and not (np.diff(self.ids) > 0).all():
+            raise ValueError("Dataset has duplicate ids")
+        self.top_ids = set(np.asarray(top_ids, dtype=np.int64).tolist())
+        if not self.top_ids:
+            raise ValueError("top_ids should not be empty")
+        self.tokens = tokens
+        self.benchmarks = benchmarks
+        self.label_price = label_price
+        self.submission_length = submission_length
+        self.stream_chunk_size = stream_chunk_size
+        self.teams: Dict[str, SimulatedTeam] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def synthetic(cls, compounds: int = 1_000_000, top_k: int = 1000, seed: int = 0, **kwargs):
+        """
+        Random dataset shaped like the server's synthetic one: shuffled dense ids with
+        docking-like scores, and the top_k highest scores as the benchmark.
+        """
+        rng = np.random.default_rng(seed)
+        ids = rng.permutation(compounds).astype(np.int64)
+        scores = rng.normal(-7.0, 1.5, compounds).round(3)
+        top_ids = ids[np.argsort(scores, kind="stable")[::-1][:top_k]]
+        return cls(ids, scores, top_ids, **kwargs)
+
+    @classmethod
+    def from_files(cls, labels_path: str, top_path: str, **kwargs):
+        """
+        Loads a held-out dataset: labels as a DataFrame with a `score` column indexed by id
+        (the server's labels_df.pkl, or a CSV with id and score columns), and the top ids as
+        the index of a DataFrame (top1000_df.pkl) or a CSV with an id column.
+        """
+        import pandas as pd
+
+        if labels_path.endswith(".csv"):
+            labels_df = pd.read_csv(labels_path, index_col="id")
+        else:
+            labels_df = pd.read_pickle(labels_path)
+        if top_path.endswith(".csv"):
+            top_ids = pd.read_csv(top_path)["id"].to_numpy()
+        else:
+            top_ids = pd.read_pickle(top_path).index.to_numpy()
+        return cls(labels_df.index.to_numpy(), labels_df["score"].to_numpy(), top_ids, **kwargs)
+
+    def add_team(self, secret_key: str) -> SimulatedTeam:
+        with self.lock:
+            if secret_key not in self.teams:
+                self.teams[secret_key] = SimulatedTeam(self.tokens, self.benchmarks)
+            return self.teams[secret_key]
+
+    def client(self, secret_key: str = "simulation", **kwargs):
+        """
+        DOChallengeClient of a new simulated team, talking to this simulation.
+        """
+        from .client import DOChallengeClient
+
+        self.add_team(secret_key)
+        return DOChallengeClient(secret_key, transport=SimulationTransport(self), **kwargs)
+
+    def _team(self, secret_key: Optional[str]) -> SimulatedTeam:
+        if not secret_key:
+            raise SimulationError(401, "Unauthorized", "Unauthorized")
+        team = self.teams.get(secret_key)
+        if team is None:
+            raise SimulationError(403, "Forbidden", "Invalid secret key")
+        return team
+
+    @staticmethod
+    def _validate_ids(payload) -> list:
+        if not isinstance(payload, dict):
+            raise _bad_request("Invalid JSON payload")
+        indexes = payload.get("ids")
+        if indexes is None:
+            raise _bad_request("ids are required")
+        if not isinstance(indexes, list):
+            raise _bad_request("Indexes should be a list")
+        validated_ids = []
+        for idx in indexes:
+            if not (isinstance(idx, int) or (isinstance(idx, str) and idx.isdigit())):
+                raise _bad_request("Indexes should be a list of integers or numeric strings")
+            validated_ids.append(int(idx))
+        return validated_ids
+
+    def remained_budget(self, secret_key: str) -> dict:
+        team = self._team(secret_key)
+        return {"available_tokens": team.available_tokens, "benchmarks": list(team.benchmarks),
+                "available_benchmarks": team.available_benchmarks}
+
+    def requested_ids(self, secret_key: str) -> dict:
+        return {"requested_ids": list(self._team(secret_key).requested_ids)}
+
+    def labels(self, ids: list):
+        """
+        Scores of the given dataset ids, or SimulationError for the first unknown id.
+        """
+        array = np.asarray(ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.ids, array), max(len(self.ids) - 1, 0))
+        found = self.ids[positions] == array if len(self.ids) else np.zeros(len(array), dtype=bool)
+        if not found.all():
+            raise _bad_request(f"Index {ids[found.argmin()]} not found in the dataset")
+        return self.scores[positions]
+
+    def lab_experiment(self, secret_key: str, payload) -> dict:
+        team = self._team(secret_key)
+        validated_ids = self._validate_ids(payload)
+        if team.status == "completed":
+            raise _bad_request("Challenge already completed")
+
+        unique_ids = list(dict.fromkeys(validated_ids))
+        scores = self.labels(unique_ids) if unique_ids else np.empty(0)
+        with self.lock:
+            new_ids = [idx for idx in unique_ids if idx not in team.requested_set]
+            token_cost = len(new_ids) * self.label_price
+            if team.available_tokens < token_cost:
+                raise _bad_request("Not enough tokens")
+            team.available_tokens -= token_cost
+            team.requested_ids.extend(new_ids)
+            team.requested_set.update(new_ids)
+            available_tokens = team.available_tokens
+        labels = dict(zip(map(str, unique_ids), scores.tolist()))
+        return {"labels": labels, "available_tokens": available_tokens, "tokens_spent": token_cost}
+
+    def submit(self, secret_key: str, payload) -> dict:
+        team = self._team(secret_key)
+        validated_ids = self._validate_ids(payload)
+        if len(validated_ids) != self.submission_length:
+            raise _bad_request(f"Expected {self.submission_length} indexes, got {len(validated_ids)}")
+        if team.status == "completed":
+            raise _bad_request("Challenge already completed")
+
+        with self.lock:
+            submission_hash = hashlib.sha256(json.dumps(validated_ids, sort_keys=True).encode()).hexdigest()
+            if team.last_benchmark_hash == submission_hash:
+                return {"message": "Submission already benchmarked", "available_tokens": team.available_tokens,
+                        "best_benchmark_score": team.best_benchmark_score,
+                        "last_benchmark_score": team.benchmarks[-1], "benchmarks": list(team.benchmarks),
+                        "available_benchmarks": team.available_benchmarks}
+            if team.available_benchmarks <= 0:
+                raise _bad_request("No benchmarks available")
+            try:
+                self.labels(validated_ids)
+            except SimulationError:
+                raise _bad_request("Invalid id provided, please check.")
+            score = (len(set(validated_ids) & self.top_ids) * 100) / len(self.top_ids)
+            team.available_benchmarks -= 1
+            team.last_benchmark_hash = submission_hash
+            team.benchmarks.append(score)
+            if not team.best_benchmark_score or score > team.best_benchmark_score:
+                team.best_benchmark_score = score
+            return {"message": "Benchmark completed", "available_tokens": team.available_tokens,
+                    "best_benchmark_score": team.best_benchmark_score, "last_benchmark_score": score,
+                    "benchmarks": list(team.benchmarks), "available_benchmarks": team.available_benchmarks}
+
+    def handle(self, method: str, endpoint: str, headers, body: Optional[bytes]):
+        """
+        Answers one API call with (status_code, payload), like the server would.
+        """
+        secret_key = headers.get("X-TOKEN")
+        try:
+            if method == "GET" and endpoint == "remained_budget":
+                return 200, self.remained_budget(secret_key)
+            if method == "GET" and endpoint == "requested_ids":
+                return 200, self.requested_ids(secret_key)
+            if method == "POST" and endpoint in ("lab_experiment", "submit"):
+                team = self._team(secret_key)
+                key = headers.get("Idempotency-Key")
+                if key and key in team.idempotent_responses:
+                    return team.idempotent_responses[key]
+                try:
+                    payload = loads(body) if body else None
+                except ValueError:
+                    raise _bad_request("Invalid JSON payload")
+                if not payload:
+                    raise _bad_request("Invalid JSON payload")
+                result = 200, getattr(self, endpoint)(secret_key, payload)
+                if key:
+                    team.idempotent_responses[key] = result
+                return result
+            raise SimulationError(404, "Not Found", f"The simulation has no {method} /{endpoint}")
+        except SimulationError as err:
+            return err.status_code, {"error": err.error, "message": err.message}
+
+
+class SimulationTransport:
+    """
+    Drop-in replacement for HTTPTransport that answers requests from a ChallengeSimulation
+    in-process, so strategies can be tuned offline without spending real tokens or benchmarks.
+    """
+
+    def __init__(self, simulation: ChallengeSimulation):
+        self.simulation = simulation
+
+    def request(self, method: str, url: str, headers: dict, retry: bool = False, data: Optional[bytes] = None,
+                stream: bool = False, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        call = telemetry.active_call()
+        if call is not None:
+            call.record.method = method
+            call.record.url = url
+            call.record.request_bytes = len(data or b"")
+            call.hooks.emit("before_request", call.record)
+        headers = CaseInsensitiveDict(headers)
+        if data and headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        endpoint = urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+        status_code, payload = self.simulation.handle(method, endpoint, headers, data)
+        handled = time.perf_counter()
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = url
+        response.encoding = "utf-8"
+        if status_code == 200 and "application/x-ndjson" in headers.get("Accept", "") and "labels" in payload:
+            items = list(payload["labels"].items())
+            size = self.simulation.stream_chunk_size
+            records = [{"labels": dict(items[start:start + size])} for start in range(0, len(items), size)]
+            records.append({"available_tokens": payload["available_tokens"], "tokens_spent": payload["tokens_spent"]})
+            response._content = b"".join(dumps(record) + b"\n" for record in records)
+            response.headers = CaseInsensitiveDict({"Content-Type": "application/x-ndjson"})
+        else:
+            response._content = dumps(payload)
+            response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        response._content_consumed = True
+        if call is not None:
+            telemetry.record_response(call.record, response)
+            call.record.server_ms = (handled - start) * 1000
+            call.transport_ms += (time.perf_counter() - start) * 1000
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,213 @@
+import contextvars
+import csv
+import json
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+SERVER_TIMING = re.compile(r'(?:^|,)\s*app\s*;[^,]*?dur=([0-9.]+)')
+
+_current_call: contextvars.ContextVar = contextvars.ContextVar('current_call', default=None)
+
+
+@dataclass
+class CallRecord:
+    """
+    Timings and sizes of one client call, retries included. Times are in milliseconds:
+    connect is spent opening connections, server is reported by the server in its
+    Server-Timing header, network is the rest of the time on the wire, retry_wait is
+    spent backing off, and parse is spent in the client validating and decoding.
+    tokens_spent is what the server charged for this call, as it reports it.
+    """
+    operation: str
+    started_at: float = field(default_factory=time.time)
+    method: str = ''
+    url: str = ''
+    status_code: Optional[int] = None
+    ids: Optional[int] = None
+    request_bytes: int = 0
+    response_bytes: int = 0
+    retries: int = 0
+    total_ms: float = 0.0
+    connect_ms: float = 0.0
+    server_ms: float = 0.0
+    network_ms: float = 0.0
+    retry_wait_ms: float = 0.0
+    parse_ms: float = 0.0
+    tokens_spent: Optional[int] = None
+    error: Optional[str] = None
+
+
+class Hooks:
+    """
+    Event hooks of a client:
+    before_request(record) runs before every HTTP request, retries included;
+    on_retry(record, attempt, delay, reason) runs before backing off for a retry;
+    after_response(record) runs once per call, when its record is complete.
+    """
+
+    EVENTS = ('before_request', 'on_retry', 'after_response')
+
+    def __init__(self):
+        self.handlers: Dict[str, List[Callable]] = {event: [] for event in self.EVENTS}
+
+    def register(self, event: str, handler: Callable):
+        if event not in self.handlers:
+            raise ValueError(f"Unknown event {event}, expected one of {', '.join(self.EVENTS)}")
+        self.handlers[event].append(handler)
+        return handler
+
+    def emit(self, event: str, *args):
+        for handler in self.handlers[event]:
+            handler(*args)
+
+
+class _ActiveCall:
+    def __init__(self, record: CallRecord, hooks: Hooks):
+        self.record = record
+        self.hooks = hooks
+        self.transport_ms = 0.0
+
+
+def active_call() -> Optional[_ActiveCall]:
+    return _current_call.get()
+
+
+def add_connect_time(seconds: float):
+    call = _current_call.get()
+    if call is not None:
+        call.record.connect_ms += seconds * 1000
+
+
+def record_retry(call: _ActiveCall, attempt: int, delay: float, reason):
+    call.record.retries += 1
+    call.record.retry_wait_ms += delay * 1000
+    call.hooks.emit('on_retry', call.record, attempt, delay, reason)
+
+
+def record_response(record: CallRecord, response, stream: bool = False):
+    """
+    Fills in the status, size and server time of the final response of a call.
+    """
+    record.status_code = response.status_code
+    record.server_ms = server_time(response.headers)
+    content_length = response.headers.get('Content-Length')
+    if content_length is not None:
+        record.response_bytes = int(content_length)
+    elif not stream:
+        record.response_bytes = len(response.content)
+
+
+def server_time(headers) -> float:
+    """
+    Milliseconds the server spent on a request according to `Server-Timing: app;dur=...`.
+    """
+    match = SERVER_TIMING.search(headers.get('Server-Timing', ''))
+    return float(match.group(1)) if match else 0.0
+
+
+def instrumented(method):
+    """
+    Records a CallRecord for every call of a client method when the client has hooks.
+    The transport fills in the wire-level fields through the active call.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        hooks = getattr(self, 'hooks', None)
+        if hooks is None or _current_call.get() is not None:
+            return method(self, *args, **kwargs)
+
+        record = CallRecord(operation=method.__name__)
+        if args and hasattr(args[0], '__len__'):
+            record.ids = len(args[0])
+        call = _ActiveCall(record, hooks)
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception as err:
+            record.error = repr(err)
+            raise
+        finally:
+            _current_call.reset(token)
+            record.total_ms = (time.perf_counter() - start) * 1000
+            record.parse_ms = max(0.0, record.total_ms - call.transport_ms)
+            record.network_ms = max(0.0, call.transport_ms - record.connect_ms - record.server_ms
+                                    - record.retry_wait_ms)
+            if record.error is None:
+                error = getattr(result, 'error', None)
+                record.error = error if isinstance(error, str) else None
+                tokens_spent = getattr(result, 'tokens_spent', None)
+                record.tokens_spent = tokens_spent if isinstance(tokens_spent, int) else None
+            hooks.emit('after_response', record)
+        return result
+    return wrapper
+
+
+class TelemetryCollector:
+    """
+    Keeps the CallRecords of a run, and exports them to JSON or CSV with a summary.
+    """
+
+    def __init__(self, hooks: Optional[Hooks] = None):
+        self.records: List[CallRecord] = []
+        self.lock = threading.Lock()
+        if hooks is not None:
+            self.attach(hooks)
+
+    def attach(self, hooks: Hooks):
+        hooks.register('after_response', self.add)
+
+    def add(self, record: CallRecord):
+        with self.lock:
+            self.records.append(record)
+
+    def summary(self) -> dict:
+        """
+        Per operation and overall: call count, errors, retries, bytes, tokens spent,
+        p50/p95 of the total latency, and the mean of every latency component.
+        """
+        with self.lock:
+            records = list(self.records)
+        by_operation: Dict[str, List[CallRecord]] = {}
+        for record in records:
+            by_operation.setdefault(record.operation, []).append(record)
+
+        def summarize(group: List[CallRecord]):
+            totals = sorted(record.total_ms for record in group)
+            summary = {
+                'calls': len(group),
+                'errors': sum(record.error is not None for record in group),
+                'retries': sum(record.retries for record in group),
+                'request_bytes': sum(record.request_bytes for record in group),
+                'response_bytes': sum(record.response_bytes for record in group),
+                'tokens_spent': sum(record.tokens_spent or 0 for record in group),
+                'p50_ms': totals[min(len(totals) - 1, int(0.50 * len(totals)))] if totals else None,
+                'p95_ms': totals[min(len(totals) - 1, int(0.95 * len(totals)))] if totals else None,
+            }
+            for component in ('total', 'connect', 'server', 'network', 'retry_wait', 'parse'):
+                values = [getattr(record, f'{component}_ms') for record in group]
+                summary[f'mean_{component}_ms'] = sum(values) / len(values) if values else None
+            return summary
+
+        return {
+            'total': summarize(records),
+            'operations': {operation: summarize(group) for operation, group in sorted(by_operation.items())},
+        }
+
+    def to_json(self, path: str):
+        with self.lock:
+            records = [asdict(record) for record in self.records]
+        with open(path, 'w') as f:
+            json.dump({'records': records, 'summary': self.summary()}, f, indent=2)
+
+    def to_csv(self, path: str):
+        with self.lock:
+            records = [asdict(record) for record in self.records]
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=[column.name for column in fields(CallRecord)])
+            writer.writeheader()
+            writer.writerows(records)
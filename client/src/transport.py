@@ -0,0 +1,146 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from . import telemetry
+from .configs import Config
+
+RETRY_STATUSES = {429, 502, 503, 504}
+# 409 means the server is still running the first request with this Idempotency-Key
+DEDUPED_RETRY_STATUSES = RETRY_STATUSES | {409}
+
+
+def retry_after(response) -> Optional[float]:
+    """
+    Seconds to wait according to the Retry-After header, in seconds or as an HTTP date.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def full_jitter(attempt: int, backoff_factor: float, max_backoff: float) -> float:
+    """
+    Full-jitter exponential backoff: a random delay up to backoff_factor * 2 ** attempt.
+    """
+    return random.uniform(0, min(max_backoff, backoff_factor * 2 ** attempt))
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        telemetry.add_connect_time(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        telemetry.add_connect_time(time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connections report how long they took to open, for the telemetry hooks.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
+
+
+class HTTPTransport:
+    """
+    Sends the client requests over one pooled keep-alive session, with timeouts and
+    exponential backoff retries. Only requests that are safe to repeat are retried:
+    GETs, and POSTs the server dedupes through their Idempotency-Key.
+    """
+
+    def __init__(
+        self,
+        timeout=Config.TIMEOUT,
+        max_retries: int = Config.MAX_RETRIES,
+        backoff_factor: float = Config.BACKOFF_FACTOR,
+        max_backoff: float = Config.MAX_BACKOFF,
+        pool_size: int = Config.POOL_SIZE,
+        session: Optional[requests.Session] = None,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.session = session or requests.Session()
+        adapter = _TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def backoff(self, attempt: int) -> float:
+        return full_jitter(attempt, self.backoff_factor, self.max_backoff)
+
+    def request(self, method: str, url: str, headers: dict, retry: bool = False, **kwargs) -> requests.Response:
+        call = telemetry.active_call()
+        if call is None:
+            return self._request(method, url, headers, retry, None, **kwargs)
+        call.record.method = method
+        call.record.url = url
+        call.record.request_bytes = len(kwargs.get('data') or b'')
+        start = time.perf_counter()
+        try:
+            response = self._request(method, url, headers, retry, call, **kwargs)
+        finally:
+            call.transport_ms += (time.perf_counter() - start) * 1000
+        telemetry.record_response(call.record, response, kwargs.get('stream', False))
+        return response
+
+    def _request(self, method: str, url: str, headers: dict, retry: bool, call, **kwargs) -> requests.Response:
+        retry_statuses = DEDUPED_RETRY_STATUSES if 'Idempotency-Key' in headers else RETRY_STATUSES
+        attempt = 0
+        while True:
+            if call:
+                call.hooks.emit('before_request', call.record)
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if not retry or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                reason = type(err).__name__
+            else:
+                if not retry or response.status_code not in retry_statuses or attempt >= self.max_retries:
+                    return response
+                delay = retry_after(response)
+                delay = self.backoff(attempt) if delay is None else min(delay, Config.MAX_RETRY_AFTER)
+                reason = response.status_code
+                response.close()
+            if call:
+                telemetry.record_retry(call, attempt + 1, delay, reason)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInServer:
+    """
+    Local stand-in for the challenge API: one team with a token budget, labels derived
+    from the ids, ETags on the GET endpoints and NDJSON streaming of lab experiments.
+    Tests tune `delay`, `fail_next` (answered with the `retry_after` header) and `label_price`,
+    and inspect `requests`, `bodies` and `max_in_flight`.
+    """
+
+    def __init__(self, token: str = "secret", tokens: int = 100000, label_price: int = 1):
+        self.token = token
+        self.available_tokens = tokens
+        self.available_benchmarks = 3
+        self.label_price = label_price
+        self.requested_ids = []
+        self.benchmarks = []
+        self.delay = 0.0
+        self.fail_next = []
+        self.retry_after = "0"
+        self.requests = []
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def label(idx: int) -> float:
+        return round((idx * 7919 % 1000) / 100, 2)
+
+    def handle(self, method: str, path: str, headers, body: bytes):
+        """
+        Returns (status, headers, body) where body is bytes or a list of NDJSON records.
+        """
+        with self.lock:
+            if self.fail_next:
+                status = self.fail_next.pop(0)
+                return status, {"Retry-After": self.retry_after}, json.dumps({"error": "Unavailable", "message": "Try again"}).encode()
+        if headers.get("X-TOKEN") != self.token:
+            return 401, {}, json.dumps({"error": "Unauthorized", "message": "Invalid token"}).encode()
+
+        if method == "GET" and path == "/api/remained_budget":
+            payload = {"available_benchmarks": self.available_benchmarks,
+                       "available_tokens": self.available_tokens, "benchmarks": self.benchmarks}
+        elif method == "GET" and path == "/api/requested_ids":
+            payload = {"requested_ids": self.requested_ids}
+        elif method == "POST" and path == "/api/lab_experiment":
+            ids = json.loads(body)["ids"]
+            with self.lock:
+                new_ids = [idx for idx in dict.fromkeys(ids) if idx not in self.requested_ids]
+                price = len(new_ids) * self.label_price
+                if price > self.available_tokens:
+                    return 400, {}, json.dumps({"error": "Bad Request", "message": "Not enough tokens"}).encode()
+                self.available_tokens -= price
+                self.requested_ids.extend(new_ids)
+                available_tokens = self.available_tokens
+            labels = {str(idx): self.label(idx) for idx in ids}
+            if "application/x-ndjson" in headers.get("Accept", ""):
+                items = list(labels.items())
+                records = [{"labels": dict(items[i:i + 2])} for i in range(0, len(items), 2)]
+                return 200, {}, records + [{"available_tokens": available_tokens, "tokens_spent": price}]
+            payload = {"available_tokens": available_tokens, "labels": labels, "tokens_spent": price}
+        elif method == "POST" and path == "/api/submit":
+            ids = json.loads(body)["ids"]
+            with self.lock:
+                if not self.available_benchmarks:
+                    return 400, {}, json.dumps({"error": "Bad Request", "message": "No benchmarks left"}).encode()
+                self.available_benchmarks -= 1
+                score = len(set(ids) & set(range(1000))) / 1000
+                self.benchmarks.append(score)
+            payload = {"available_benchmarks": self.available_benchmarks, "available_tokens": self.available_tokens,
+                       "benchmarks": self.benchmarks, "best_benchmark_score": max(self.benchmarks),
+                       "last_benchmark_score": score}
+        else:
+            return 404, {}, json.dumps({"error": "Not Found", "message": path}).encode()
+
+        content = json.dumps(payload).encode()
+        if method == "GET":
+            etag = '"' + hashlib.md5(content).hexdigest() + '"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, b""
+            return 200, {"ETag": etag}, content
+        return 200, {}, content
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                with stand_in.lock:
+                    stand_in.requests.append((self.command, self.path, dict(self.headers)))
+                    stand_in.bodies.append(body)
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                try:
+                    if stand_in.delay:
+                        time.sleep(stand_in.delay)
+                    status, headers, content = stand_in.handle(self.command, self.path, self.headers, body)
+                finally:
+                    with stand_in.lock:
+                        stand_in.in_flight -= 1
+
+                self.send_response(status)
+                self.send_header("Server-Timing", f"app;dur={stand_in.delay * 1000:.2f}")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if isinstance(content, list):
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for record in content:
+                        line = json.dumps(record).encode() + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = _serve
+            do_POST = _serve
+
+        return Handler
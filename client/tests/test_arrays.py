@@ -0,0 +1,114 @@
+import json
+import unittest
+
+import numpy as np
+
+from src import arrays
+from src.arrays import LabelArrays, labels_to_arrays, submission_digest, validate_ids
+from src.client import DOChallengeClient, LabExperimentResponse, SubmitResponse
+from src.configs import Config
+from src.transport import HTTPTransport
+from tests.stand_in_server import StandInServer
+
+
+class TestArrays(unittest.TestCase):
+    def test_validate_ids(self):
+        np.testing.assert_array_equal(validate_ids([1, "2", 3]), [1, 2, 3])
+        self.assertEqual(validate_ids(np.arange(3, dtype=np.int32)).dtype, np.int64)
+        self.assertEqual(validate_ids(np.array(["4", "5"])).tolist(), [4, 5])
+        self.assertEqual(validate_ids([]).tolist(), [])
+        for ids in ([1.5], [1, "x"], ["-1"], [None], [[1, 2], [3, 4]], np.array([0.5])):
+            with self.assertRaises(ValueError, msg=ids):
+                validate_ids(ids)
+        with self.assertRaisesRegex(ValueError, "experiment_ids should be a list"):
+            validate_ids((1, 2), "experiment_ids")
+        max_id = np.iinfo(np.int64).max
+        self.assertEqual(validate_ids(np.array([max_id], dtype=np.uint64)).tolist(), [max_id])
+        for ids in (np.array([1, max_id + 1], dtype=np.uint64), [max_id + 1], [2 ** 64], [1, 2 ** 64],
+                    [str(max_id + 1)], ["18446744073709551616"]):
+            with self.assertRaisesRegex(ValueError, "64-bit", msg=ids):
+                validate_ids(ids)
+
+    def test_submission_digest(self):
+        ids = np.arange(10)
+        self.assertEqual(submission_digest(ids), submission_digest(ids[::-1].astype(np.int32)))
+        self.assertNotEqual(submission_digest(ids), submission_digest(ids + 1))
+        with self.assertRaisesRegex(ValueError, "duplicates"):
+            submission_digest(np.array([1, 2, 1]))
+
+    def test_labels_to_arrays(self):
+        ids, scores = labels_to_arrays({"10": 0.5, "3": -1.25, "7": float("nan")})
+        np.testing.assert_array_equal(ids, [10, 3, 7])
+        np.testing.assert_array_equal(scores, [0.5, -1.25, np.nan])
+        ids, scores = labels_to_arrays({})
+        self.assertEqual((ids.dtype, len(ids), len(scores)), (np.int64, 0, 0))
+
+    def test_dumps(self):
+        payload = {"ids": np.array([1, 2], dtype=np.int64)}
+        self.assertEqual(json.loads(arrays.dumps(payload)), {"ids": [1, 2]})
+        orjson, arrays.orjson = arrays.orjson, None
+        try:
+            self.assertEqual(json.loads(arrays.dumps(payload)), {"ids": [1, 2]})
+        finally:
+            arrays.orjson = orjson
+
+
+class TestClientArrays(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.client = DOChallengeClient("secret", transport=HTTPTransport(backoff_factor=0))
+        self.client.base_url = self.server.base_url
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_lab_experiment_array(self):
+        response = self.client.lab_experiment_array(np.array([5, 3, 8]))
+        self.assertIsInstance(response, LabelArrays)
+        np.testing.assert_array_equal(response.ids, [5, 3, 8])
+        np.testing.assert_array_equal(response.scores, [StandInServer.label(i) for i in (5, 3, 8)])
+        self.assertEqual(response.available_tokens, 100000 - 3)
+        self.assertEqual(json.loads(self.server.bodies[-1]), {"ids": [5, 3, 8]})
+
+    def test_lab_experiment_frame(self):
+        frame = self.client.lab_experiment_frame([2, 4])
+        self.assertEqual(frame.index.tolist(), [2, 4])
+        self.assertEqual(frame["score"].tolist(), [StandInServer.label(2), StandInServer.label(4)])
+        self.assertEqual(frame.attrs["available_tokens"], 100000 - 2)
+
+    def test_models_accept_arrays(self):
+        response = self.client.lab_experiment(np.arange(3))
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertEqual(response.labels, {str(i): StandInServer.label(i) for i in range(3)})
+        response = self.client.submit(np.arange(Config.SUBMISSION_LENGTH))
+        self.assertIsInstance(response, SubmitResponse)
+        with self.assertRaises(ValueError):
+            self.client.submit(np.arange(10))
+
+    def test_float_available_tokens(self):
+        self.server.available_tokens = 100000.0
+        response = self.client.lab_experiment([1, 2])
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertEqual(response.available_tokens, 99998)
+        self.assertIsInstance(response.available_tokens, int)
+
+    def test_submit_answers_repeats_locally(self):
+        ids = np.arange(Config.SUBMISSION_LENGTH)
+        first = self.client.submit(ids)
+        self.client.submit(ids + 500)
+        repeated = self.client.submit(ids[::-1].tolist())
+        self.assertEqual(repeated.last_benchmark_score, first.last_benchmark_score)
+        self.assertEqual(repeated.available_benchmarks, 1)
+        self.assertEqual(len(self.client.submissions), 2)
+        self.assertEqual(self.server.available_benchmarks, 1)
+
+        duplicated = ids.copy()
+        duplicated[-1] = 0
+        with self.assertRaisesRegex(ValueError, "duplicates"):
+            self.client.submit(duplicated)
+        self.assertEqual(sum(path.endswith("/submit") for _, path, _ in self.server.requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+
+from src.async_client import AsyncDOChallengeClient
+from src.client import (
+    APIErrorResponse,
+    LabExperimentResponse,
+    RemainedBudgetResponse,
+    RequestedIDsResponse,
+    SubmitResponse,
+)
+from src.configs import Config
+from tests.stand_in_server import StandInServer
+
+
+class TestAsyncDOChallengeClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = StandInServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def make_client(self, secret_key="secret", **kwargs):
+        kwargs.setdefault("backoff_factor", 0)
+        client = AsyncDOChallengeClient(secret_key, **kwargs)
+        client.base_url = self.server.base_url
+        return client
+
+    async def test_operations_return_shared_models(self):
+        async with self.make_client() as client:
+            labels = await client.lab_experiment([1, 2, "3"])
+            self.assertIsInstance(labels, LabExperimentResponse)
+            self.assertEqual(labels.labels, {str(i): StandInServer.label(i) for i in (1, 2, 3)})
+            self.assertEqual(labels.available_tokens, 100000 - 3)
+
+            requested = await client.requested_ids()
+            self.assertIsInstance(requested, RequestedIDsResponse)
+            self.assertEqual(requested.requested_ids, [1, 2, 3])
+
+            submitted = await client.submit(list(range(Config.SUBMISSION_LENGTH)))
+            self.assertIsInstance(submitted, SubmitResponse)
+            self.assertEqual(submitted.last_benchmark_score, 1.0)
+
+            budget = await client.remained_budget()
+            self.assertIsInstance(budget, RemainedBudgetResponse)
+            self.assertEqual(budget.available_benchmarks, 2)
+
+        submit = next(headers for method, path, headers in self.server.requests if path == "/api/submit")
+        self.assertEqual(submit["Content-Encoding"], "gzip")
+        self.assertIn("Idempotency-Key", submit)
+
+    async def test_validation(self):
+        async with self.make_client() as client:
+            with self.assertRaises(ValueError):
+                await client.lab_experiment((1, 2))
+            with self.assertRaises(ValueError):
+                await client.lab_experiment([1, "x"])
+            with self.assertRaises(ValueError):
+                await client.submit([1, 2])
+        with self.assertRaises(ValueError):
+            AsyncDOChallengeClient("")
+        self.assertEqual(self.server.requests, [])
+
+    async def test_error_response(self):
+        async with self.make_client("wrong") as client:
+            response = await client.remained_budget()
+        self.assertIsInstance(response, APIErrorResponse)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.message, "Invalid token")
+
+    async def test_concurrency_limit(self):
+        self.server.delay = 0.05
+        async with self.make_client(max_concurrency=3) as client:
+            responses = await asyncio.gather(*[client.lab_experiment([i]) for i in range(12)])
+        self.assertTrue(all(isinstance(response, LabExperimentResponse) for response in responses))
+        self.assertEqual(self.server.max_in_flight, 3)
+        self.assertEqual(sorted(self.server.requested_ids), list(range(12)))
+
+    async def test_cancellation(self):
+        self.server.delay = 0.5
+        async with self.make_client(max_concurrency=1) as client:
+            task = asyncio.create_task(client.lab_experiment([1]))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            self.server.delay = 0
+            # the cancelled call gave its concurrency slot back
+            response = await asyncio.wait_for(client.remained_budget(), timeout=5)
+            self.assertIsInstance(response, RemainedBudgetResponse)
+
+    async def test_retries_with_the_same_idempotency_key(self):
+        self.server.fail_next = [503, 429]
+        async with self.make_client() as client:
+            response = await client.lab_experiment([5])
+        self.assertIsInstance(response, LabExperimentResponse)
+        keys = [headers["Idempotency-Key"] for method, path, headers in self.server.requests]
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(len(set(keys)), 1)
+
+    async def test_retries_give_up(self):
+        self.server.fail_next = [503] * 3
+        async with self.make_client(max_retries=2) as client:
+            response = await client.remained_budget()
+        self.assertIsInstance(response, APIErrorResponse)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.requests), 3)
+
+    async def test_streamed_lab_experiment(self):
+        chunks = []
+        async with self.make_client() as client:
+            response = await client.lab_experiment([1, 2, 3], stream=True, on_labels=chunks.append)
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(response.labels, {str(i): StandInServer.label(i) for i in (1, 2, 3)})
+        self.assertEqual(response.available_tokens, 100000 - 3)
+
+    async def test_conditional_get(self):
+        async with self.make_client() as client:
+            first = await client.requested_ids()
+            second = await client.requested_ids()
+        self.assertEqual(first, second)
+        self.assertIn("If-None-Match", self.server.requests[-1][2])
+
+
+if __name__ == "__main__":
+    unittest.main()
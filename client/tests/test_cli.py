@@ -0,0 +1,114 @@
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from src import cli
+from src.configs import Config
+from src.label_cache import LabelCache
+from tests.stand_in_server import StandInServer
+
+
+class TestReaders(unittest.TestCase):
+    def test_iter_id_chunks(self):
+        stream = io.StringIO("id,smiles\n5,CC\n\n7,CO\n9\nnot an id\n11\n")
+        self.assertEqual(list(cli.iter_id_chunks(stream, 2)), [[5, 7], [9, 11]])
+        self.assertEqual(list(cli.iter_id_chunks(io.StringIO(""), 2)), [])
+
+    def test_top_scored_ids(self):
+        stream = io.StringIO("score,id\n0.5,1\n0.9,2\n0.1,3\n0.7,4\n0.95,2\n")
+        self.assertEqual(cli.top_scored_ids(stream, 2), [2, 4])
+        stream = io.StringIO("1,0.5\n2,0.9\n3,0.1\n4,0.7\n")
+        self.assertEqual(cli.top_scored_ids(stream, 3, ascending=True), [3, 1, 4])
+        self.assertEqual(cli.top_scored_ids(io.StringIO("1,0.5\n"), 3), [1])
+
+
+class TestCommands(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+        self.server.stop()
+
+    def run_cli(self, *argv, stdin=""):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr), \
+                unittest.mock.patch("sys.stdin", io.StringIO(stdin)):
+            code = cli.main(["--secret-key", "secret", "--base-url", self.server.base_url, *argv])
+        return code, stdout.getvalue(), stderr.getvalue()
+
+    def test_budget(self):
+        code, stdout, _ = self.run_cli("budget")
+        self.assertEqual(code, 0)
+        self.assertIn("tokens=100000 benchmarks=3", stdout)
+
+        code, stdout, _ = self.run_cli("budget", "--watch", "0.01", "--iterations", "3")
+        self.assertEqual((code, stdout.count("tokens=")), (0, 1))
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_labels_to_csv(self):
+        with open(os.path.join(self.path, "ids.txt"), "w") as f:
+            f.write("\n".join(str(idx) for idx in range(25)))
+        output = os.path.join(self.path, "labels.csv")
+        code, _, stderr = self.run_cli("labels", os.path.join(self.path, "ids.txt"), "-o", output,
+                                       "--chunk-size", "10")
+        self.assertEqual(code, 0)
+        self.assertIn("labeled=25 tokens=99975", stderr)
+        with open(output, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([int(row["id"]) for row in rows], list(range(25)))
+        self.assertEqual(float(rows[3]["score"]), StandInServer.label(3))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_labels_from_stdin(self):
+        code, stdout, _ = self.run_cli("labels", "-", stdin="4\n2\n")
+        self.assertEqual(code, 0)
+        self.assertEqual(stdout.splitlines(), ["id,score", f"4,{StandInServer.label(4)}", f"2,{StandInServer.label(2)}"])
+
+    def test_labels_error(self):
+        self.server.available_tokens = 1
+        code, _, stderr = self.run_cli("labels", "-", stdin="4\n2\n")
+        self.assertEqual(code, 1)
+        self.assertIn("Not enough tokens", stderr)
+
+    def test_submit(self):
+        scores = "id,score\n" + "".join(f"{idx},{-idx}\n" for idx in range(5000))
+        code, stdout, _ = self.run_cli("submit", "-", "--dry-run", stdin=scores)
+        self.assertEqual(code, 0)
+        self.assertIn("Would submit 3000 ids, best first: [0, 1, 2, 3, 4]", stdout)
+        self.assertEqual(self.server.requests, [])
+
+        code, stdout, _ = self.run_cli("submit", "-", stdin=scores)
+        self.assertEqual(code, 0)
+        self.assertIn("score=1.0 best=1.0 benchmarks=2", stdout)
+        self.assertEqual(self.server.available_benchmarks, 2)
+
+        code, _, stderr = self.run_cli("submit", "-", stdin="1,0.5\n")
+        self.assertEqual(code, 1)
+        self.assertIn(f"1 distinct ids, {Config.SUBMISSION_LENGTH} are needed", stderr)
+
+    def test_sync(self):
+        self.server.requested_ids = [1, 2]
+        cache_path = os.path.join(self.path, "labels.sqlite3")
+        code, stdout, _ = self.run_cli("--cache", cache_path, "sync")
+        self.assertEqual((code, stdout.strip()), (0, "cached=2 fetched=2 dropped=0"))
+        cache = LabelCache(cache_path)
+        self.assertEqual(sorted(cache.ids("secret")), [1, 2])
+        cache.close()
+
+    def test_arguments(self):
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            cli.main(["--secret-key", "secret", "sync"])
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()), \
+                unittest.mock.patch.dict(os.environ, {cli.SECRET_KEY_ENV: ""}):
+            cli.main(["budget"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.client import DOChallengeClient, LabExperimentResponse
+from src.label_cache import LabelCache
+from src.transport import HTTPTransport
+from tests.stand_in_server import StandInServer
+
+
+class TestLabelCache(unittest.TestCase):
+    def test_persists_labels_per_team(self):
+        with tempfile.TemporaryDirectory() as path:
+            cache = LabelCache(os.path.join(path, "labels.sqlite3"))
+            cache.put("team-a", {"1": 0.5, "2": 1.5}, available_tokens=98)
+            cache.put("team-b", {"1": 9.0})
+            cache.close()
+
+            cache = LabelCache(os.path.join(path, "labels.sqlite3"))
+            self.assertEqual(cache.get("team-a", [1, 2, 3]), {1: 0.5, 2: 1.5})
+            self.assertEqual(cache.get("team-b", [1, 2]), {1: 9.0})
+            self.assertEqual(cache.available_tokens("team-a"), 98)
+            self.assertIsNone(cache.available_tokens("team-b"))
+            cache.discard("team-a", [2])
+            self.assertEqual(cache.ids("team-a"), [1])
+            cache.clear("team-a")
+            self.assertEqual(cache.ids("team-a"), [])
+            cache.close()
+
+            with open(os.path.join(path, "labels.sqlite3"), "rb") as f:
+                self.assertNotIn(b"team-a", f.read())
+
+    def test_large_lookups(self):
+        cache = LabelCache()
+        cache.put("team", {str(idx): idx / 10 for idx in range(0, 5000, 2)})
+        self.assertEqual(len(cache.get("team", range(5000))), 2500)
+
+
+class TestClientLabelCache(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.cache = LabelCache()
+        self.client = self.make_client()
+
+    def tearDown(self):
+        self.client.close()
+        self.cache.close()
+        self.server.stop()
+
+    def make_client(self):
+        client = DOChallengeClient("secret", transport=HTTPTransport(backoff_factor=0), label_cache=self.cache)
+        client.base_url = self.server.base_url
+        return client
+
+    def test_cached_ids_are_served_locally(self):
+        first = self.client.lab_experiment([1, 2, 3])
+        self.assertEqual(len(self.server.requests), 1)
+
+        second = self.client.lab_experiment([3, 2, 1])
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(second.labels, first.labels)
+        self.assertEqual(second.available_tokens, 100000 - 3)
+
+        third = self.client.lab_experiment([2, 4])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(json.loads(self.server.bodies[-1]), {"ids": [4]})
+        self.assertEqual(self.server.requested_ids, [1, 2, 3, 4])
+        self.assertEqual(third.labels, {"2": StandInServer.label(2), "4": StandInServer.label(4)})
+        self.assertEqual(third.available_tokens, 100000 - 4)
+
+    def test_streamed_labels_include_cached_ones(self):
+        self.client.lab_experiment([1, 2])
+        chunks = []
+        response = self.client.lab_experiment([1, 2, 3], stream=True, on_labels=chunks.append)
+        self.assertEqual(chunks[0], {"1": StandInServer.label(1), "2": StandInServer.label(2)})
+        self.assertEqual(len(response.labels), 3)
+
+    def test_reconcile(self):
+        # bought by an earlier run that had no cache
+        self.server.requested_ids = [5, 6, 7]
+        self.cache.put("secret", {"99": 1.0})
+
+        response = self.client.reconcile_label_cache()
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertEqual(sorted(response.labels), ["5", "6", "7"])
+        self.assertEqual(self.server.available_tokens, 100000)
+        self.assertEqual(sorted(self.cache.ids("secret")), [5, 6, 7])
+
+        requests = len(self.server.requests)
+        response = self.client.lab_experiment([5, 6, 7])
+        self.assertEqual(len(response.labels), 3)
+        self.assertEqual(len(self.server.requests), requests)
+
+    def test_budget_is_fetched_when_unknown(self):
+        self.cache.put("secret", {"1": 0.5})
+        response = self.client.lab_experiment([1])
+        self.assertEqual(response, LabExperimentResponse(available_tokens=100000, labels={"1": 0.5},
+                                                         tokens_spent=0))
+        self.assertEqual([path for _, path, _ in self.server.requests], ["/api/remained_budget"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from src.async_client import AsyncDOChallengeClient
+from src.client import APIErrorResponse, DOChallengeClient, LabExperimentResponse
+from src.scheduler import LabExperimentJob, TokenBucket, chunk_ids, rate_limit_cost
+from src.transport import HTTPTransport
+from tests.stand_in_server import StandInServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(unittest.TestCase):
+    def test_chunk_ids(self):
+        self.assertEqual(chunk_ids([], 5000), [])
+        self.assertEqual([len(batch) for batch in chunk_ids(list(range(12000)), 5000)], [4000, 4000, 4000])
+        # 5001 ids: two balanced batches rounded to whole units, not 5000 + 1
+        self.assertEqual([len(batch) for batch in chunk_ids(list(range(5001)), 5000)], [3000, 2001])
+        self.assertEqual([len(batch) for batch in chunk_ids(list(range(10)), 4)], [4, 4, 2])
+        self.assertEqual(sum(chunk_ids(list(range(9999)), 5000), []), list(range(9999)))
+        with self.assertRaises(ValueError):
+            chunk_ids([1], 0)
+
+    def test_rate_limit_cost(self):
+        self.assertEqual(rate_limit_cost([1]), 1)
+        self.assertEqual(rate_limit_cost(list(range(1000))), 1)
+        self.assertEqual(rate_limit_cost(list(range(1001))), 2)
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(300, 60, clock=clock)
+        self.assertEqual(bucket.reserve(300), 0)
+        self.assertAlmostEqual(bucket.reserve(5), 1.0)
+        # reservations queue up behind each other
+        self.assertAlmostEqual(bucket.reserve(5), 2.0)
+        clock.now = 2.0
+        self.assertAlmostEqual(bucket.reserve(5), 1.0)
+        clock.now = 1000
+        self.assertEqual(bucket.reserve(1), 0)
+        self.assertEqual(bucket.tokens, 299)
+
+    def test_job(self):
+        job = LabExperimentJob([3, "1", 3, 2], batch_size=2)
+        self.assertEqual(job.pending, [[3, 1], [2]])
+        self.assertEqual((job.labeled, job.total), (0, 3))
+        self.assertTrue(job.record([2], LabExperimentResponse(available_tokens=9, labels={"2": 0.5})))
+        self.assertFalse(job.record([3, 1], APIErrorResponse(error="Bad Request", message="Not enough tokens")))
+        self.assertEqual(job.result().message, "Not enough tokens")
+
+        with tempfile.TemporaryDirectory() as path:
+            job.save(os.path.join(path, "job.json"))
+            loaded = LabExperimentJob.load(os.path.join(path, "job.json"))
+        self.assertEqual((loaded.pending, loaded.labels, loaded.labeled), ([[3, 1]], {"2": 0.5}, 1))
+        loaded.record([3, 1], LabExperimentResponse(available_tokens=7, labels={"3": 0.1, "1": 0.2}))
+        self.assertEqual(loaded.result(), LabExperimentResponse(available_tokens=7,
+                                                                labels={"2": 0.5, "3": 0.1, "1": 0.2}, tokens_spent=0))
+
+        with self.assertRaises(ValueError):
+            LabExperimentJob([])
+        with self.assertRaises(ValueError):
+            LabExperimentJob([1, "x"])
+
+
+class TestBatchedLabExperiment(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(tokens=25000).start()
+        self.client = DOChallengeClient("secret", transport=HTTPTransport(backoff_factor=0))
+        self.client.base_url = self.server.base_url
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_merges_batches(self):
+        progress = []
+        response = self.client.lab_experiment_batched(list(range(12000)),
+                                                      on_progress=lambda *args: progress.append(args))
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertEqual(len(response.labels), 12000)
+        self.assertEqual(response.available_tokens, 25000 - 12000)
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(max(progress), (12000, 12000))
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_resumes_after_failure(self):
+        self.server.available_tokens = 2500
+        job = LabExperimentJob(list(range(3000)), batch_size=1000)
+        response = self.client.lab_experiment_batched(job, max_workers=1)
+        self.assertIsInstance(response, APIErrorResponse)
+        self.assertEqual(response.message, "Not enough tokens")
+        self.assertEqual(len(job.pending), 1)
+        self.assertEqual(len(job.labels), 2000)
+
+        self.server.available_tokens += 1000
+        response = self.client.lab_experiment_batched(job)
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertEqual(len(response.labels), 3000)
+        self.assertEqual(response.available_tokens, 500)
+        self.assertEqual(len(self.server.requests), 4)
+
+
+class TestAsyncBatchedLabExperiment(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = StandInServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def test_merges_batches(self):
+        progress = []
+        async with AsyncDOChallengeClient("secret", max_concurrency=2, backoff_factor=0) as client:
+            client.base_url = self.server.base_url
+            response = await client.lab_experiment_batched(list(range(12000)),
+                                                           on_progress=lambda *args: progress.append(args))
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertEqual(len(response.labels), 12000)
+        self.assertEqual(response.available_tokens, 100000 - 12000)
+        self.assertEqual(progress[-1], (12000, 12000))
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    async def test_rate_limited(self):
+        async with AsyncDOChallengeClient("secret", backoff_factor=0) as client:
+            client.base_url = self.server.base_url
+            client.lab_rate_limiter = TokenBucket(1, 0.1, capacity=1)
+            start = asyncio.get_running_loop().time()
+            response = await client.lab_experiment_batched(LabExperimentJob(list(range(4)), batch_size=1))
+            elapsed = asyncio.get_running_loop().time() - start
+        self.assertIsInstance(response, LabExperimentResponse)
+        self.assertGreaterEqual(elapsed, 0.29)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.client import LabExperimentResponse, SubmitResponse
+from src.simulation import ChallengeSimulation, SimulationTransport
+
+
+class TestChallengeSimulation(unittest.TestCase):
+    def setUp(self):
+        ids = np.arange(100, 200)
+        self.simulation = ChallengeSimulation(ids, ids / 10, top_ids=ids[-10:], tokens=50, submission_length=20)
+        self.client = self.simulation.client("team")
+
+    def test_labels_and_budget(self):
+        response = self.client.lab_experiment([105, "101", 105])
+        self.assertEqual(response, LabExperimentResponse(available_tokens=48, labels={"105": 10.5, "101": 10.1},
+                                                         tokens_spent=2))
+        # ids already bought are free
+        self.assertEqual(self.client.lab_experiment([101, 102]).available_tokens, 47)
+        self.assertEqual(self.client.requested_ids().requested_ids, [105, 101, 102])
+        self.assertEqual(self.client.remained_budget().available_tokens, 47)
+
+        response = self.client.lab_experiment(list(range(110, 160)))
+        self.assertEqual((response.status_code, response.message), (400, "Not enough tokens"))
+        self.assertEqual(self.client.remained_budget().available_tokens, 47)
+
+        response = self.client.lab_experiment([100, 99])
+        self.assertEqual(response.message, "Index 99 not found in the dataset")
+
+    def test_streamed_labels(self):
+        self.simulation.stream_chunk_size = 2
+        chunks = []
+        response = self.client.lab_experiment([100, 101, 102], stream=True, on_labels=chunks.append)
+        self.assertEqual(chunks, [{"100": 10.0, "101": 10.1}, {"102": 10.2}])
+        self.assertEqual(response.available_tokens, 47)
+
+    def test_submit(self):
+        submission = list(range(180, 200))
+
+        first = self.simulation.submit("team", {"ids": submission})
+        self.assertEqual((first["last_benchmark_score"], first["available_benchmarks"]), (100.0, 2))
+        # an unchanged submission is replayed without spending a benchmark
+        replay = self.simulation.submit("team", {"ids": submission})
+        self.assertEqual((replay["message"], replay["available_benchmarks"]), ("Submission already benchmarked", 2))
+        self.simulation.submit("team", {"ids": list(range(100, 120))})
+        last = self.simulation.submit("team", {"ids": list(range(185, 195)) + list(range(100, 110))})
+        self.assertEqual((last["last_benchmark_score"], last["best_benchmark_score"]), (50.0, 100.0))
+        self.assertEqual(last["benchmarks"], [100.0, 0.0, 50.0])
+
+        status, payload = self.simulation.handle("POST", "submit", {"X-TOKEN": "team"},
+                                                 b'{"ids": [' + b",".join(b"1%02d" % i for i in range(20)) + b']}')
+        self.assertEqual((status, payload["message"]), (400, "No benchmarks available"))
+
+    def test_submit_errors(self):
+        status, payload = self.simulation.handle("POST", "submit", {"X-TOKEN": "team"}, b'{"ids": [100]}')
+        self.assertEqual((status, payload["message"]), (400, "Expected 20 indexes, got 1"))
+        status, payload = self.simulation.handle("POST", "submit", {"X-TOKEN": "team"},
+                                                 b'{"ids": [' + b",".join([b"5"] * 20) + b']}')
+        self.assertEqual((status, payload["message"]), (400, "Invalid id provided, please check."))
+        status, payload = self.simulation.handle("POST", "submit", {"X-TOKEN": "team"}, b'{"ids": 5}')
+        self.assertEqual(payload["message"], "Indexes should be a list")
+
+    def test_client_submit(self):
+        simulation = ChallengeSimulation.synthetic(10000, top_k=100, seed=1)
+        client = simulation.client()
+        top_ids = sorted(simulation.top_ids)
+        other_ids = [idx for idx in range(10000) if idx not in simulation.top_ids]
+        response = client.submit(top_ids[:50] + other_ids[:2950])
+        self.assertIsInstance(response, SubmitResponse)
+        self.assertEqual(response.last_benchmark_score, 50.0)
+
+    def test_auth_and_idempotency(self):
+        self.assertEqual(self.simulation.handle("GET", "remained_budget", {}, None)[0], 401)
+        self.assertEqual(self.simulation.handle("GET", "remained_budget", {"X-TOKEN": "other"}, None)[0], 403)
+        self.assertEqual(self.simulation.handle("GET", "unknown", {"X-TOKEN": "team"}, None)[0], 404)
+
+        headers = {"X-TOKEN": "team", "Idempotency-Key": "key"}
+        first = self.simulation.handle("POST", "lab_experiment", headers, b'{"ids": [100]}')
+        retried = self.simulation.handle("POST", "lab_experiment", headers, b'{"ids": [100]}')
+        self.assertEqual(first, retried)
+        self.assertEqual(self.simulation.teams["team"].available_tokens, 49)
+
+    def test_teams_are_independent(self):
+        other = self.simulation.client("other")
+        self.client.lab_experiment([100])
+        self.assertEqual(other.remained_budget().available_tokens, 50)
+        self.assertIsInstance(other.transport, SimulationTransport)
+
+    def test_from_files(self):
+        labels_df = pd.DataFrame({"score": [1.0, 3.0, 2.0]}, index=pd.Index([7, 8, 9]))
+        with tempfile.TemporaryDirectory() as path:
+            labels_df.to_pickle(os.path.join(path, "labels_df.pkl"))
+            labels_df.nlargest(1, "score")[[]].to_pickle(os.path.join(path, "top1000_df.pkl"))
+            labels_df.rename_axis("id").to_csv(os.path.join(path, "labels.csv"))
+            pd.DataFrame({"id": [8]}).to_csv(os.path.join(path, "top.csv"), index=False)
+
+            for labels_file, top_file in (("labels_df.pkl", "top1000_df.pkl"), ("labels.csv", "top.csv")):
+                simulation = ChallengeSimulation.from_files(os.path.join(path, labels_file),
+                                                            os.path.join(path, top_file), submission_length=1)
+                self.assertEqual(simulation.top_ids, {8})
+                client = simulation.client()
+                self.assertEqual(client.lab_experiment([9, 7]).labels, {"9": 2.0, "7": 1.0})
+
+    def test_synthetic(self):
+        simulation = ChallengeSimulation.synthetic(5000, top_k=100, seed=3)
+        self.assertEqual(len(simulation.ids), 5000)
+        self.assertEqual(len(simulation.top_ids), 100)
+        threshold = np.sort(simulation.scores)[-100]
+        self.assertTrue(all(simulation.labels([idx])[0] >= threshold for idx in simulation.top_ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from src.client import DOChallengeClient
+from src.simulation import ChallengeSimulation
+from src.telemetry import Hooks, TelemetryCollector, server_time
+from src.transport import HTTPTransport
+from tests.stand_in_server import StandInServer
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.hooks = Hooks()
+        self.collector = TelemetryCollector(self.hooks)
+        self.client = DOChallengeClient("secret", transport=HTTPTransport(backoff_factor=0), hooks=self.hooks)
+        self.client.base_url = self.server.base_url
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_records_calls(self):
+        events = []
+        self.hooks.register("before_request", lambda record: events.append(("before_request", record.operation)))
+        self.hooks.register("on_retry", lambda record, attempt, delay, reason: events.append(("on_retry", reason)))
+        self.hooks.register("after_response", lambda record: events.append(("after_response", record.status_code)))
+
+        self.server.delay = 0.02
+        self.client.remained_budget()
+        self.server.fail_next = [503]
+        self.client.lab_experiment([1, 2, 3])
+
+        self.assertEqual(events, [("before_request", "remained_budget"), ("after_response", 200),
+                                  ("before_request", "lab_experiment"), ("on_retry", 503),
+                                  ("before_request", "lab_experiment"), ("after_response", 200)])
+        budget, labels = self.collector.records
+        self.assertGreater(budget.connect_ms, 0)
+        self.assertEqual(labels.connect_ms, 0)
+        self.assertEqual(budget.server_ms, 20.0)
+        self.assertEqual((labels.method, labels.ids, labels.retries), ("POST", 3, 1))
+        self.assertEqual(labels.tokens_spent, 3)
+        self.assertGreater(labels.request_bytes, 0)
+        self.assertGreater(labels.response_bytes, 0)
+        for record in (budget, labels):
+            parts = record.connect_ms + record.server_ms + record.network_ms + record.retry_wait_ms + record.parse_ms
+            self.assertAlmostEqual(parts, record.total_ms, delta=0.01)
+
+    def test_errors(self):
+        self.server.token = "other"
+        self.client.remained_budget()
+        with self.assertRaises(ValueError):
+            self.client.lab_experiment("1")
+        first, second = self.collector.records
+        self.assertEqual((first.status_code, first.error), (401, "Unauthorized"))
+        self.assertIn("ValueError", second.error)
+
+    def test_summary_and_export(self):
+        self.client.lab_experiment([1])
+        self.client.lab_experiment([2])
+        self.client.requested_ids()
+        summary = self.collector.summary()
+        self.assertEqual(summary["total"]["calls"], 3)
+        self.assertEqual(summary["operations"]["lab_experiment"]["calls"], 2)
+        self.assertEqual(summary["operations"]["lab_experiment"]["tokens_spent"], 2)
+        self.assertIsNotNone(summary["operations"]["requested_ids"]["p95_ms"])
+
+        with tempfile.TemporaryDirectory() as path:
+            self.collector.to_json(os.path.join(path, "calls.json"))
+            self.collector.to_csv(os.path.join(path, "calls.csv"))
+            with open(os.path.join(path, "calls.json")) as f:
+                exported = json.load(f)
+            with open(os.path.join(path, "calls.csv"), newline="") as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(exported["records"]), 3)
+        self.assertEqual(exported["summary"]["total"]["calls"], 3)
+        self.assertEqual([row["operation"] for row in rows], ["lab_experiment", "lab_experiment", "requested_ids"])
+
+    def test_without_hooks(self):
+        client = DOChallengeClient("secret", transport=HTTPTransport(backoff_factor=0))
+        client.base_url = self.server.base_url
+        self.assertEqual(client.remained_budget().available_tokens, 100000)
+        self.assertEqual(self.collector.records, [])
+
+    def test_simulation(self):
+        simulation = ChallengeSimulation.synthetic(1000, top_k=10)
+        client = simulation.client(hooks=self.hooks)
+        client.lab_experiment([1, 2])
+        record, = self.collector.records
+        self.assertEqual((record.operation, record.status_code, record.ids), ("lab_experiment", 200, 2))
+        self.assertGreater(record.server_ms, 0)
+
+    def test_tokens_spent_matches_the_budget(self):
+        simulation = ChallengeSimulation.synthetic(100_000, top_k=10)
+        client = simulation.client(hooks=self.hooks)
+        other = simulation.client()
+        client.lab_experiment(list(range(10)))
+        # spend of another client of the same team is not attributed to this one
+        other.lab_experiment(list(range(100, 400)))
+        client.lab_experiment(list(range(5, 15)))
+        response = client.lab_experiment_batched(list(range(1000, 51000)))
+        self.assertEqual(response.tokens_spent, 50000)
+
+        own_spend = 10 + 5 + 50000
+        team = simulation.teams["simulation"]
+        self.assertEqual(simulation.tokens - team.available_tokens, own_spend + 300)
+        summary = self.collector.summary()
+        self.assertEqual(summary["total"]["tokens_spent"], own_spend)
+        self.assertGreater(summary["operations"]["lab_experiment"]["calls"], 3)
+        self.assertTrue(all(record.tokens_spent is not None for record in self.collector.records))
+
+    def test_server_time(self):
+        self.assertEqual(server_time({"Server-Timing": "app;dur=12.5"}), 12.5)
+        self.assertEqual(server_time({"Server-Timing": "db;dur=3, app;desc=\"x\";dur=4"}), 4.0)
+        self.assertEqual(server_time({}), 0.0)
+
+    def test_unknown_event(self):
+        with self.assertRaises(ValueError):
+            self.hooks.register("on_error", print)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import time
+import unittest
+from email.utils import formatdate
+from unittest.mock import patch
+
+from src.configs import Config
+from src.transport import HTTPTransport
+from tests.stand_in_server import StandInServer
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.transport = HTTPTransport(max_retries=2, backoff_factor=0)
+        self.headers = {"X-TOKEN": "secret"}
+        self.sleeps = []
+        patcher = patch("src.transport.time.sleep", self.sleeps.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def get(self, **kwargs):
+        return self.transport.request("GET", f"{self.server.base_url}/remained_budget", self.headers, **kwargs)
+
+    def post(self, headers, **kwargs):
+        return self.transport.request("POST", f"{self.server.base_url}/lab_experiment", headers,
+                                      data=b'{"ids": [1]}', **kwargs)
+
+    def test_retry_after_seconds(self):
+        self.server.fail_next = [503, 429]
+        self.server.retry_after = "1.5"
+        response = self.get(retry=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sleeps, [1.5, 1.5])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_retry_after_http_date(self):
+        self.server.fail_next = [503]
+        self.server.retry_after = formatdate(time.time() + 30, usegmt=True)
+        self.assertEqual(self.get(retry=True).status_code, 200)
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertTrue(28 <= self.sleeps[0] <= 30, self.sleeps)
+
+        self.server.fail_next = [503]
+        self.server.retry_after = formatdate(time.time() + 10 * Config.MAX_RETRY_AFTER, usegmt=True)
+        self.get(retry=True)
+        self.assertEqual(self.sleeps[1], Config.MAX_RETRY_AFTER)
+
+        self.server.fail_next = [503]
+        self.server.retry_after = formatdate(time.time() - 60, usegmt=True)
+        self.get(retry=True)
+        self.assertEqual(self.sleeps[2], 0)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.fail_next = [503] * 5
+        response = self.get(retry=True)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertEqual(self.server.fail_next, [503, 503])
+
+    def test_conflict_retried_only_with_idempotency_key(self):
+        self.server.fail_next = [409]
+        response = self.post(self.headers, retry=True)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.server.fail_next = [409]
+        response = self.post({**self.headers, "Idempotency-Key": "key"}, retry=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.requests[1][2]["Idempotency-Key"], self.server.requests[2][2]["Idempotency-Key"])
+
+    def test_no_retry_when_disabled(self):
+        for status in (429, 503):
+            self.server.fail_next = [status]
+            self.assertEqual(self.get(retry=False).status_code, status)
+        self.server.fail_next = [409]
+        self.assertEqual(self.post({**self.headers, "Idempotency-Key": "key"}).status_code, 409)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.sleeps, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ from typing import (
     Any,
     Dict,
     List,
+    Literal,
     Optional,
     Union,
 )
@@ -34,6 +35,8 @@ class Settings(BaseSettings):
     MONGO_TLS_CA_FILE: str = ""
     MONGO_TLS_CertificateKeyFile: str = ""
     MONGO_DATABASE_URI: Optional[MongoDsn] = None
+    STORAGE_BACKEND: Literal["mongo", "memory"] = "mongo"
+    MEMORY_DB_SNAPSHOT: str = ""
 
     DATASETS_PATH: str
 
@@ -41,6 +44,39 @@ class Settings(BaseSettings):
     CHALLENGE_INITIAL_TOKENS: int = 100000
     CHALLENGE_BENCHMARKS: int = 3
     CORRECT_LABEL_PRICE: int = 1
+    LAB_EXPERIMENT_STREAM_CHUNK_SIZE: int = 1000
+
+    RATE_LIMIT_STORAGE_URI: str = ""
+    RATE_LIMIT_STRATEGY: str = "sliding-window-counter"
+    RATE_LIMIT_DEFAULT: str = "100 per minute"
+    RATE_LIMIT_LAB_EXPERIMENT: str = "300 per minute"
+    RATE_LIMIT_SUBMIT: str = "30 per minute"
+    RATE_LIMIT_IDS_PER_UNIT: int = 1000
+
+    COMPRESS_MIN_SIZE: int = 1024
+    MAX_DECOMPRESSED_REQUEST_SIZE: int = 64 * 1024 * 1024
+
+    MAX_PAGE_SIZE: int = 10000
+
+    PROVISIONING_WORKERS: int = 0
+    PROVISIONING_PARALLEL_THRESHOLD: int = 8
+    PROVISIONING_MAX_TEAMS: int = 5000
+    ID_MAPPINGS_SEED: Optional[int] = None
+
+    SINGLE_FLIGHT_TTL: float = 1.0
+    SINGLE_FLIGHT_STALE_TTL: float = 5.0
+
+    EVENTS_CAPPED_SIZE: int = 16 * 1024 * 1024
+    EVENTS_QUEUE_SIZE: int = 1000
+    EVENTS_HEARTBEAT_INTERVAL: int = 15
+
+    IDEMPOTENCY_KEY_TTL: int = 24 * 60 * 60
+    IDEMPOTENCY_PENDING_TTL: int = 5 * 60
+    IDEMPOTENCY_MAX_BODY_SIZE: int = 8 * 1024 * 1024
+
+    PROFILE_SAMPLE_RATE: int = 0
+    PROFILE_DIR: str = "logs/profiles"
+    PROFILE_MAX_FILES: int = 200
 
     @validator("MONGO_DATABASE_URI", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
@@ -4,7 +4,7 @@ import time
 from dotenv import load_dotenv
 from werkzeug.exceptions import (
     NotFound, BadRequest, Unauthorized, Forbidden,
-    MethodNotAllowed, TooManyRequests, InternalServerError
+    MethodNotAllowed, Conflict, TooManyRequests, InternalServerError
 )
 
 from flask import Flask, request, g
@@ -12,10 +12,14 @@ from app.routes.main import main_blueprint
 from app.routes.teams import teams_blueprint
 from app.routes.challanges import challenges_blueprint
 from app.routes.tasks import tasks_blueprint
+from app.routes.profiles import profiles_blueprint
 from app.routes.error_handler import json_error_handler, internal_server_error
+from app.routes.rate_limits import limiter
+from app.config.core import settings
 from app.config.core.logger import logger
+from app.middleware import GzipRequestMiddleware
 from flasgger import Swagger
-from flask_limiter import Limiter
+from flask_compress import Compress
 from flask_cors import CORS
 from app.models.db import create_mongo_connection
 
@@ -28,22 +32,33 @@ app.config['SWAGGER'] = {
 }
 swagger = Swagger(app)
 
-def get_token():
-    return request.headers.get("X-TOKEN", "anonymous")
+limiter.init_app(app)
 
-limiter = Limiter(app=app, key_func=get_token, default_limits=["100 per minute"])
+# Response compression negotiated with Accept-Encoding, gzip request bodies.
+# Streamed JSON lists are compressed too; the NDJSON lab stream and the event stream
+# are not in COMPRESS_MIMETYPES, so their chunks are never held back.
+app.config['COMPRESS_ALGORITHM'] = ['zstd', 'gzip']
+app.config['COMPRESS_ALGORITHM_STREAMING'] = ['zstd', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = settings.COMPRESS_MIN_SIZE
+app.config['COMPRESS_STREAMS'] = True
+Compress(app)
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app, max_size=settings.MAX_DECOMPRESSED_REQUEST_SIZE)
 
 CORS(app,
      supports_credentials=True,
      resources={r"/*": {"origins": "*"}},
      methods=["GET", "POST", "OPTIONS"],
-     allow_headers=["Content-Type", "X-API-KEY", "X-TOKEN"])
+     allow_headers=["Content-Type", "Content-Encoding", "X-API-KEY", "X-TOKEN", "Idempotency-Key", "If-None-Match",
+                    "X-Profile"],
+     expose_headers=["ETag", "Server-Timing", "X-Profile-Id",
+                     "X-Profile-Greenlet-Switches"])
 
 # Register blueprints
 app.register_blueprint(main_blueprint, url_prefix='/api')
 app.register_blueprint(teams_blueprint, url_prefix='/api/teams')
 app.register_blueprint(challenges_blueprint, url_prefix='/api/challenges')
 app.register_blueprint(tasks_blueprint, url_prefix='/api/tasks')
+app.register_blueprint(profiles_blueprint, url_prefix='/api/profiles')
 
 # Error Handlers
 app.register_error_handler(BadRequest, lambda e: json_error_handler(e, 400, "Bad Request"))
@@ -51,6 +66,7 @@ app.register_error_handler(Unauthorized, lambda e: json_error_handler(e, 401, "U
 app.register_error_handler(Forbidden, lambda e: json_error_handler(e, 403, "Forbidden"))
 app.register_error_handler(NotFound, lambda e: json_error_handler(e, 404, "Not Found"))
 app.register_error_handler(MethodNotAllowed, lambda e: json_error_handler(e, 405, "Method Not Allowed"))
+app.register_error_handler(Conflict, lambda e: json_error_handler(e, 409, "Conflict"))
 app.register_error_handler(TooManyRequests, lambda e: json_error_handler(e, 429, "Too Many Requests"))
 app.register_error_handler(InternalServerError, lambda e: json_error_handler(e, 500, "Internal Server Error"))
 app.register_error_handler(Exception, lambda e: internal_server_error(e))
@@ -93,6 +109,9 @@ def log_response_info(response):
         return response
 
     execution_time = (time.time() - g.start_time) * 1000 if hasattr(g, "start_time") else None
+    if execution_time is not None:
+        # lets clients tell server time apart from network time
+        response.headers["Server-Timing"] = f"app;dur={execution_time:.2f}"
     log_message = (
         f"[RESPONSE] {response.status_code} {request.method} {request.url} | "
         f"Time: {execution_time:.2f}ms" if execution_time else "[RESPONSE] start_time not set"
@@ -0,0 +1,67 @@
+import io
+import json
+import zlib
+
+from werkzeug.wsgi import get_input_stream
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class GzipRequestMiddleware:
+    """
+    WSGI middleware that transparently decompresses request bodies sent with
+    Content-Encoding: gzip. The decompressed size is capped at max_size bytes
+    to protect the workers from decompression bombs.
+    """
+
+    def __init__(self, wsgi_app, max_size: int):
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if encoding in ("", "identity"):
+            return self.wsgi_app(environ, start_response)
+        if encoding != "gzip":
+            return self._error(start_response, "415 UNSUPPORTED MEDIA TYPE", "Unsupported Media Type",
+                               f"Unsupported Content-Encoding: {encoding}")
+
+        try:
+            body = self._decompress(get_input_stream(environ))
+        except RequestTooLarge:
+            return self._error(start_response, "413 REQUEST ENTITY TOO LARGE", "Request Entity Too Large",
+                               f"Decompressed body exceeds {self.max_size} bytes")
+        except zlib.error as e:
+            return self._error(start_response, "400 BAD REQUEST", "Bad Request", f"Invalid gzip body: {e}")
+
+        environ.pop("HTTP_CONTENT_ENCODING")
+        environ["wsgi.input"] = io.BytesIO(body)
+        environ["wsgi.input_terminated"] = True
+        environ["CONTENT_LENGTH"] = str(len(body))
+        return self.wsgi_app(environ, start_response)
+
+    def _decompress(self, stream) -> bytes:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = bytearray()
+        while chunk := stream.read(READ_CHUNK_SIZE):
+            while chunk:
+                body += decompressor.decompress(chunk, self.max_size + 1 - len(body))
+                if len(body) > self.max_size:
+                    raise RequestTooLarge()
+                chunk = decompressor.unconsumed_tail
+        body += decompressor.flush()
+        if len(body) > self.max_size:
+            raise RequestTooLarge()
+        if not decompressor.eof:
+            raise zlib.error("truncated stream")
+        return bytes(body)
+
+    @staticmethod
+    def _error(start_response, status, error_name, message):
+        body = json.dumps({"error": error_name, "message": message}).encode()
+        start_response(status, [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+        return [body]
@@ -1,9 +1,14 @@
+import atexit
+
 from pymongo import MongoClient
+from pymongo.errors import CollectionInvalid
 
 from app.config.core import settings
 from app.config.core.logger import logger
+from app.models.memory_db import MemoryDatabase
 
 mongo_client: MongoClient = None
+memory_database: MemoryDatabase = None
 
 
 def get_mongo_client():
@@ -36,7 +41,19 @@ def get_mongo_client():
     return mongo_client
 
 
+def get_memory_database():
+    global memory_database
+    if memory_database is None:
+        memory_database = MemoryDatabase(settings.MEMORY_DB_SNAPSHOT or None)
+        if settings.MEMORY_DB_SNAPSHOT:
+            atexit.register(memory_database.save)
+    return memory_database
+
+
 def get_database():
+    if settings.STORAGE_BACKEND == "memory":
+        return get_memory_database()
+
     client = get_mongo_client()
 
     return client.do2025challenge
@@ -44,16 +61,38 @@ def get_database():
 
 def create_indexes():
     db = get_database()
-    db.teams.create_index("name", unique=True)
-    db.challenges.create_index("title", unique=True)
-    db.tasks.create_index(["team_id", "challenge_id"], unique=True)
+    db.get_collection("teams").create_index("name", unique=True)
+    db.get_collection("teams").create_index("secret_key")
+    db.get_collection("challenges").create_index("title", unique=True)
+    db.get_collection("tasks").create_index(["team_id", "challenge_id"], unique=True)
+    db.get_collection("tasks").create_index("updated_at")
+    db.get_collection("idempotency_keys").create_index(["team_id", "key"], unique=True)
+    db.get_collection("idempotency_keys").create_index("created_at", expireAfterSeconds=settings.IDEMPOTENCY_KEY_TTL)
+    db.get_collection("events").create_index("seq")
+
+
+def create_collections():
+    db = get_database()
+    if "events" not in db.list_collection_names():
+        try:
+            db.create_collection("events", capped=True, size=settings.EVENTS_CAPPED_SIZE)
+        except CollectionInvalid:
+            # Created concurrently by another worker
+            pass
 
 
 def create_mongo_connection():
+    if settings.STORAGE_BACKEND == "memory":
+        create_collections()
+        create_indexes()
+        logger.info({'message': 'Using the in-memory database.'})
+        return None
+
     mongo_client = get_mongo_client()
 
     try:
         mongo_client.admin.command('ping')
+        create_collections()
         create_indexes()
 
         logger.info({'message': 'Connected to mongo.'})
@@ -0,0 +1,144 @@
+import os
+import pickle
+import threading
+from collections import deque
+from functools import wraps
+
+import bson
+import mongomock
+import pymongo
+
+LOCKED_METHODS = (
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete", "bulk_write", "create_index", "drop",
+)
+
+
+def _locked(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.database.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class MemoryCollection(mongomock.Collection):
+    """
+    mongomock collection whose writes hold the database lock, so conditional
+    updates such as find_one_and_update are atomic across threads like in MongoDB.
+    A collection created as capped drops its oldest documents beyond its size.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.capped_sizes = None
+
+    def create_index(self, keys, *args, **kwargs):
+        # pymongo 4 also takes a list of field names
+        if not isinstance(keys, str):
+            keys = [(key, pymongo.ASCENDING) if isinstance(key, str) else key for key in keys]
+        return super().create_index(keys, *args, **kwargs)
+
+    def insert_one(self, document, *args, **kwargs):
+        result = super().insert_one(document, *args, **kwargs)
+        self._trim([document])
+        return result
+
+    def insert_many(self, documents, *args, **kwargs):
+        documents = list(documents)
+        try:
+            return super().insert_many(documents, *args, **kwargs)
+        finally:
+            self._trim([document for document in documents if "_id" in document])
+
+    def _trim(self, documents: list):
+        size = self.database.capped.get(self.name)
+        if not size:
+            return
+        if self.capped_sizes is None:
+            self.capped_sizes = deque((document["_id"], len(bson.encode(document))) for document in self.find())
+        else:
+            self.capped_sizes.extend((document["_id"], len(bson.encode(document))) for document in documents)
+        total = sum(document_size for _, document_size in self.capped_sizes)
+        while total > size and len(self.capped_sizes) > 1:
+            document_id, document_size = self.capped_sizes.popleft()
+            total -= document_size
+            super().delete_one({"_id": document_id})
+
+
+for _name in LOCKED_METHODS:
+    setattr(MemoryCollection, _name, _locked(getattr(MemoryCollection, _name)))
+
+
+class MemoryDatabase(mongomock.Database):
+    """
+    In-memory stand-in for a pymongo Database, backed by mongomock. State lives in
+    the process, so it is meant for tests, benchmarks and single-worker deployments.
+    A snapshot file keeps the data across restarts.
+    """
+
+    def __init__(self, snapshot_path: str = None):
+        super().__init__(mongomock.MongoClient(), "memory", _store=None)
+        self.lock = threading.RLock()
+        self.capped = {}
+        self.snapshot_path = snapshot_path
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    def get_collection(self, name: str, **kwargs):
+        with self.lock:
+            if name not in self._collection_accesses:
+                self._ensure_valid_collection_name(name)
+                self._collection_accesses[name] = MemoryCollection(
+                    self, name=name, _db_store=self._store, read_preference=self.read_preference,
+                    codec_options=self.codec_options,
+                )
+        return super().get_collection(name, **kwargs)
+
+    def create_collection(self, name: str, capped: bool = False, size: int = None, **kwargs):
+        with self.lock:
+            collection = super().create_collection(name, **kwargs)
+            if capped:
+                self.capped[name] = size
+            return collection
+
+    def drop_collection(self, name_or_collection, **kwargs):
+        name = getattr(name_or_collection, "name", name_or_collection)
+        with self.lock:
+            super().drop_collection(name, **kwargs)
+            self.capped.pop(name, None)
+            self._collection_accesses.pop(name, None)
+
+    def save(self, path: str = None):
+        """
+        Writes every collection, with its indexes, to a snapshot file.
+        """
+        snapshot = {}
+        with self.lock:
+            for name in self.list_collection_names():
+                collection = self.get_collection(name)
+                snapshot[name] = {
+                    "capped": self.capped.get(name),
+                    "indexes": {index_name: index for index_name, index in collection.index_information().items()
+                                if index_name != "_id_"},
+                    "documents": [bson.encode(document) for document in collection.find()],
+                }
+        path = path or self.snapshot_path
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+
+    def load(self, path: str):
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        with self.lock:
+            for name in self.list_collection_names():
+                self.drop_collection(name)
+            for name, data in snapshot.items():
+                collection = self.create_collection(name, capped=bool(data["capped"]), size=data["capped"])
+                for index_name, index in data["indexes"].items():
+                    options = {option: value for option, value in index.items() if option in ("unique", "expireAfterSeconds")}
+                    collection.create_index(index["key"], name=index_name, **options)
+                if data["documents"]:
+                    collection.insert_many([bson.decode(document) for document in data["documents"]])
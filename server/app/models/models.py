@@ -42,5 +42,19 @@ class Task(BaseModel):
     best_benchmark_score: Optional[float] = Field(None, description="Best benchmark score for the task")
     frozen_benchmark_score: Optional[float] = Field(None, description="Frizzed benchmark score for the task")
     last_benchmark_hash: Optional[str] = Field(None, description="Hash of the task submission")
+    version: int = Field(0, description="Counter incremented by every update of the task")
 
     requested_correct_ids: List[int] = Field(default_factory=list, description="List of requested correct IDs")
+
+
+class IdempotencyRecord(BaseModel):
+    id: Optional[PyObjectId] = Field(alias="_id", default=None)
+    team_id: str = Field(..., description="ID of the team that sent the request")
+    key: str = Field(..., description="Idempotency-Key header sent by the client")
+    fingerprint: str = Field(..., description="Hash of the request path and body")
+    status: Literal["pending", "completed"] = Field(..., description="Status of the original request")
+    pending_until: Optional[datetime] = Field(None, description="End of the lease of a pending request")
+    status_code: Optional[int] = Field(None, description="Status code of the stored response")
+    body: Optional[bytes] = Field(None, description="Body of the stored response")
+    mimetype: Optional[str] = Field(None, description="Mimetype of the stored response")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="Timestamp of the first request")
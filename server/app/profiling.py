@@ -0,0 +1,130 @@
+import cProfile
+import itertools
+import os
+import re
+import threading
+import time
+import uuid
+from functools import wraps
+
+from flask import make_response, request
+
+try:
+    import greenlet
+except ImportError:  # greenlet is installed with gevent
+    greenlet = None
+
+from app.config.core import settings
+from app.config.core.logger import logger
+
+PROFILE_NAME = re.compile(r'^[0-9]{8}T[0-9]{6}-[a-z_]+-[0-9a-f]{8}\.prof$')
+
+_request_counter = itertools.count(1)
+# cProfile instruments the whole interpreter on recent Pythons, so one request is profiled at a time
+_profiler_lock = threading.Lock()
+
+
+def profile_requested():
+    """
+    Whether the current request should be profiled: "admin" when an admin sent
+    `X-Profile: 1` with its X-API-KEY, "sample" for one of every PROFILE_SAMPLE_RATE
+    requests, otherwise None.
+    """
+    if request.headers.get("X-Profile") == "1" and request.headers.get("X-API-KEY") == settings.ADMIN_API_KEY:
+        return "admin"
+    if settings.PROFILE_SAMPLE_RATE > 0 and next(_request_counter) % settings.PROFILE_SAMPLE_RATE == 0:
+        return "sample"
+    return None
+
+
+class GreenletSwitches:
+    """
+    Counts how often the profiled greenlet was switched out. cProfile follows the
+    thread, so under gevent workers the stats also include whatever other greenlets
+    ran meanwhile; a non-zero count means the profile is not of this request alone.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.greenlet = None
+        self.previous = None
+
+    def __enter__(self):
+        if greenlet is not None:
+            self.greenlet = greenlet.getcurrent()
+            self.previous = greenlet.settrace(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if greenlet is not None:
+            greenlet.settrace(self.previous)
+
+    def __call__(self, event, args):
+        if event in ("switch", "throw") and args[0] is self.greenlet:
+            self.count += 1
+        if self.previous is not None:
+            self.previous(event, args)
+
+
+def profiled(fn):
+    """
+    Runs the view under cProfile when profile_requested, and writes the stats to
+    PROFILE_DIR as a pstats file. Admin-triggered profiles are named in the
+    X-Profile-Id response header, together with X-Profile-Greenlet-Switches.
+    Streamed response bodies are produced after the view returns and are not covered.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        requested = profile_requested()
+        if not requested or not _profiler_lock.acquire(blocking=False):
+            return fn(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        switches = GreenletSwitches()
+        try:
+            with switches:
+                response = make_response(profiler.runcall(fn, *args, **kwargs))
+        finally:
+            name = save_profile(profiler, request.endpoint, switches.count)
+            _profiler_lock.release()
+        if requested == "admin":
+            response.headers["X-Profile-Id"] = name
+            response.headers["X-Profile-Greenlet-Switches"] = str(switches.count)
+        return response
+
+    return wrapper
+
+
+def save_profile(profiler: cProfile.Profile, endpoint: str, greenlet_switches: int = 0) -> str:
+    endpoint = re.sub(r'[^a-z_]', '_', (endpoint or 'request').rsplit('.', 1)[-1].lower())
+    name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{endpoint}-{uuid.uuid4().hex[:8]}.prof"
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(settings.PROFILE_DIR, name))
+    logger.info(f"[PROFILE] {request.method} {request.path} saved to {name} "
+                f"after {greenlet_switches} greenlet switches")
+    for old in list_profiles()[settings.PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, old["name"]))
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def list_profiles() -> list[dict]:
+    """
+    Stored profiles, newest first.
+    """
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if not PROFILE_NAME.match(entry.name):
+            continue
+        stat = entry.stat()
+        profiles.append({
+            "name": entry.name,
+            "endpoint": entry.name.split("-")[1],
+            "size": stat.st_size,
+            "created_at": stat.st_mtime,
+        })
+    return sorted(profiles, key=lambda profile: profile["name"], reverse=True)
@@ -8,6 +8,7 @@ from werkzeug.exceptions import BadRequest, NotFound
 
 from app.config.core import settings
 from app.models.models import Challenge
+from .utils import single_flight, find_page, projected
 
 
 class ChallengeRepository:
@@ -42,25 +43,43 @@ class ChallengeRepository:
             raise NotFound("Challenge not found")
         return Challenge(**document)
 
+    @single_flight(ttl=settings.SINGLE_FLIGHT_TTL, stale_ttl=settings.SINGLE_FLIGHT_STALE_TTL)
     def get_challenge_by_name(self, challenge_name: str = "DO2025"):
+        return self.find_challenge_by_name(challenge_name)
+
+    def find_challenge_by_name(self, challenge_name: str):
+        """
+        Uncached read, for admin views and views whose ETag comes from get_challenge_version.
+        """
         document = self.collection.find_one({"title": challenge_name})
         if not document:
             raise NotFound("Challenge not found")
         return Challenge(**document)
 
+    def get_challenge_version(self, challenge_name: str = "DO2025"):
+        """
+        Cheap change marker of a challenge: the time of its last update.
+        """
+        document = self.collection.find_one({"title": challenge_name}, {"updated_at": 1})
+        if not document:
+            raise NotFound("Challenge not found")
+        return f"{document['_id']}:{document['updated_at'].isoformat()}"
+
     def start_challenge(self, challenge_name: str):
-        challenge = self.get_challenge_by_name(challenge_name)
+        challenge = self.find_challenge_by_name(challenge_name)
         if challenge.start_time:
             raise BadRequest("Challenge already started")
         start_time = datetime.now(timezone.utc)
         update_data = {
             "start_time":start_time,
+            "updated_at": start_time,
         }
         result = self.collection.update_one({"_id": ObjectId(challenge.id)}, {"$set": update_data})
+        self.get_challenge_by_name.invalidate()
         return start_time
 
     def end_challenge(self, challenge_name: str):
-        challenge = self.get_challenge_by_name(challenge_name)
+        challenge = self.find_challenge_by_name(challenge_name)
         if not challenge.start_time:
             raise BadRequest("Challenge not started")
         if challenge.end_time:
@@ -68,8 +87,10 @@ class ChallengeRepository:
         end_time = datetime.now(timezone.utc)
         update_data = {
             "end_time": end_time,
+            "updated_at": end_time,
         }
         result = self.collection.update_one({"_id": ObjectId(challenge.id)}, {"$set": update_data})
+        self.get_challenge_by_name.invalidate()
         return end_time
 
     def get_all_challenges(self):
@@ -82,11 +103,24 @@ class ChallengeRepository:
 
         return []
 
+    def iter_challenges(self, after=None, limit=None, fields=None):
+        """
+        Lazily yields a page of challenges in id order. With fields, yields the projected
+        documents as dicts without building Challenge models.
+        """
+        if fields:
+            for doc in find_page(self.collection, {}, after, limit, {"_id": 1, **{field: 1 for field in fields}}):
+                yield projected(doc)
+        else:
+            for doc in find_page(self.collection, {}, after, limit):
+                yield Challenge(**doc)
+
     def update_challenge(self, challenge_id, update_data):
         update_data['updated_at'] = datetime.now(timezone.utc)
         result = self.collection.update_one({"_id": ObjectId(challenge_id)}, {"$set": update_data})
         if result.modified_count == 0:
             raise NotFound("Challenge not found")
+        self.get_challenge_by_name.invalidate()
 
         return result.modified_count
 
@@ -94,5 +128,6 @@ class ChallengeRepository:
         result = self.collection.delete_one({"_id": ObjectId(challenge_id)})
         if result.deleted_count == 0:
             raise NotFound("Challenge not found")
+        self.get_challenge_by_name.invalidate()
 
         return result.deleted_count
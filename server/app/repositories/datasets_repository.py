@@ -0,0 +1,78 @@
+import os
+import pickle
+import secrets
+
+from werkzeug.exceptions import BadRequest
+
+from app.config.core import settings
+from . import id_mappings
+
+
+class DatasetsRepository:
+    """
+    Challenge dataset files: the labels, the top 1000 compounds and the per-team
+    id mappings from the ids a team sees to the ids of labels_df.
+    """
+
+    def __init__(self, base_path: str = None, challenge_name: str = None):
+        self.path = os.path.join(base_path or settings.DATASETS_PATH, challenge_name or settings.CHALLENGE_NAME)
+
+    def _load(self, file_name: str, description: str):
+        try:
+            with open(os.path.join(self.path, file_name), "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            raise BadRequest(f"Failed to read {description} file: {str(e)}")
+
+    def get_labels(self):
+        return self._load("labels_df.pkl", "labels")
+
+    def get_top1000(self):
+        return self._load("top1000_df.pkl", "top1000")
+
+    def get_id_mappings(self, team_name: str):
+        """
+        The team's mapping, read from its permutation file, or regenerated from the seed
+        stored with it when the file is missing. Legacy pickled dicts still work.
+        """
+        if os.path.exists(os.path.join(self.path, id_mappings.MAPPINGS_FILE.format(team_name=team_name))):
+            try:
+                return id_mappings.load_id_mapping(self.path, team_name)
+            except Exception as e:
+                raise BadRequest(f"Failed to read mappings file: {str(e)}")
+        legacy_file = f"{team_name}_mappings.pkl"
+        seed = None if os.path.exists(os.path.join(self.path, legacy_file)) else id_mappings.load_seed(self.path, team_name)
+        if seed is not None:
+            if settings.ID_MAPPINGS_SEED is not None and settings.ID_MAPPINGS_SEED != seed:
+                raise BadRequest("Failed to regenerate mappings: ID_MAPPINGS_SEED differs from the stored seed")
+            try:
+                return id_mappings.regenerate_id_mapping(self.path, team_name, seed)
+            except Exception as e:
+                raise BadRequest(f"Failed to regenerate mappings: {str(e)}")
+        return self._load(legacy_file, "mappings")
+
+    def generate_id_mappings(self, team_names: list, seed: int = None):
+        """
+        Writes a random bijection of the labels_df ids onto themselves for every team,
+        with the seed that regenerates it. Returns the seed.
+        """
+        if seed is None:
+            seed = settings.ID_MAPPINGS_SEED if settings.ID_MAPPINGS_SEED is not None else secrets.randbits(64)
+        try:
+            label_ids = id_mappings.get_label_ids(self.get_labels())
+            id_mappings.generate_id_mappings(label_ids, team_names, self.path, seed,
+                                             workers=settings.PROVISIONING_WORKERS or None)
+        except ValueError as e:
+            raise BadRequest(f"Failed to generate mappings: {str(e)}")
+        return seed
+
+    def delete_id_mappings(self, team_names: list):
+        """
+        Removes the mapping files of the given teams, e.g. when their creation is rolled back.
+        """
+        for team_name in team_names:
+            for file_name in (id_mappings.MAPPINGS_FILE, id_mappings.SEED_FILE):
+                try:
+                    os.remove(os.path.join(self.path, file_name.format(team_name=team_name)))
+                except FileNotFoundError:
+                    pass
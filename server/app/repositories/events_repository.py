@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import pymongo
+from pymongo import CursorType, ReturnDocument
+
+from app.config.core import settings
+from app.config.core.logger import logger
+
+
+# Sequence numbers are allocated before the insert, so a number can show up in the
+# collection after higher ones; a reader waits this long for it before moving on
+GAP_TIMEOUT = 5.0
+# Recent events a new tailer marks as seen, so events still being inserted are not missed
+RESUME_LOOKBACK = 1000
+
+
+class SequenceTracker:
+    """
+    Tracks the event sequence numbers a reader has seen. The watermark is the highest
+    number up to which every event was seen: the point to resume from, and the id sent
+    to SSE clients.
+    """
+
+    def __init__(self, watermark: int = 0):
+        self.watermark = watermark
+        self.seen = set()
+        self.gap_since = None
+
+    def add(self, seq: int) -> bool:
+        """
+        Records a sequence number, and returns False when it was already seen.
+        """
+        if seq in self.seen:
+            return False
+        if seq > self.watermark:
+            self.seen.add(seq)
+            self._advance()
+        return True
+
+    def _advance(self):
+        while True:
+            while self.watermark + 1 in self.seen:
+                self.watermark += 1
+                self.seen.discard(self.watermark)
+            if not self.seen:
+                self.gap_since = None
+                return
+            if self.gap_since is None:
+                self.gap_since = time.monotonic()
+                return
+            if time.monotonic() - self.gap_since < GAP_TIMEOUT:
+                return
+            # the publisher died between allocating the number and inserting the event
+            self.watermark = min(self.seen) - 1
+            self.gap_since = None
+
+
+class EventsRepository:
+    """
+    Change events of tasks, stored in a capped collection so that every worker can
+    follow them with a tailable cursor. Events are numbered from a shared counter,
+    since ObjectIds of different workers do not follow the insertion order.
+    """
+
+    def __init__(self, db):
+        self.collection = db.get_collection("events")
+        self.counters = db.get_collection("counters")
+
+    def next_seq(self) -> int:
+        document = self.counters.find_one_and_update(
+            {"_id": "events"},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return document["seq"]
+
+    def publish(self, event_type: str, data: dict, task_id: str = None):
+        """
+        Publishes an event. Events without a task_id are visible to every team.
+        Failures are logged and never break the write that triggered the event.
+        """
+        try:
+            self.collection.insert_one({
+                "seq": self.next_seq(),
+                "type": event_type,
+                "task_id": task_id,
+                "data": data,
+                "created_at": datetime.now(timezone.utc),
+            })
+        except pymongo.errors.PyMongoError as e:
+            logger.error(f"Failed to publish {event_type} event: {e}")
+
+    def get_events_after(self, seq: int):
+        """
+        Events published after the watermark seq, in sequence order, each with the
+        resume_seq to send as its id.
+        """
+        tracker = SequenceTracker(seq)
+        events = list(self.collection.find({"seq": {"$gt": tracker.watermark}}).sort("seq", pymongo.ASCENDING))
+        for event in events:
+            tracker.add(event["seq"])
+            event["resume_seq"] = tracker.watermark
+        return events
+
+    def _recent_tracker(self) -> SequenceTracker:
+        recent = [document["seq"] for document in self.collection.find(
+            {"seq": {"$exists": True}}, {"seq": 1}).sort("$natural", pymongo.DESCENDING).limit(RESUME_LOOKBACK)]
+        if not recent:
+            return SequenceTracker()
+        tracker = SequenceTracker(min(recent) - 1)
+        for seq in recent:
+            tracker.add(seq)
+        return tracker
+
+    def tail(self, poll_interval: float = 1.0, tracker: SequenceTracker = None):
+        """
+        Yields events published from now on (or after the tracker's), forever, each with
+        its resume_seq. Reopens the tailable cursor whenever it dies (empty collection,
+        restarts of the primary, ...) from the watermark, so events inserted out of order
+        are not skipped.
+        """
+        tracker = tracker or self._recent_tracker()
+        while True:
+            try:
+                cursor = self.collection.find({"seq": {"$gt": tracker.watermark}},
+                                              cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    for document in cursor:
+                        if tracker.add(document["seq"]):
+                            document["resume_seq"] = tracker.watermark
+                            yield document
+            except pymongo.errors.PyMongoError as e:
+                logger.error(f"Events cursor failed: {e}")
+            time.sleep(poll_interval)
+
+
+class Subscription:
+    def __init__(self, task_id: str, maxsize: int):
+        self.task_id = task_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def wants(self, event: dict):
+        return event.get("task_id") in (None, self.task_id)
+
+    def events(self, heartbeat_interval: float):
+        """
+        Yields events for this subscription, or None when nothing happened for
+        heartbeat_interval seconds. Stops when the subscriber fell too far behind.
+        """
+        while not self.overflowed:
+            try:
+                yield self.queue.get(timeout=heartbeat_interval)
+            except queue.Empty:
+                yield None
+
+
+class EventBus:
+    """
+    Per-worker fan-out of the events collection: a single background tailer
+    pushes each event to the queues of the local subscribers.
+    """
+
+    def __init__(self, events_repository: EventsRepository):
+        self.events_repository = events_repository
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def subscribe(self, task_id: str):
+        subscription = Subscription(task_id, settings.EVENTS_QUEUE_SIZE)
+        with self.lock:
+            self.subscriptions.add(subscription)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="event-bus", daemon=True)
+                self.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def _run(self):
+        for event in self.events_repository.tail():
+            with self.lock:
+                subscriptions = list(self.subscriptions)
+            for subscription in subscriptions:
+                if not subscription.wants(event):
+                    continue
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    # The client reconnects with Last-Event-ID and catches up from the collection
+                    subscription.overflowed = True
+                    self.unsubscribe(subscription)
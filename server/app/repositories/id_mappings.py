@@ -0,0 +1,187 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+LABEL_IDS_FILE = "label_ids.npy"
+MAPPINGS_FILE = "{team_name}_mappings.npy"
+SEED_FILE = "{team_name}_mappings.seed"
+
+
+class IdMapping:
+    """
+    Read-only mapping from the ids a team sees to the ids of labels_df. Both sides are
+    the sorted label ids; the team's permutation says which label id each key maps to.
+    Supports `in` and `[]` like the dict it replaces, plus a vectorized lookup.
+    """
+
+    def __init__(self, label_ids: np.ndarray, permutation: np.ndarray):
+        self.keys = label_ids
+        self.values = label_ids[permutation]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _position(self, idx):
+        position = np.searchsorted(self.keys, idx)
+        if position < len(self.keys) and self.keys[position] == idx:
+            return position
+        return None
+
+    def __contains__(self, idx):
+        return self._position(idx) is not None
+
+    def __getitem__(self, idx):
+        position = self._position(idx)
+        if position is None:
+            raise KeyError(idx)
+        return self.values[position].item()
+
+    def lookup(self, ids):
+        """
+        Maps an array of ids at once. Returns the mapped ids and a mask of the ids that
+        were found; the mapped value of an id that was not found is meaningless.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.keys):
+            return np.empty(0, dtype=self.keys.dtype), np.zeros(len(ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.keys, ids), len(self.keys) - 1)
+        return self.values[positions], self.keys[positions] == ids
+
+
+def map_ids(mapping, ids: list) -> list:
+    """
+    Maps team ids to label ids with an IdMapping or a legacy dict. Raises KeyError
+    with the first id that is not in the mapping.
+    """
+    if isinstance(mapping, IdMapping):
+        try:
+            values, found = mapping.lookup(ids)
+        except OverflowError:
+            raise KeyError(next(idx for idx in ids if idx not in mapping))
+        if not found.all():
+            raise KeyError(ids[found.argmin()])
+        return values.tolist()
+    return [mapping[idx] for idx in ids]
+
+
+def get_label_ids(labels_df):
+    """
+    The sorted ids of labels_df, the domain and range of every team's mapping.
+    """
+    label_ids = np.sort(labels_df.index.to_numpy(dtype=np.int64))
+    if len(label_ids) > 1 and not (np.diff(label_ids) > 0).all():
+        raise ValueError("labels_df has duplicate ids")
+    return label_ids
+
+
+def team_seed(seed: int, team_name: str):
+    """
+    Independent seed sequence of a team, derived from the challenge seed and the team name,
+    so that any team's mapping can be regenerated without the others.
+    """
+    team_key = int.from_bytes(hashlib.sha256(team_name.encode()).digest()[:8], "big")
+    return np.random.SeedSequence(entropy=seed, spawn_key=(team_key,))
+
+
+def generate_permutation(size: int, seed: int, team_name: str):
+    dtype = np.int32 if size < 2 ** 31 else np.int64
+    return np.random.default_rng(team_seed(seed, team_name)).permutation(size).astype(dtype)
+
+
+def verify_permutation(permutation: np.ndarray, size: int):
+    """
+    Checks that the permutation is a bijection of range(size), so that the mapping
+    covers every id of labels_df exactly once.
+    """
+    if permutation.shape != (size,):
+        raise ValueError(f"Mapping has {len(permutation)} ids, labels_df has {size}")
+    if size and (permutation.min() < 0 or permutation.max() >= size):
+        raise ValueError("Mapping points outside of labels_df")
+    if size and not (np.bincount(permutation, minlength=size) == 1).all():
+        raise ValueError("Mapping is not a bijection")
+
+
+def _save_atomic(file_path: str, array: np.ndarray):
+    """
+    Saves the array through a temporary file renamed over file_path, so that
+    readers in other workers never load a partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _save_label_ids(path: str, label_ids: np.ndarray):
+    file_path = os.path.join(path, LABEL_IDS_FILE)
+    if os.path.exists(file_path):
+        try:
+            if np.array_equal(np.load(file_path), label_ids):
+                return
+        except (OSError, ValueError):
+            pass
+    _save_atomic(file_path, label_ids)
+
+
+def _generate_team_mapping(path: str, size: int, seed: int, team_name: str):
+    permutation = generate_permutation(size, seed, team_name)
+    verify_permutation(permutation, size)
+    _save_atomic(os.path.join(path, MAPPINGS_FILE.format(team_name=team_name)), permutation)
+    with open(os.path.join(path, SEED_FILE.format(team_name=team_name)), "w") as f:
+        f.write(str(seed))
+    return team_name
+
+
+def generate_id_mappings(label_ids: np.ndarray, team_names: list, path: str, seed: int, workers: int = None):
+    """
+    Writes label_ids.npy (unless it is unchanged) and, for every team, its permutation and the seed it was drawn
+    from, which regenerates it (see load_seed). Teams are generated
+    on a process pool of the given number of workers (all cores when None).
+    """
+    os.makedirs(path, exist_ok=True)
+    _save_label_ids(path, label_ids)
+    size = len(label_ids)
+    if workers == 1 or len(team_names) == 1:
+        return [_generate_team_mapping(path, size, seed, team_name) for team_name in team_names]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(_generate_team_mapping, path, size, seed, team_name) for team_name in team_names]
+        return [future.result() for future in futures]
+
+
+def load_id_mapping(path: str, team_name: str):
+    label_ids = np.load(os.path.join(path, LABEL_IDS_FILE))
+    permutation = np.load(os.path.join(path, MAPPINGS_FILE.format(team_name=team_name)))
+    return IdMapping(label_ids, permutation)
+
+
+def verify_id_mapping(path: str, team_name: str, label_ids: np.ndarray):
+    """
+    Checks a stored mapping against the current labels_df ids.
+    """
+    if not np.array_equal(np.load(os.path.join(path, LABEL_IDS_FILE)), label_ids):
+        raise ValueError(f"{LABEL_IDS_FILE} does not match labels_df")
+    verify_permutation(np.load(os.path.join(path, MAPPINGS_FILE.format(team_name=team_name))), len(label_ids))
+
+
+def load_seed(path: str, team_name: str):
+    """
+    The challenge seed the team's mapping was generated from, or None when it was not stored.
+    """
+    seed_file = os.path.join(path, SEED_FILE.format(team_name=team_name))
+    if not os.path.exists(seed_file):
+        return None
+    with open(seed_file) as f:
+        return int(f.read())
+
+
+def regenerate_id_mapping(path: str, team_name: str, seed: int):
+    label_ids = np.load(os.path.join(path, LABEL_IDS_FILE))
+    return IdMapping(label_ids, generate_permutation(len(label_ids), seed, team_name))
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+import pymongo
+from werkzeug.exceptions import Conflict
+
+from app.config.core import settings
+from app.models.models import IdempotencyRecord
+
+RESERVE_ATTEMPTS = 3
+
+
+class IdempotencyRepository:
+    def __init__(self, db):
+        self.collection = db.get_collection("idempotency_keys")
+
+    def reserve(self, team_id: str, key: str, fingerprint: str):
+        """
+        Reserves the key for the team. Returns None when the reservation succeeded,
+        otherwise the record already stored for this key. A pending record whose
+        lease expired was left by a worker that died mid-request and is taken over.
+        """
+        now = datetime.now(timezone.utc)
+        pending_until = now + timedelta(seconds=settings.IDEMPOTENCY_PENDING_TTL)
+        record = IdempotencyRecord(
+            team_id=team_id,
+            key=key,
+            fingerprint=fingerprint,
+            status="pending",
+            pending_until=pending_until,
+            created_at=now,
+        ).model_dump(by_alias=True, exclude=["id"])
+        for _ in range(RESERVE_ATTEMPTS):
+            try:
+                self.collection.insert_one(record)
+                return None
+            except pymongo.errors.DuplicateKeyError:
+                pass
+            reclaimed = self.collection.find_one_and_update(
+                {"team_id": team_id, "key": key, "status": "pending", "pending_until": {"$lt": now}},
+                {"$set": {"fingerprint": fingerprint, "pending_until": pending_until, "created_at": now}},
+            )
+            if reclaimed:
+                return None
+            document = self.collection.find_one({"team_id": team_id, "key": key})
+            if document:
+                return IdempotencyRecord(**document)
+            # Expired between the insert and the lookup, try again
+        raise Conflict("A request with this Idempotency-Key is still in progress")
+
+    def complete(self, team_id: str, key: str, status_code: int, body: bytes, mimetype: str):
+        update_data = {
+            "status": "completed",
+            "status_code": status_code,
+            "body": body,
+            "mimetype": mimetype,
+        }
+        result = self.collection.update_one({"team_id": team_id, "key": key}, {"$set": update_data})
+        return result.modified_count
+
+    def release(self, team_id: str, key: str):
+        result = self.collection.delete_one({"team_id": team_id, "key": key, "status": "pending"})
+        return result.deleted_count
@@ -4,20 +4,56 @@ from datetime import datetime, timezone
 import pymongo
 from bson import ObjectId
 from pydantic import ValidationError
-from werkzeug.exceptions import BadRequest, NotFound
+from pymongo import ReturnDocument
+from werkzeug.exceptions import BadRequest, NotFound, Conflict
 
 from app.models.models import Task
 from .challanges_repository import ChallengeRepository
+from .events_repository import EventsRepository
 from .teams_repository import TeamsRepository
+from .utils import single_flight, find_page, projected
 from ..config.core import settings
 
 
 class TaskRepository:
+    BUDGET_FIELDS = ("available_tokens", "available_benchmarks", "benchmarks")
+    RANKING_FIELDS = ("best_benchmark_score", "frozen_benchmark_score", "status")
+
     def __init__(self, db):
         self.db = db
         self.collection = db.get_collection("tasks")
         self.challenge_repository = ChallengeRepository(db)
         self.teams_repository = TeamsRepository(db)
+        self.events_repository = EventsRepository(db)
+
+    def _publish_changes(self, task_id, update_data: dict):
+        """
+        Publishes a budget event for the task and, when its ranking may have changed,
+        a leaderboard event for everyone with its public score and rank.
+        """
+        budget = {field: update_data[field] for field in self.BUDGET_FIELDS if field in update_data}
+        if budget:
+            self.events_repository.publish("budget", budget, task_id=str(task_id))
+        if any(field in update_data for field in self.RANKING_FIELDS):
+            entry = self.get_leaderboard_entry(task_id)
+            if entry:
+                self.events_repository.publish("leaderboard", entry)
+
+    def get_leaderboard_entry(self, task_id):
+        """
+        The score other teams see for the task (its frozen score once scores are frozen)
+        and its rank in its challenge, as in the ranked task list.
+        """
+        document = self.collection.find_one(
+            {"_id": ObjectId(task_id)},
+            {"challenge_id": 1, "status": 1, "best_benchmark_score": 1, "frozen_benchmark_score": 1},
+        )
+        if not document:
+            return None
+        field = "frozen_benchmark_score" if document.get("status") == "frozen" else "best_benchmark_score"
+        score = document.get(field)
+        higher = self.collection.count_documents({"challenge_id": document["challenge_id"], field: {"$gt": score or 0}})
+        return {"task_id": str(task_id), "status": document.get("status"), "score": score, "rank": higher + 1}
 
     def create_task(self, team_id: str, challenge_id: str, id_mappings: dict=None):
         challenge = self.challenge_repository.get_challenge_by_id(challenge_id)
@@ -44,6 +80,45 @@ class TaskRepository:
 
         return str(result.inserted_id)
 
+    def create_tasks(self, team_ids: list, challenge_id: str):
+        """
+        Creates the tasks of all given teams with a single insert_many.
+        """
+        challenge = self.challenge_repository.get_challenge_by_id(challenge_id)
+        now = datetime.now(timezone.utc)
+        try:
+            tasks_data = [
+                Task(
+                    team_id=team_id,
+                    challenge_id=challenge.id,
+                    status='pending',
+                    available_tokens=challenge.initial_tokens,
+                    available_benchmarks=challenge.free_benchmarks,
+                    created_at=now,
+                    updated_at=now,
+                    requested_correct_ids=[],
+                ).model_dump(by_alias=True, exclude=["id"])
+                for team_id in team_ids
+            ]
+        except ValidationError as e:
+            raise BadRequest(f"Invalid data, please check the fields and try again. {e}")
+
+        try:
+            result = self.collection.insert_many(tasks_data)
+        except pymongo.errors.BulkWriteError:
+            self.collection.delete_many({"_id": {"$in": [task["_id"] for task in tasks_data if "_id" in task]}})
+            raise BadRequest("Task already exists")
+
+        return [str(task_id) for task_id in result.inserted_ids]
+
+    def delete_tasks_by_team_ids(self, team_ids: list):
+        """
+        Deletes every task of the given teams, e.g. to roll back a failed bulk creation.
+        """
+        if not team_ids:
+            return 0
+        return self.collection.delete_many({"team_id": {"$in": list(team_ids)}}).deleted_count
+
     @staticmethod
     def _frozen_sorting_key(team_id: str):
         def key(task):
@@ -65,18 +140,18 @@ class TaskRepository:
             "requested_correct_ids": [],
             "updated_at": datetime.now(timezone.utc)
         }
-        result = self.collection.update_one({"_id": ObjectId(task.id)}, {"$set": update_data})
+        result = self.collection.update_one({"_id": ObjectId(task.id)}, {"$set": update_data, "$inc": {"version": 1}})
         if result.matched_count == 0:
             raise NotFound("Task not found")
+        self._publish_changes(task.id, update_data)
         return result.modified_count
 
 
     def get_all(self, team_secret_key, challenge_id=None, ranked=False):
-        query = {"challenge_id": challenge_id} if challenge_id else {}
-        documents = self.collection.find(query, {'requested_correct_ids': 0})
-
         team = self.teams_repository.get_team_by_secret_key(team_secret_key)
-        tasks = [Task(**doc) for doc in documents]
+        version = self.get_tasks_version(challenge_id)
+        # Copies, the cached tasks are shared by concurrent requests
+        tasks = [task.model_copy() for task in self._load_tasks(challenge_id, version)]
 
         if ranked:
             if team.name != "Admin":
@@ -96,11 +171,36 @@ class TaskRepository:
                         task.team_name = f"Team {ind}"
             else:
                 tasks = sorted(tasks, key=lambda task: -task.best_benchmark_score if task.best_benchmark_score else 0)
-                for ind, task in enumerate(tasks, start=1):
-                    task.team_name = self.teams_repository.get_team_by_id(task.team_id).name
+                team_names = self.teams_repository.get_team_names()
+                for task in tasks:
+                    task.team_name = team_names.get(task.team_id)
 
         return tasks
 
+    @single_flight(ttl=settings.SINGLE_FLIGHT_TTL, stale_ttl=settings.SINGLE_FLIGHT_STALE_TTL)
+    def _load_tasks(self, challenge_id, version):
+        """
+        Tasks without their requested ids. The version (see get_tasks_version) is part
+        of the cache key, so a cached list is only reused while no task has changed.
+        """
+        query = {"challenge_id": challenge_id} if challenge_id else {}
+        documents = self.collection.find(query, {'requested_correct_ids': 0})
+        return [Task(**doc) for doc in documents]
+
+    def iter_tasks(self, challenge_id=None, after=None, limit=None, fields=None):
+        """
+        Lazily yields a page of tasks in id order, without their requested ids. With
+        fields, yields the projected documents as dicts without building Task models.
+        """
+        query = {"challenge_id": challenge_id} if challenge_id else {}
+        if fields:
+            projection = {"_id": 1, **{field: 1 for field in fields if field != "requested_correct_ids"}}
+            for doc in find_page(self.collection, query, after, limit, projection):
+                yield projected(doc)
+        else:
+            for doc in find_page(self.collection, query, after, limit, {'requested_correct_ids': 0}):
+                yield Task(**doc)
+
     def get_task_by_id(self, task_id):
         document = self.collection.find_one({"_id": ObjectId(task_id)})
         if not document:
@@ -128,13 +228,78 @@ class TaskRepository:
             raise NotFound("Task not found")
         return Task(**document)
 
-    def update_task(self, task_id, update_data):
+    def get_task_version(self, team_id, challenge_name: str = "DO2025"):
+        """
+        Cheap change marker of a team's task: its version counter, bumped by every write.
+        """
+        challenge = self.challenge_repository.get_challenge_by_name(challenge_name)
+        document = self.collection.find_one({"team_id": team_id, "challenge_id": challenge.id}, {"version": 1})
+        if not document:
+            raise NotFound("Task not found")
+        return f"{document['_id']}:{document.get('version', 0)}"
+
+    def get_task_id(self, team_id, challenge_name: str = "DO2025"):
+        challenge = self.challenge_repository.get_challenge_by_name(challenge_name)
+        document = self.collection.find_one({"team_id": team_id, "challenge_id": challenge.id}, {"_id": 1})
+        if not document:
+            raise NotFound("Task not found")
+        return str(document["_id"])
+
+    def get_tasks_version(self, challenge_id=None):
+        """
+        Cheap change marker of the task list: the latest update time and the number of tasks.
+        """
+        query = {"challenge_id": challenge_id} if challenge_id else {}
+        latest = self.collection.find_one(query, {"updated_at": 1}, sort=[("updated_at", pymongo.DESCENDING)])
+        updated_at = latest["updated_at"].isoformat() if latest else ""
+        count = self.collection.count_documents(query) if challenge_id else self.collection.estimated_document_count()
+        return f"{updated_at}:{count}"
+
+    def update_task(self, task_id, update_data, publish: bool = True):
         update_data['updated_at'] = datetime.utcnow()
-        result = self.collection.update_one({"_id": ObjectId(task_id)}, {"$set": update_data})
+        result = self.collection.update_one({"_id": ObjectId(task_id)}, {"$set": update_data, "$inc": {"version": 1}})
         if result.matched_count == 0:
             raise NotFound("Task not found")
+        if publish:
+            self._publish_changes(task_id, update_data)
         return result.modified_count
 
+    def purchase_labels(self, task: Task, requested_ids: list, price: int, attempts: int = 3):
+        """
+        Atomically charges the task for the requested ids it has not bought yet and
+        records them. The update only applies if the budget and the purchased ids are
+        unchanged since the task was read, so concurrent purchases never double spend.
+        Returns the remaining tokens and the tokens this purchase spent.
+        """
+        for _ in range(attempts):
+            correct_set = set(task.requested_correct_ids)
+            new_ids = [idx for idx in requested_ids if idx not in correct_set]
+            token_cost = len(new_ids) * price
+            if task.available_tokens < token_cost:
+                raise BadRequest("Not enough tokens")
+            if not new_ids:
+                return task.available_tokens, 0
+
+            document = self.collection.find_one_and_update(
+                {
+                    "_id": ObjectId(task.id),
+                    "available_tokens": task.available_tokens,
+                    "requested_correct_ids": {"$size": len(task.requested_correct_ids)},
+                },
+                {
+                    "$inc": {"available_tokens": -token_cost, "version": 1},
+                    "$push": {"requested_correct_ids": {"$each": new_ids}},
+                    "$set": {"updated_at": datetime.utcnow()},
+                },
+                projection={"available_tokens": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if document:
+                self._publish_changes(task.id, {"available_tokens": document["available_tokens"]})
+                return document["available_tokens"], token_cost
+            task = self.get_task_by_id(task.id)
+        raise Conflict("Task was updated concurrently, please retry")
+
     def delete_task(self, task_id):
         result = self.collection.delete_one({"_id": ObjectId(task_id)})
         if result.deleted_count == 0:
@@ -160,7 +325,9 @@ class TaskRepository:
                 "frozen_benchmark_score": task.best_benchmark_score,
                 "status": "frozen"
             }
-            self.update_task(str(task.id), update_data)
+            self.update_task(str(task.id), update_data, publish=False)
+        # scores and ranks are unchanged, so one event tells everyone they are frozen
+        self.events_repository.publish("leaderboard", {"status": "frozen"})
         return True
 
     def complete_all(self):
@@ -170,5 +337,6 @@ class TaskRepository:
             update_data = {
                 "status": "completed"
             }
-            self.update_task(str(task.id), update_data)
+            self.update_task(str(task.id), update_data, publish=False)
+        self.events_repository.publish("leaderboard", {"status": "completed"})
         return True
\ No newline at end of file
@@ -1,16 +1,21 @@
 import base64
 import hashlib
 import hmac
+import multiprocessing
 import random
 import string
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 
+import pymongo
 from bson import ObjectId
 from pydantic import ValidationError
 from werkzeug.exceptions import BadRequest, NotFound, Forbidden
 from werkzeug.security import generate_password_hash
 
+from app.config.core import settings
 from app.models.models import Team
+from .utils import find_page, projected
 
 
 class TeamsRepository:
@@ -32,6 +37,67 @@ class TeamsRepository:
         except ValidationError as e:
             raise BadRequest(f"Invalid data, please check the fields and try again. {e}")
 
+    def create_teams(self, team_names: list):
+        """
+        Creates all teams with a single insert_many. The password hashes are computed in
+        parallel on a process pool. Returns (team_id, team_name, password, secret_key) tuples.
+        """
+        self.check_new_team_names(team_names)
+
+        passwords = [self._random_password() for _ in team_names]
+        password_hashes = self._hash_passwords(passwords)
+        created_at = datetime.now(timezone.utc)
+        try:
+            teams_data = [
+                Team(
+                    name=team_name,
+                    password=password_hash,
+                    secret_key=self.generate_token(password),
+                    created_at=created_at,
+                ).model_dump(by_alias=True, exclude=["id"])
+                for team_name, password, password_hash in zip(team_names, passwords, password_hashes)
+            ]
+        except ValidationError as e:
+            raise BadRequest(f"Invalid data, please check the fields and try again. {e}")
+
+        try:
+            result = self.collection.insert_many(teams_data)
+        except pymongo.errors.BulkWriteError as e:
+            self.delete_teams([team["_id"] for team in teams_data if "_id" in team])
+            raise BadRequest(f"Failed to create teams: {e.details.get('writeErrors', [{}])[0].get('errmsg')}")
+
+        return [
+            (str(team_id), team["name"], password, team["secret_key"])
+            for team_id, team, password in zip(result.inserted_ids, teams_data, passwords)
+        ]
+
+    def check_new_team_names(self, team_names: list):
+        """
+        Raises BadRequest unless the names are unique and not taken by existing teams.
+        """
+        if len(set(team_names)) != len(team_names):
+            raise BadRequest("Team names should be unique")
+        existing = [doc["name"] for doc in self.collection.find({"name": {"$in": team_names}}, {"name": 1})]
+        if existing:
+            raise BadRequest(f"Team names already exist: {', '.join(existing)}")
+
+    def delete_teams(self, team_ids: list):
+        """
+        Deletes the given teams at once, e.g. to roll back a failed bulk creation.
+        """
+        if not team_ids:
+            return 0
+        return self.collection.delete_many({"_id": {"$in": [ObjectId(team_id) for team_id in team_ids]}}).deleted_count
+
+    @staticmethod
+    def _hash_passwords(passwords: list):
+        if len(passwords) < settings.PROVISIONING_PARALLEL_THRESHOLD:
+            return [generate_password_hash(password) for password in passwords]
+        # spawn: forking a gevent worker with open Mongo sockets is not safe
+        with ProcessPoolExecutor(max_workers=settings.PROVISIONING_WORKERS or None,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            return list(executor.map(generate_password_hash, passwords, chunksize=16))
+
     def get_team_by_id(self, team_id: str):
         team_data = self.collection.find_one({"_id": ObjectId(team_id)}, {'secret_key': 0, 'password': 0})
         if not team_data:
@@ -48,6 +114,10 @@ class TeamsRepository:
         team_data = self.collection.find_one({"name": team_name})
         return Team(**team_data) if team_data else None
 
+    def get_team_names(self):
+        documents = self.collection.find({}, {'name': 1})
+        return {str(doc["_id"]): doc["name"] for doc in documents}
+
     def get_all_teams(self, filter_by_name=None):
         query = {} if not filter_by_name else {"name": filter_by_name}
         documents = self.collection.find(query, {'secret_key': 0, 'password': 0})
@@ -58,6 +128,20 @@ class TeamsRepository:
             return teams
         return []
 
+    def iter_teams(self, filter_by_name=None, after=None, limit=None, fields=None):
+        """
+        Lazily yields a page of teams in id order. With fields, yields the projected
+        documents as dicts without building Team models.
+        """
+        query = {} if not filter_by_name else {"name": filter_by_name}
+        if fields:
+            projection = {"_id": 1, **{field: 1 for field in fields if field not in ("secret_key", "password")}}
+            for doc in find_page(self.collection, query, after, limit, projection):
+                yield projected(doc)
+        else:
+            for doc in find_page(self.collection, query, after, limit, {'secret_key': 0, 'password': 0}):
+                yield Team(**doc)
+
     def update_team(self, team_id: str, update_data: dict):
         result = self.collection.update_one({"_id": ObjectId(team_id)}, {"$set": update_data})
         if result.modified_count == 0:
@@ -73,9 +157,13 @@ class TeamsRepository:
         return result.deleted_count
 
     def _generate_password(self):
-        password = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
+        password = self._random_password()
         return password, generate_password_hash(password)
 
+    @staticmethod
+    def _random_password():
+        return ''.join(random.choices(string.ascii_letters + string.digits, k=16))
+
     def generate_token(self, password: str, salt: str = "some_salt"):
         key = hmac.new(salt.encode(), password.encode(), hashlib.sha256).digest()
         return base64.urlsafe_b64encode(key).decode()
@@ -0,0 +1,111 @@
+import threading
+import time
+from functools import wraps
+
+import pymongo
+from bson import ObjectId
+
+from app.config.core.logger import logger
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def single_flight(ttl: float, stale_ttl: float = 0.0):
+    """
+    Per-worker request coalescing for repository methods. Concurrent callers with the
+    same arguments wait for a single in-flight call and share its result. The result
+    is reused for ttl seconds, then served stale for up to stale_ttl more seconds while
+    one background call refreshes it. Callers must not mutate the returned objects.
+    Results are keyed by the repository's collection (or the repository itself when it
+    has none), so repositories of different databases never share them.
+    The decorated method gets an invalidate() attribute that drops the cached results of
+    this worker only: views that send an ETag must not build their body from it.
+    """
+    def decorator(fn):
+        lock = threading.Lock()
+        results = {}
+        flights = {}
+
+        def call(key, args, kwargs):
+            with lock:
+                flight = flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = flights[key] = Flight()
+            if not leader:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+
+            try:
+                flight.value = fn(*args, **kwargs)
+                now = time.monotonic()
+                with lock:
+                    for expired in [k for k, (_, at) in results.items() if now - at >= ttl + stale_ttl]:
+                        del results[expired]
+                    results[key] = (flight.value, now)
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with lock:
+                    flights.pop(key, None)
+                flight.done.set()
+            return flight.value
+
+        def refresh(key, args, kwargs):
+            try:
+                call(key, args, kwargs)
+            except Exception as e:
+                logger.error(f"Background refresh of {fn.__qualname__} failed: {e}")
+
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            key = (getattr(self, "collection", self), args, tuple(sorted(kwargs.items())))
+            cached = results.get(key)
+            if cached:
+                value, at = cached
+                age = time.monotonic() - at
+                if age < ttl:
+                    return value
+                if age < ttl + stale_ttl:
+                    if key not in flights:
+                        threading.Thread(target=refresh, args=(key, (self,) + args, kwargs), daemon=True).start()
+                    return value
+            return call(key, (self,) + args, kwargs)
+
+        def invalidate():
+            with lock:
+                results.clear()
+
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
+
+
+def find_page(collection, query: dict, after: str = None, limit: int = None, projection: dict = None):
+    """
+    Keyset pagination on _id: documents after the given id in _id order, at most limit
+    of them. Returns a lazy cursor, so callers can stream large collections.
+    """
+    if after:
+        query = {**query, "_id": {"$gt": ObjectId(after)}}
+    cursor = collection.find(query, projection).sort("_id", pymongo.ASCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def projected(document: dict):
+    """
+    A projected document as returned by the API, with its _id as the "id" string.
+    """
+    document["id"] = str(document.pop("_id"))
+    return document
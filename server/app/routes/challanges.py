@@ -7,12 +7,15 @@ from werkzeug.exceptions import BadRequest
 from app.config.core import settings
 from app.models.db import get_database
 from app.repositories.challanges_repository import ChallengeRepository
-from app.routes.utils import admin_required
+from app.models.models import Challenge
+from app.routes.utils import admin_required, get_page_args, stream_json_array, PAGE_PARAMETERS
 
 db = get_database()
 
 challenges_blueprint = Blueprint('challenges', __name__)
 
+CHALLENGE_FIELDS = [field for field in Challenge.model_fields if field != 'id']
+
 
 @challenges_blueprint.route('/', methods=['POST'])
 @swag_from({
@@ -79,6 +82,7 @@ def create_challenge():
             'required': False,
             'description': 'Filter challenges by title'
         },
+        *PAGE_PARAMETERS
     ],
     'responses': {
         '200': {
@@ -109,11 +113,13 @@ def get_all_challenges():
     challenge_repository = ChallengeRepository(db)
 
     if title:
-        challenge = challenge_repository.get_challenge_by_name(title)
+        # uncached, so an update made through another worker is visible right away
+        challenge = challenge_repository.find_challenge_by_name(title)
         return challenge.model_dump(exclude_none=True)
 
-    challenges = challenge_repository.get_all_challenges()
-    return [challenge.model_dump(exclude_none=True) for challenge in challenges]
+    after, limit, fields = get_page_args(CHALLENGE_FIELDS)
+    challenges = challenge_repository.iter_challenges(after=after, limit=limit, fields=fields)
+    return stream_json_array(challenges, exclude_none=True)
 
 
 @challenges_blueprint.route('/<challenge_id>', methods=['GET'])
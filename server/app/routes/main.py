@@ -1,23 +1,37 @@
 import json
-import os
-import pickle
 from datetime import datetime
 
 import pandas as pd
 from flasgger import swag_from
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from werkzeug.exceptions import BadRequest, Unauthorized, Forbidden
 from werkzeug.security import check_password_hash
 
 from app.config.core import settings
 from app.models.db import get_database
+from app.profiling import profiled
 from app.repositories.challanges_repository import ChallengeRepository
+from app.repositories.datasets_repository import DatasetsRepository
+from app.repositories.events_repository import EventsRepository, EventBus
+from app.repositories.id_mappings import map_ids
 from app.repositories.task_repository import TaskRepository
 from app.repositories.teams_repository import TeamsRepository
-from app.routes.utils import login_required, generate_hash
+from app.routes.rate_limits import limiter, ids_cost
+from app.routes.utils import login_required, idempotent, conditional, generate_hash, validate_ids, \
+    benchmark_score
 
 db = get_database()
 main_blueprint = Blueprint('main', __name__)
+event_bus = EventBus(EventsRepository(db))
+
+
+def task_version(secret_key: str):
+    team = TeamsRepository(db).get_team_by_secret_key(secret_key)
+    return TaskRepository(db).get_task_version(team.id, settings.CHALLENGE_NAME)
+
+
+def challenge_version(secret_key: str):
+    return ChallengeRepository(db).get_challenge_version(settings.CHALLENGE_NAME)
 
 
 @main_blueprint.route('/login', methods=['POST'])
@@ -113,6 +127,7 @@ def login():
     }
 })
 @login_required
+@conditional(task_version)
 def get_available_tokens(secret_key: str):
     team = TeamsRepository(db).get_team_by_secret_key(secret_key)
     if not team:
@@ -128,6 +143,7 @@ def get_available_tokens(secret_key: str):
 
 @main_blueprint.route('/requested_ids', methods=['GET'])
 @login_required
+@conditional(task_version)
 def get_requested_ids(secret_key: str):
     team = TeamsRepository(db).get_team_by_secret_key(secret_key)
     if not team:
@@ -138,6 +154,8 @@ def get_requested_ids(secret_key: str):
     return jsonify({"requested_ids": task.requested_correct_ids}), 200
 
 @main_blueprint.route('/lab_experiment', methods=['POST'])
+@profiled
+@limiter.limit(settings.RATE_LIMIT_LAB_EXPERIMENT, cost=ids_cost)
 @swag_from({
     'tags': ['Main'],
     'summary': 'Retrieve labels for a given team',
@@ -171,7 +189,8 @@ def get_requested_ids(secret_key: str):
                         'type': 'object',
                         'additionalProperties': {'type': 'number'}
                     },
-                    'available_tokens': {'type': 'number'}
+                    'available_tokens': {'type': 'number'},
+                    'tokens_spent': {'type': 'integer', 'description': 'Tokens charged for this request'}
                 }
             }
         },
@@ -180,6 +199,7 @@ def get_requested_ids(secret_key: str):
     }
 })
 @login_required
+@idempotent
 def get_labels(secret_key: str):
     """
     Retrieves labels for the provided indexes for an authenticated team.
@@ -191,14 +211,7 @@ def get_labels(secret_key: str):
     if indexes is None:
         raise BadRequest("ids are required")
 
-    if not isinstance(indexes, list):
-        raise BadRequest("Indexes should be a list")
-
-    validated_ids = []
-    for idx in indexes:
-        if not (isinstance(idx, int) or (isinstance(idx, str) and idx.isdigit())):
-            raise BadRequest("Indexes should be a list of integers or numeric strings")
-        validated_ids.append(int(idx))
+    validated_ids = validate_ids(indexes)
 
     team = TeamsRepository(db).get_team_by_secret_key(secret_key)
     if not team:
@@ -209,49 +222,48 @@ def get_labels(secret_key: str):
     if task.status == "completed":
         raise BadRequest("Challenge already completed")
 
-    requested_set = set(validated_ids)
-    correct_set = set(task.requested_correct_ids)
-    task.requested_correct_ids += list(requested_set - correct_set)
-    token_cost = len(requested_set - correct_set) * settings.CORRECT_LABEL_PRICE
-
-    if task.available_tokens < token_cost:
-        raise BadRequest("Not enough tokens")
+    datasets_repository = DatasetsRepository()
+    df = datasets_repository.get_labels()
+    id_mappings = datasets_repository.get_id_mappings(team.name)
 
-    task.available_tokens -= token_cost
-    
-    base_path = settings.DATASETS_PATH
-    labels_file = os.path.join(base_path, settings.CHALLENGE_NAME, "labels_df.pkl")
-    mappings_file = os.path.join(base_path, settings.CHALLENGE_NAME, f"{team.name}_mappings.pkl")
-    try:
-        with open(labels_file, "rb") as f:
-            df = pickle.load(f)
-    except Exception as e:
-        raise BadRequest(f"Failed to read labels file: {str(e)}")
+    unique_ids = list(dict.fromkeys(validated_ids))
     try:
-        with open(mappings_file, "rb") as f:
-            id_mappings = pickle.load(f)
-    except Exception as e:
-        raise BadRequest(f"Failed to read mappings file: {str(e)}")
-
-    labels = {}
-    for idx in validated_ids:
-        if idx in id_mappings:
-            correct_label_id = id_mappings[idx]
-            try:
-                labels[idx] = df.loc[correct_label_id, "score"]
-            except KeyError:
-                raise BadRequest(f"Label for index {idx} not found in dataset")
-        else:
-            raise BadRequest(f"Index {idx} not found in the dataset")
-    update_data = {
-        "available_tokens": task.available_tokens,
-        "requested_correct_ids": task.requested_correct_ids,
-    }
-    task_repository.update_task(task.id, update_data)
+        label_ids = map_ids(id_mappings, unique_ids)
+    except KeyError as e:
+        raise BadRequest(f"Index {e.args[0]} not found in the dataset")
+    found = pd.Index(label_ids).isin(df.index)
+    if not found.all():
+        raise BadRequest(f"Label for index {unique_ids[found.argmin()]} not found in dataset")
+
+    # Charge the whole request before any label leaves the server
+    available_tokens, tokens_spent = task_repository.purchase_labels(task, unique_ids, settings.CORRECT_LABEL_PRICE)
+
+    scores = df["score"]
+    if request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson":
+        return Response(
+            stream_with_context(_stream_labels(scores, unique_ids, label_ids, available_tokens, tokens_spent)),
+            mimetype="application/x-ndjson",
+        )
 
-    return jsonify({"labels": labels, "available_tokens": task.available_tokens}), 200
+    labels = dict(zip(unique_ids, scores.reindex(label_ids).tolist()))
+    return jsonify({"labels": labels, "available_tokens": available_tokens, "tokens_spent": tokens_spent}), 200
+
+
+def _stream_labels(scores, ids, label_ids, available_tokens, tokens_spent):
+    """
+    Yields NDJSON records with labels for LAB_EXPERIMENT_STREAM_CHUNK_SIZE ids each,
+    followed by a trailer record with the remaining and the spent tokens.
+    """
+    chunk_size = settings.LAB_EXPERIMENT_STREAM_CHUNK_SIZE
+    for start in range(0, len(ids), chunk_size):
+        chunk_scores = scores.reindex(label_ids[start:start + chunk_size]).tolist()
+        labels = dict(zip(map(str, ids[start:start + chunk_size]), chunk_scores))
+        yield json.dumps({"labels": labels}) + "\n"
+    yield json.dumps({"available_tokens": available_tokens, "tokens_spent": tokens_spent}) + "\n"
 
 @main_blueprint.route('/submit', methods=['POST'])
+@profiled
+@limiter.limit(settings.RATE_LIMIT_SUBMIT, cost=ids_cost)
 @swag_from({
     'tags': ['Main'],
     'summary': 'Benchmark model predictions against ground truth',
@@ -298,6 +310,7 @@ def get_labels(secret_key: str):
     }
 })
 @login_required
+@idempotent
 def benchmark(secret_key: str):
     """
     Benchmarks model predictions for the authenticated team.
@@ -309,16 +322,9 @@ def benchmark(secret_key: str):
     request_indexes = data.get('ids')
     if request_indexes is None:
         raise BadRequest("ids are required")
-    if not isinstance(request_indexes, list):
-        raise BadRequest("Indexes should be a list")
-    if len(request_indexes) != settings.SUBMISSION_LENGTH:
-        raise BadRequest(f"Expected {settings.SUBMISSION_LENGTH} indexes, got {len(request_indexes)}")
-
-    validated_ids = []
-    for idx in request_indexes:
-        if not (isinstance(idx, int) or (isinstance(idx, str) and idx.isdigit())):
-            raise BadRequest("Indexes should be a list of integers or numeric strings")
-        validated_ids.append(int(idx))
+    validated_ids = validate_ids(request_indexes)
+    if len(validated_ids) != settings.SUBMISSION_LENGTH:
+        raise BadRequest(f"Expected {settings.SUBMISSION_LENGTH} indexes, got {len(validated_ids)}")
 
     team = TeamsRepository(db).get_team_by_secret_key(secret_key)
     if not team:
@@ -346,25 +352,15 @@ def benchmark(secret_key: str):
         update_data["available_benchmarks"] = task.available_benchmarks
     else:
         raise BadRequest("No benchmarks available")
-    base_path = settings.DATASETS_PATH
-    top1000_file = os.path.join(base_path, settings.CHALLENGE_NAME, "top1000_df.pkl")
-    try:
-        with open(top1000_file, "rb") as f:
-            top1000_df = pickle.load(f)
-    except Exception as e:
-        raise BadRequest(f"Failed to read top1000 file: {str(e)}")
-    mappings_file = os.path.join(base_path, settings.CHALLENGE_NAME, f"{team.name}_mappings.pkl")
-    try:
-        with open(mappings_file, "rb") as f:
-            id_mappings = pickle.load(f)
-    except Exception as e:
-        raise BadRequest(f"Failed to read mappings file: {str(e)}")
+    datasets_repository = DatasetsRepository()
+    top1000_df = datasets_repository.get_top1000()
+    id_mappings = datasets_repository.get_id_mappings(team.name)
 
     try:
-        correct_ids = {id_mappings[int(idx)] for idx in validated_ids}
+        correct_ids = set(map_ids(id_mappings, validated_ids))
     except KeyError:
         raise BadRequest("Invalid id provided, please check.")
-    score = (len(correct_ids & set(top1000_df.index)) * 100) / len(top1000_df)
+    score = benchmark_score(correct_ids, top1000_df.index)
     update_data["benchmarks"] = task.benchmarks + [score]
     task.benchmarks = task.benchmarks + [score]
     if not task.best_benchmark_score or score > task.best_benchmark_score:
@@ -426,8 +422,10 @@ def start_challenge(secret_key: str):
     }
 })
 @login_required
+@conditional(challenge_version)
 def get_start_time(secret_key: str):
-    challenge = ChallengeRepository(db).get_challenge_by_name(settings.CHALLENGE_NAME)
+    # not the cached get_challenge_by_name: the body must match the version in the ETag
+    challenge = ChallengeRepository(db).find_challenge_by_name(settings.CHALLENGE_NAME)
 
     if challenge.start_time:
         return jsonify({"start_time": int(challenge.start_time.timestamp() * 1000)}), 200
@@ -456,6 +454,66 @@ def reset(secret_key: str):
     TaskRepository(db).reset_task(team.id)
     return jsonify({"message": "Task reset successfully"}), 200
 
+@main_blueprint.route('/events', methods=['GET'])
+@swag_from({
+    'tags': ['Main'],
+    'summary': 'Server-Sent Events stream of budget and leaderboard updates',
+    'parameters': [
+        {
+            'name': 'Last-Event-ID',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'Resume the stream after this event id'
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'text/event-stream with "budget" events for the team and "leaderboard" events for everyone'
+        },
+        '401': {'description': 'Unauthorized'}
+    }
+})
+@login_required
+def events(secret_key: str):
+    """
+    Pushes "budget" events with the changed budget fields of the team's task and
+    "leaderboard" events whenever the ranking may have changed.
+    """
+    team = TeamsRepository(db).get_team_by_secret_key(secret_key)
+    task_id = TaskRepository(db).get_task_id(team.id, settings.CHALLENGE_NAME)
+    last_event_id = request.headers.get("Last-Event-ID")
+    subscription = event_bus.subscribe(task_id)
+
+    def format_event(event):
+        return f"id: {event['resume_seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    def stream():
+        try:
+            yield f"retry: {settings.EVENTS_HEARTBEAT_INTERVAL * 1000}\n\n"
+            # ids are watermarks: every event up to the id was sent, so a reconnect replays
+            # the events after it, which the live queue may also hold
+            replayed = set()
+            last_seq = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+            if last_seq:
+                for event in EventsRepository(db).get_events_after(last_seq):
+                    replayed.add(event['seq'])
+                    if subscription.wants(event):
+                        yield format_event(event)
+            for event in subscription.events(settings.EVENTS_HEARTBEAT_INTERVAL):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                elif event['seq'] > last_seq and event['seq'] not in replayed:
+                    yield format_event(event)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @main_blueprint.route('/health', methods=['GET'])
 def health():
     return jsonify({"status": "ok"}), 200
\ No newline at end of file
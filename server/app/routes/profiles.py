@@ -0,0 +1,46 @@
+import os
+
+from flasgger import swag_from
+from flask import Blueprint, jsonify, send_from_directory
+from werkzeug.exceptions import NotFound
+
+from app.config.core import settings
+from app.profiling import PROFILE_NAME, list_profiles
+from app.routes.utils import admin_required
+
+profiles_blueprint = Blueprint('profiles', __name__)
+
+
+@profiles_blueprint.route('/', methods=['GET'])
+@swag_from({
+    'tags': ['Profiles'],
+    'summary': 'List the stored request profiles, newest first',
+    'responses': {
+        '200': {'description': 'Names, endpoints, sizes and creation times of the profiles'},
+        '401': {'description': 'Unauthorized'}
+    }
+})
+@admin_required
+def get_profiles():
+    return jsonify(list_profiles()), 200
+
+
+@profiles_blueprint.route('/<name>', methods=['GET'])
+@swag_from({
+    'tags': ['Profiles'],
+    'summary': 'Download a request profile as a pstats file',
+    'parameters': [
+        {'name': 'name', 'in': 'path', 'type': 'string', 'required': True, 'description': 'Profile name'}
+    ],
+    'responses': {
+        '200': {'description': 'The pstats file, readable with python -m pstats'},
+        '401': {'description': 'Unauthorized'},
+        '404': {'description': 'Profile not found'}
+    }
+})
+@admin_required
+def get_profile(name: str):
+    if not PROFILE_NAME.match(name):
+        raise NotFound("Profile not found")
+    return send_from_directory(os.path.abspath(settings.PROFILE_DIR), name, as_attachment=True,
+                               mimetype='application/octet-stream')
@@ -0,0 +1,61 @@
+from flask import request
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+from app.config.core import settings
+
+
+def get_token():
+    """
+    Limits are kept per team token; requests without one (logins, admin calls)
+    are limited per client address instead of sharing a single bucket.
+    """
+    return request.headers.get("X-TOKEN") or get_remote_address()
+
+
+def ids_cost():
+    """
+    Cost of a request against its endpoint limit: one unit per started
+    RATE_LIMIT_IDS_PER_UNIT ids in the payload, so large batches are charged
+    for the work they cause.
+    """
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        return 1
+    return -(-len(ids) // settings.RATE_LIMIT_IDS_PER_UNIT)
+
+
+def get_storage_uri():
+    """
+    Shared storage for the limiter counters. Defaults to the application Mongo,
+    where counters live in TTL collections visible to every gunicorn worker.
+    """
+    if settings.RATE_LIMIT_STORAGE_URI:
+        return settings.RATE_LIMIT_STORAGE_URI
+    if settings.STORAGE_BACKEND == "memory":
+        return "memory://"
+    storage_uri = str(settings.MONGO_DATABASE_URI)
+    if storage_uri.startswith("mongodb+srv"):
+        storage_uri = storage_uri.replace(":27017", "")
+    return storage_uri
+
+
+def get_storage_options():
+    if settings.RATE_LIMIT_STORAGE_URI or settings.STORAGE_BACKEND == "memory" or settings.MONGO_TLS_CA_FILE == "":
+        return {}
+    return {
+        "tls": True,
+        "tlsCAFile": settings.MONGO_TLS_CA_FILE,
+        "tlsCertificateKeyFile": settings.MONGO_TLS_CertificateKeyFile,
+    }
+
+
+limiter = Limiter(
+    key_func=get_token,
+    default_limits=[settings.RATE_LIMIT_DEFAULT],
+    storage_uri=get_storage_uri(),
+    storage_options=get_storage_options(),
+    strategy=settings.RATE_LIMIT_STRATEGY,
+    headers_enabled=True,
+)
@@ -5,12 +5,19 @@ from werkzeug.exceptions import BadRequest, Forbidden
 from app.models.db import get_database
 from app.repositories.task_repository import TaskRepository
 from app.repositories.teams_repository import TeamsRepository
-from app.routes.utils import admin_required, login_required
+from app.models.models import Task
+from app.routes.utils import admin_required, login_required, conditional, get_page_args, stream_json_array, PAGE_PARAMETERS
 
 db = get_database()
 
 tasks_blueprint = Blueprint('tasks', __name__)
 
+TASK_FIELDS = [field for field in Task.model_fields if field not in ('id', 'requested_correct_ids')]
+
+
+def tasks_version(secret_key: str):
+    return TaskRepository(db).get_tasks_version(request.args.get('challenge_id'))
+
 
 @tasks_blueprint.route('/', methods=['POST'])
 @swag_from({
@@ -111,7 +118,8 @@ def freeze_scores(secret_key: str):
             'type': 'boolean',
             'required': False,
             'description': 'Whether to rank tasks by their best benchmark score'
-        }
+        },
+        *PAGE_PARAMETERS
     ],
     'responses': {
         '200': {
@@ -141,14 +149,20 @@ def freeze_scores(secret_key: str):
     }
 })
 @login_required
+@conditional(tasks_version)
 def get_all_tasks(secret_key: str):
     challenge_id = request.args.get('challenge_id')
     ranked = request.args.get('ranked')
 
     task_repository = TaskRepository(db)
-    tasks = task_repository.get_all(team_secret_key=secret_key, challenge_id=challenge_id, ranked=ranked)
+    if ranked:
+        tasks = task_repository.get_all(team_secret_key=secret_key, challenge_id=challenge_id, ranked=ranked)
+        return [task.model_dump() for task in tasks]
 
-    return [task.model_dump() for task in tasks]
+    TeamsRepository(db).get_team_by_secret_key(secret_key)
+    after, limit, fields = get_page_args(TASK_FIELDS)
+    tasks = task_repository.iter_tasks(challenge_id=challenge_id, after=after, limit=limit, fields=fields)
+    return stream_json_array(tasks)
 
 
 @tasks_blueprint.route('/<task_id>', methods=['GET'])
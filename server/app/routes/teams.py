@@ -1,15 +1,25 @@
+import csv
+import io
+
 from flasgger import swag_from
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from werkzeug.exceptions import BadRequest
 
+from app.config.core import settings
 from app.models.db import get_database
+from app.models.models import Team
+from app.repositories.challanges_repository import ChallengeRepository
+from app.repositories.datasets_repository import DatasetsRepository
+from app.repositories.task_repository import TaskRepository
 from app.repositories.teams_repository import TeamsRepository
-from app.routes.utils import admin_required
+from app.routes.utils import admin_required, get_page_args, stream_json_array, PAGE_PARAMETERS
 
 db = get_database()
 
 teams_blueprint = Blueprint('teams', __name__)
 
+TEAM_FIELDS = [field for field in Team.model_fields if field not in ('id', 'password', 'secret_key')]
+
 @teams_blueprint.route('/', methods=['POST'])
 @swag_from({
     'tags': ['Teams'],
@@ -58,6 +68,85 @@ def create_team():
     return jsonify({"message": "Team created successfully", "team_id": result[0], "password": result[1]})
 
 
+@teams_blueprint.route('/bulk', methods=['POST'])
+@swag_from({
+    'tags': ['Teams'],
+    'summary': 'Create many teams with their tasks and id mappings',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'names': {'type': 'array', 'items': {'type': 'string'}},
+                    'count': {'type': 'integer', 'description': 'Number of teams to create when names are not given'},
+                    'prefix': {'type': 'string', 'description': 'Prefix of the generated team names'},
+                    'challenge_id': {'type': 'string', 'description': 'Defaults to the current challenge'},
+                    'generate_mappings': {'type': 'boolean', 'default': True},
+                }
+            }
+        }
+    ],
+    'produces': ['text/csv'],
+    'responses': {
+        '200': {'description': 'CSV file with the name, team_id, task_id, password and secret_key of every team'},
+        '400': {'description': 'Invalid input'}
+    }
+})
+@admin_required
+def create_teams():
+    data = request.get_json()
+    if not data:
+        raise BadRequest("Invalid JSON payload")
+    team_names = data.get('names')
+    if team_names is None:
+        count = data.get('count')
+        if not isinstance(count, int) or count < 1:
+            raise BadRequest("names or a positive count is required")
+        prefix = data.get('prefix', 'Team')
+        team_names = [f"{prefix}{i}" for i in range(1, count + 1)]
+    if not team_names or not all(isinstance(name, str) and name for name in team_names):
+        raise BadRequest("names should be a non-empty list of team names")
+    if len(team_names) > settings.PROVISIONING_MAX_TEAMS:
+        raise BadRequest(f"At most {settings.PROVISIONING_MAX_TEAMS} teams can be created at once")
+
+    challenge_id = data.get('challenge_id')
+    if not challenge_id:
+        challenge_id = ChallengeRepository(db).get_challenge_by_name(settings.CHALLENGE_NAME).id
+
+    # everything that can fail without side effects runs before the teams are inserted,
+    # and a failure after that removes what was created, so the names can be reused
+    teams_repository = TeamsRepository(db)
+    teams_repository.check_new_team_names(team_names)
+    generate_mappings = data.get('generate_mappings', True)
+    datasets_repository = DatasetsRepository()
+    if generate_mappings:
+        datasets_repository.generate_id_mappings(team_names)
+
+    teams = []
+    try:
+        teams = teams_repository.create_teams(team_names)
+        task_ids = TaskRepository(db).create_tasks([team_id for team_id, *_ in teams], challenge_id)
+    except BaseException:
+        team_ids = [team_id for team_id, *_ in teams]
+        TaskRepository(db).delete_tasks_by_team_ids(team_ids)
+        teams_repository.delete_teams(team_ids)
+        if generate_mappings:
+            datasets_repository.delete_id_mappings(team_names)
+        raise
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["name", "team_id", "task_id", "password", "secret_key"])
+    for (team_id, name, password, secret_key), task_id in zip(teams, task_ids):
+        writer.writerow([name, team_id, task_id, password, secret_key])
+
+    return Response(output.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=teams.csv'})
+
+
 @teams_blueprint.route('/', methods=['GET'])
 @swag_from({
     'tags': ['Teams'],
@@ -69,7 +158,8 @@ def create_team():
             'type': 'string',
             'required': False,
             'description': 'Filter teams by name'
-        }
+        },
+        *PAGE_PARAMETERS
     ],
     'responses': {
         '200': {
@@ -99,12 +189,10 @@ def create_team():
 @admin_required
 def get_all_teams():
     name_filter = request.args.get('name')
+    after, limit, fields = get_page_args(TEAM_FIELDS)
     teams_repository = TeamsRepository(db)
-    if name_filter:
-        teams = teams_repository.get_all_teams(filter_by_name=name_filter)
-    else:
-        teams = teams_repository.get_all_teams()
-    return [team.model_dump(exclude_none=True) for team in teams]
+    teams = teams_repository.iter_teams(filter_by_name=name_filter, after=after, limit=limit, fields=fields)
+    return stream_json_array(teams, exclude_none=True)
 
 
 @teams_blueprint.route('/<team_id>', methods=['GET'])
@@ -2,10 +2,16 @@ import hashlib
 import json
 from functools import wraps
 
-from flask import request
-from werkzeug.exceptions import Unauthorized
+from bson import ObjectId
+from flask import Response, current_app, request, make_response, stream_with_context
+from pydantic import BaseModel
+from werkzeug.exceptions import Unauthorized, BadRequest, Conflict
 
 from app.config.core import settings
+from app.config.core.logger import logger
+from app.models.db import get_database
+from app.repositories.idempotency_repository import IdempotencyRepository
+from app.repositories.teams_repository import TeamsRepository
 
 
 def admin_required(fn):
@@ -29,6 +35,173 @@ def login_required(fn):
     return wrapper
 
 
+def idempotent(fn):
+    """
+    Replays the stored response when a team repeats a request with the same
+    Idempotency-Key header. Must be applied under login_required. Only responses
+    returned by the view are stored; raised errors release the key for a retry.
+    """
+    @wraps(fn)
+    def wrapper(secret_key, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return fn(secret_key, *args, **kwargs)
+        if len(key) > 255:
+            raise BadRequest("Idempotency-Key should not be longer than 255 characters")
+
+        db = get_database()
+        team = TeamsRepository(db).get_team_by_secret_key(secret_key)
+        idempotency_repository = IdempotencyRepository(db)
+        fingerprint = hashlib.sha256(request.path.encode() + b"\n" + request.get_data()).hexdigest()
+
+        record = idempotency_repository.reserve(team.id, key, fingerprint)
+        if record:
+            if record.fingerprint != fingerprint:
+                raise BadRequest("Idempotency-Key was already used with a different request")
+            if record.status == "pending":
+                raise Conflict("A request with this Idempotency-Key is still in progress")
+            response = make_response(record.body, record.status_code)
+            response.mimetype = record.mimetype
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response = make_response(fn(secret_key, *args, **kwargs))
+        except BaseException:
+            idempotency_repository.release(team.id, key)
+            raise
+
+        if response.status_code >= 500 or response.is_streamed \
+                or (response.content_length or 0) > settings.IDEMPOTENCY_MAX_BODY_SIZE:
+            idempotency_repository.release(team.id, key)
+        else:
+            idempotency_repository.complete(team.id, key, response.status_code, response.get_data(), response.mimetype)
+        return response
+
+    return wrapper
+
+
+def conditional(version_fn):
+    """
+    Answers GET requests with a weak ETag derived from version_fn(secret_key), a
+    cheap change marker of the data behind the view. A matching If-None-Match gets
+    304 Not Modified without running the view. Must be applied under login_required.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(secret_key, *args, **kwargs):
+            version = version_fn(secret_key)
+            etag = hashlib.sha256(f"{request.full_path}|{secret_key}|{version}".encode()).hexdigest()[:32]
+            if request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = make_response(fn(secret_key, *args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+PAGE_PARAMETERS = [
+    {
+        'name': 'after',
+        'in': 'query',
+        'type': 'string',
+        'required': False,
+        'description': 'Return items after this id (the id of the last item of the previous page)'
+    },
+    {
+        'name': 'limit',
+        'in': 'query',
+        'type': 'integer',
+        'required': False,
+        'description': 'Maximum number of items to return'
+    },
+    {
+        'name': 'fields',
+        'in': 'query',
+        'type': 'string',
+        'required': False,
+        'description': 'Comma separated list of fields to return'
+    },
+]
+
+
+def get_page_args(allowed_fields):
+    """
+    Parses the keyset pagination query parameters: after (id of the last item of the
+    previous page), limit and fields (comma separated projection).
+    """
+    after = request.args.get('after')
+    if after and not ObjectId.is_valid(after):
+        raise BadRequest("after should be a valid id")
+
+    limit = request.args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or not 1 <= int(limit) <= settings.MAX_PAGE_SIZE:
+            raise BadRequest(f"limit should be an integer between 1 and {settings.MAX_PAGE_SIZE}")
+        limit = int(limit)
+
+    fields = request.args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field != 'id' and field not in allowed_fields]
+        if unknown:
+            raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+        fields = [field for field in fields if field != 'id'] or ['_id']
+
+    return after, limit, fields or None
+
+
+def stream_json_array(items, **dump_kwargs):
+    """
+    Streams items (models or dicts) as a JSON array, one item at a time. The status
+    is sent before the items are read, so a failure mid-stream is logged and the
+    array is left unterminated: the client gets invalid JSON, not a truncated list.
+    """
+    def generate():
+        yield "["
+        count = 0
+        try:
+            for item in items:
+                if isinstance(item, BaseModel):
+                    item = item.model_dump(**dump_kwargs)
+                yield ("," if count else "") + current_app.json.dumps(item)
+                count += 1
+        except Exception:
+            logger.exception(f"[STREAM] {request.method} {request.path} failed after {count} items")
+            raise
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def validate_ids(indexes) -> list[int]:
+    """
+    The requested indexes as ints. Accepts ints and numeric strings.
+    """
+    if not isinstance(indexes, list):
+        raise BadRequest("Indexes should be a list")
+    validated_ids = []
+    for idx in indexes:
+        if not (isinstance(idx, int) or (isinstance(idx, str) and idx.isdigit())):
+            raise BadRequest("Indexes should be a list of integers or numeric strings")
+        validated_ids.append(int(idx))
+    return validated_ids
+
+
+def benchmark_score(correct_ids: set, top_ids) -> float:
+    """
+    Percentage of the top compounds found among the submitted ids.
+    """
+    return (len(correct_ids & set(top_ids)) * 100) / len(top_ids)
+
+
 def generate_hash(int_list: list[int]) -> str:
     list_str = json.dumps(int_list, sort_keys=True)
     return hashlib.sha256(list_str.encode()).hexdigest()
\ No newline at end of file
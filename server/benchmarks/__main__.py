@@ -0,0 +1,44 @@
+import argparse
+import json
+import sys
+
+from . import hot_paths  # noqa: F401, registers the cases
+from .harness import run, compare
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Hot path microbenchmarks.")
+commands = parser.add_subparsers(dest="command", required=True)
+
+run_parser = commands.add_parser("run", help="Run the benchmarks")
+run_parser.add_argument("-k", default="*", help="Only run the benchmarks matching this glob, e.g. 'label_lookup*'")
+run_parser.add_argument("--repeat", type=int, default=5)
+run_parser.add_argument("--save", help="Write the results as a JSON baseline")
+run_parser.add_argument("--compare", help="Baseline to compare against")
+run_parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown, 0.2 is 20%%")
+
+compare_parser = commands.add_parser("compare", help="Compare two saved results")
+compare_parser.add_argument("baseline")
+compare_parser.add_argument("current")
+compare_parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown, 0.2 is 20%%")
+
+args = parser.parse_args()
+
+if args.command == "run":
+    current = run(args.k, args.repeat)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    baseline_path = args.compare
+else:
+    with open(args.current) as f:
+        current = json.load(f)
+    baseline_path = args.baseline
+
+if baseline_path:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for key, before, after, change in regressions:
+        print(f"REGRESSION {key}: {before * 1e6:.1f} us -> {after * 1e6:.1f} us ({change:+.0%})")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} against {baseline_path}")
@@ -0,0 +1,55 @@
+import fnmatch
+import statistics
+import timeit
+
+CASES = []
+
+
+def case(name: str, sizes: list):
+    """
+    Registers a benchmark. The decorated function gets a size and returns the
+    zero-argument callable to time, so setup is not measured.
+    """
+    def decorator(setup):
+        CASES.append((name, sizes, setup))
+        return setup
+
+    return decorator
+
+
+def measure(fn, repeat: int = 5):
+    """
+    Seconds per call: the median and the best of repeat runs, each long enough to be timed reliably.
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {"median": statistics.median(times), "min": min(times), "number": number}
+
+
+def run(pattern: str = "*", repeat: int = 5, report=print):
+    results = {}
+    for name, sizes, setup in CASES:
+        for size in sizes:
+            key = f"{name}[{size}]"
+            if not fnmatch.fnmatch(key, pattern):
+                continue
+            results[key] = measure(setup(size), repeat)
+            report(f"{key:<40}{results[key]['min'] * 1e6:>14.1f} us")
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """
+    Benchmarks whose best time got slower than the baseline by more than threshold,
+    as (key, baseline seconds, current seconds, relative change) tuples.
+    """
+    regressions = []
+    for key, result in sorted(current.items()):
+        if key not in baseline:
+            continue
+        before, after = baseline[key]["min"], result["min"]
+        change = after / before - 1
+        if change > threshold:
+            regressions.append((key, before, after, change))
+    return regressions
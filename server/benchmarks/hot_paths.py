@@ -0,0 +1,84 @@
+import random
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+from app.models.models import Task, Team
+from app.repositories import id_mappings
+from app.repositories.task_repository import TaskRepository
+from app.routes.utils import benchmark_score, generate_hash, validate_ids
+from .harness import case
+
+COMPOUNDS = 1_000_000
+
+
+def label_ids(compounds: int):
+    return np.arange(compounds, dtype=np.int64)
+
+
+@case("validate_ids", sizes=[1_000, 10_000, 100_000])
+def bench_validate_ids(size):
+    rng = random.Random(size)
+    indexes = [rng.randrange(COMPOUNDS) if i % 2 else str(rng.randrange(COMPOUNDS)) for i in range(size)]
+    return lambda: validate_ids(indexes)
+
+
+@case("generate_hash", sizes=[3_000, 30_000])
+def bench_generate_hash(size):
+    ids = random.Random(size).sample(range(COMPOUNDS), size)
+    return lambda: generate_hash(ids)
+
+
+@case("label_lookup", sizes=[1_000, 10_000, 100_000])
+def bench_label_lookup(size):
+    ids = label_ids(COMPOUNDS)
+    mapping = id_mappings.IdMapping(ids, np.random.default_rng(size).permutation(COMPOUNDS))
+    scores = pd.Series(np.random.default_rng(size).normal(size=COMPOUNDS), index=ids)
+    requested = random.Random(size).sample(range(COMPOUNDS), size)
+
+    def lookup():
+        mapped = id_mappings.map_ids(mapping, requested)
+        pd.Index(mapped).isin(scores.index).all()
+        return scores.reindex(mapped).tolist()
+
+    return lookup
+
+
+@case("benchmark_score", sizes=[3_000, 30_000])
+def bench_benchmark_score(size):
+    rng = random.Random(size)
+    top_ids = pd.Index(rng.sample(range(COMPOUNDS), 1000))
+    correct_ids = set(rng.sample(range(COMPOUNDS), size))
+    return lambda: benchmark_score(correct_ids, top_ids)
+
+
+@case("task_hydration", sizes=[10_000, 100_000, 1_000_000])
+def bench_task_hydration(size):
+    now = datetime.now(timezone.utc)
+    document = {
+        "_id": ObjectId(), "team_id": str(ObjectId()), "challenge_id": str(ObjectId()), "status": "pending",
+        "available_tokens": 100000 - size, "available_benchmarks": 3, "created_at": now, "updated_at": now,
+        "requested_correct_ids": list(range(size)),
+    }
+    return lambda: Task(**document)
+
+
+@case("get_all_ranked", sizes=[100, 1_000, 5_000])
+def bench_get_all_ranked(size):
+    rng = random.Random(size)
+    team = Team(_id=str(ObjectId()), name="Team0")
+    tasks = [
+        Task(_id=str(ObjectId()), team_id=team.id if i == 0 else str(ObjectId()), challenge_id="challenge",
+             status="pending", available_tokens=0, available_benchmarks=0,
+             best_benchmark_score=rng.random() * 100 if i % 3 else None,
+             requested_correct_ids=list(range(1000)))
+        for i in range(size)
+    ]
+    task_repository = TaskRepository(MagicMock())
+    task_repository.teams_repository.get_team_by_secret_key = lambda secret_key: team
+    task_repository.get_tasks_version = lambda challenge_id: "version"
+    task_repository._load_tasks = lambda challenge_id, version: tasks
+    return lambda: task_repository.get_all("secret", ranked=True)
@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+import unittest
+
+try:
+    from src.configs import Config
+    from src.label_cache import LabelCache
+    from src.simulation import ChallengeSimulation
+    from usage.ai_agent import ChatAssistant, ScriptedBackend
+except ImportError:  # the client package is not installed
+    ChallengeSimulation = None
+
+
+@unittest.skipIf(ChallengeSimulation is None, "needs the client package: pip install -e ../client")
+class TestChatLoop(unittest.TestCase):
+    def setUp(self):
+        self.simulation = ChallengeSimulation.synthetic(compounds=10000, seed=0)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        handle = self.simulation.handle
+
+        def recording_handle(method, endpoint, headers, body):
+            with self.lock:
+                self.calls.append((endpoint, json.loads(body)["ids"] if body else None))
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                time.sleep(0.05)
+                return handle(method, endpoint, headers, body)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+        self.simulation.handle = recording_handle
+        self.client = self.simulation.client()
+
+    def tearDown(self):
+        self.client.close()
+
+    def run_script(self, turns, label_cache=True):
+        assistant = ChatAssistant(ScriptedBackend(turns), self.client, max_workers=3,
+                                  label_cache=LabelCache() if label_cache else None)
+        messages = [{"role": "user", "content": "Solve the task."}]
+        try:
+            answer = assistant.chat_loop(messages)
+        finally:
+            assistant.close()
+        return assistant, messages, answer
+
+    def endpoints(self):
+        return [endpoint for endpoint, _ in self.calls]
+
+    @staticmethod
+    def tool_results(messages):
+        return [message["content"] for message in messages if isinstance(message, dict) and message["role"] == "tool"]
+
+    def test_chat_loop(self):
+        batches = [list(range(start, start + 100)) for start in (0, 100, 200)]
+        assistant, messages, answer = self.run_script([
+            [("lab_experiment", {"ids": ids}) for ids in batches],
+            [("lab_experiment", {"ids": list(range(50, 350))})],
+            [("submit", {"ids": list(range(Config.SUBMISSION_LENGTH))})],
+            "Done.",
+        ])
+        self.assertEqual(answer, "Done.")
+
+        # the three calls of the first turn ran concurrently, and their results keep the call order
+        self.assertEqual(self.max_in_flight, 3)
+        self.assertEqual([message["tool_call_id"] for message in messages[2:5]],
+                         [tool_call.id for tool_call in messages[1].tool_calls])
+        for result, ids in zip(self.tool_results(messages), batches):
+            self.assertEqual(list(json.loads(result)["labels"]), [str(idx) for idx in ids])
+
+        # the cached ids of the second call were not bought again
+        lab_calls = [ids for endpoint, ids in self.calls if endpoint == "lab_experiment"]
+        self.assertEqual(len(lab_calls), 4)
+        self.assertEqual(lab_calls[3], list(range(300, 350)))
+        team = self.simulation.teams["simulation"]
+        self.assertEqual(team.available_tokens, self.simulation.tokens - 350)
+
+        # the budget was read once up front, then followed from the tool responses
+        self.assertEqual(self.endpoints().count("remained_budget"), 1)
+        self.assertEqual(self.endpoints()[0], "remained_budget")
+        self.assertEqual(assistant.budget(), {"available_tokens": self.simulation.tokens - 350,
+                                              "available_benchmarks": self.simulation.benchmarks - 1})
+        self.assertEqual(assistant.tool_calls, 5)
+
+    def test_budget_checked_locally(self):
+        self.simulation.teams["simulation"].available_tokens = 150
+        assistant, messages, answer = self.run_script([
+            [("lab_experiment", {"ids": list(range(100))})],
+            [("lab_experiment", {"ids": list(range(200))})],
+            [("lab_experiment", {"ids": list(range(150))})],
+        ])
+        results = self.tool_results(messages)
+        self.assertIn("Not enough tokens. Required: 100, Available: 50", results[1])
+        self.assertEqual(len(json.loads(results[2])["labels"]), 150)
+        self.assertEqual(self.endpoints(), ["remained_budget", "lab_experiment", "lab_experiment"])
+        self.assertEqual(assistant.budget()["available_tokens"], 0)
+
+    def test_label_cache_is_opt_in(self):
+        assistant, messages, answer = self.run_script([
+            [("lab_experiment", {"ids": list(range(100))})],
+            [("lab_experiment", {"ids": list(range(50, 150))})],
+        ], label_cache=False)
+        self.assertIsNone(self.client.label_cache)
+        lab_calls = [ids for endpoint, ids in self.calls if endpoint == "lab_experiment"]
+        self.assertEqual(lab_calls, [list(range(100)), list(range(50, 150))])
+        self.assertEqual(assistant.budget()["available_tokens"], self.simulation.tokens - 150)
+
+    def test_lowest_budget_of_a_turn_is_kept(self):
+        handle = self.simulation.handle
+
+        def slow_first_answer(method, endpoint, headers, body):
+            # the first purchase is made first but answers after the second one
+            first = body and json.loads(body)["ids"][0] == 0
+            if body and not first:
+                time.sleep(0.05)
+            response = handle(method, endpoint, headers, body)
+            if first:
+                time.sleep(0.2)
+            return response
+
+        self.simulation.handle = slow_first_answer
+        assistant, messages, answer = self.run_script([
+            [("lab_experiment", {"ids": list(range(100))}), ("lab_experiment", {"ids": list(range(100, 300))})],
+        ])
+        self.assertEqual(self.simulation.teams["simulation"].available_tokens, self.simulation.tokens - 300)
+        self.assertEqual(assistant.budget()["available_tokens"], self.simulation.tokens - 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
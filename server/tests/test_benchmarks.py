@@ -0,0 +1,19 @@
+import unittest
+
+from benchmarks.harness import compare, measure
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_measure(self):
+        result = measure(lambda: sum(range(100)), repeat=2)
+        self.assertGreater(result["median"], 0)
+        self.assertLessEqual(result["min"], result["median"])
+
+    def test_compare(self):
+        baseline = {"a[1]": {"min": 1.0}, "b[1]": {"min": 1.0}, "c[1]": {"min": 1.0}}
+        current = {"a[1]": {"min": 1.1}, "b[1]": {"min": 1.5}, "c[1]": {"min": 0.5}, "d[1]": {"min": 9.0}}
+        self.assertEqual(compare(baseline, current, threshold=0.2), [("b[1]", 1.0, 1.5, 0.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
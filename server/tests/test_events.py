@@ -0,0 +1,152 @@
+import queue
+import time
+import unittest
+from unittest.mock import patch
+
+from app.config.core import settings
+from app.models.memory_db import MemoryDatabase
+from app.repositories import events_repository
+from app.repositories.challanges_repository import ChallengeRepository
+from app.repositories.events_repository import EventBus, EventsRepository, SequenceTracker
+from app.repositories.task_repository import TaskRepository
+from app.repositories.teams_repository import TeamsRepository
+
+
+class FakeEventsRepository:
+    """Stand-in for the capped events collection fed from a local queue."""
+
+    def __init__(self):
+        self.published = queue.Queue()
+
+    def tail(self):
+        while True:
+            yield self.published.get()
+
+
+class TestEventBus(unittest.TestCase):
+    def setUp(self):
+        self.repository = FakeEventsRepository()
+        self.bus = EventBus(self.repository)
+
+    def next_event(self, subscription):
+        return next(subscription.events(heartbeat_interval=1))
+
+    def test_events_are_routed_to_their_task(self):
+        first = self.bus.subscribe("task1")
+        second = self.bus.subscribe("task2")
+        self.repository.published.put({"_id": 1, "type": "budget", "task_id": "task2", "data": {"available_tokens": 5}})
+        self.repository.published.put({"_id": 2, "type": "leaderboard", "task_id": None, "data": {}})
+
+        self.assertEqual(self.next_event(first)["type"], "leaderboard")
+        self.assertEqual(self.next_event(second)["type"], "budget")
+        self.assertEqual(self.next_event(second)["type"], "leaderboard")
+
+    def test_heartbeat_when_idle(self):
+        subscription = self.bus.subscribe("task1")
+        self.assertIsNone(next(subscription.events(heartbeat_interval=0.01)))
+
+    def test_slow_subscriber_is_dropped(self):
+        with patch.object(settings, "EVENTS_QUEUE_SIZE", 1):
+            subscription = self.bus.subscribe("task1")
+        for event_id in range(3):
+            self.repository.published.put({"_id": event_id, "type": "leaderboard", "task_id": None, "data": {}})
+        for _ in range(100):
+            if subscription.overflowed:
+                break
+            time.sleep(0.01)
+        self.assertTrue(subscription.overflowed)
+        self.assertNotIn(subscription, self.bus.subscriptions)
+
+
+class TestSequenceTracker(unittest.TestCase):
+    def test_out_of_order(self):
+        tracker = SequenceTracker()
+        self.assertTrue(tracker.add(2))
+        self.assertEqual(tracker.watermark, 0)
+        self.assertTrue(tracker.add(1))
+        self.assertEqual(tracker.watermark, 2)
+        self.assertTrue(tracker.add(4))
+        self.assertFalse(tracker.add(4))
+        self.assertEqual((tracker.watermark, tracker.seen), (2, {4}))
+
+    def test_gap_is_given_up(self):
+        tracker = SequenceTracker()
+        tracker.add(2)
+        with patch.object(events_repository, "GAP_TIMEOUT", 0):
+            tracker.add(3)
+        self.assertEqual((tracker.watermark, tracker.seen), (3, set()))
+        # the late event is still delivered
+        self.assertTrue(tracker.add(1))
+
+
+class TestEventsRepository(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.repository = EventsRepository(self.db)
+
+    def insert(self, seq):
+        self.repository.collection.insert_one({"seq": seq, "type": "budget", "task_id": "task1", "data": {}})
+
+    def test_tail_reopens_without_skipping_late_events(self):
+        self.repository.publish("budget", {}, task_id="task1")
+        first, second = self.repository.next_seq(), self.repository.next_seq()
+        events = self.repository.tail(poll_interval=0, tracker=SequenceTracker(1))
+        # the second event lands before the first one
+        self.insert(second)
+        event = next(events)
+        self.assertEqual((event["seq"], event["resume_seq"]), (3, 1))
+        self.insert(first)
+        event = next(events)
+        self.assertEqual((event["seq"], event["resume_seq"]), (2, 3))
+        events.close()
+
+    def test_events_after(self):
+        for seq in (1, 3, 4):
+            self.insert(seq)
+        self.assertEqual([(event["seq"], event["resume_seq"]) for event in self.repository.get_events_after(0)],
+                         [(1, 1), (3, 1), (4, 1)])
+        self.assertEqual([event["seq"] for event in self.repository.get_events_after(3)], [4])
+
+    def test_new_tailer_starts_after_recent_events(self):
+        for seq in (1, 3):
+            self.insert(seq)
+        tracker = self.repository._recent_tracker()
+        self.assertEqual((tracker.watermark, tracker.seen), (1, {3}))
+
+
+class TestLeaderboardEvents(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        with patch("app.repositories.challanges_repository.os.makedirs"):
+            challenge_id = ChallengeRepository(self.db).create_challenge("Events", "Test", 10, 3)
+        team_ids = [team[0] for team in TeamsRepository(self.db).create_teams(["team1", "team2", "team3"])]
+        self.task_repository = TaskRepository(self.db)
+        self.task_ids = self.task_repository.create_tasks(team_ids, challenge_id)
+        self.events = self.db.get_collection("events")
+
+    def leaderboard_events(self):
+        return [event["data"] for event in self.events.find({"type": "leaderboard"}).sort("seq", 1)]
+
+    def test_score_and_rank_of_the_changed_task(self):
+        self.task_repository.update_task(self.task_ids[0], {"best_benchmark_score": 0.5})
+        self.task_repository.update_task(self.task_ids[1], {"best_benchmark_score": 0.7})
+        self.assertEqual(self.leaderboard_events(), [
+            {"task_id": self.task_ids[0], "status": "pending", "score": 0.5, "rank": 1},
+            {"task_id": self.task_ids[1], "status": "pending", "score": 0.7, "rank": 1},
+        ])
+
+    def test_one_event_per_freeze(self):
+        self.task_repository.update_task(self.task_ids[0], {"best_benchmark_score": 0.5})
+        self.task_repository.freeze_scores()
+        self.task_repository.update_task(self.task_ids[1], {"best_benchmark_score": 0.7})
+        self.task_repository.complete_all()
+        self.assertEqual(self.leaderboard_events()[1:], [
+            {"status": "frozen"},
+            # once frozen, everyone sees the frozen score
+            {"task_id": self.task_ids[1], "status": "frozen", "score": None, "rank": 2},
+            {"status": "completed"},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from werkzeug.exceptions import BadRequest
+
+from app.config.core import settings
+from app.repositories import id_mappings
+from app.repositories.datasets_repository import DatasetsRepository
+
+
+class TestIdMappings(unittest.TestCase):
+    def setUp(self):
+        self.labels_df = pd.DataFrame({"score": np.arange(6.0)}, index=[50, 10, 40, 20, 30, 60])
+        self.label_ids = id_mappings.get_label_ids(self.labels_df)
+        self.path = tempfile.mkdtemp()
+
+    def test_generate_and_load(self):
+        id_mappings.generate_id_mappings(self.label_ids, ["team1", "team2"], self.path, seed=42, workers=1)
+
+        mapping = id_mappings.load_id_mapping(self.path, "team1")
+        self.assertEqual(sorted(mapping[idx] for idx in self.label_ids), list(self.label_ids))
+        self.assertIn(10, mapping)
+        self.assertNotIn(11, mapping)
+        with self.assertRaises(KeyError):
+            mapping[11]
+        values, found = mapping.lookup([10, 11, 60])
+        self.assertEqual(found.tolist(), [True, False, True])
+        self.assertEqual([values[0], values[2]], [mapping[10], mapping[60]])
+
+        self.assertEqual(id_mappings.map_ids(mapping, [60, 10]), [mapping[60], mapping[10]])
+        for ids in ([10, 11], [10, 10 ** 30]):
+            with self.assertRaises(KeyError) as error:
+                id_mappings.map_ids(mapping, ids)
+            self.assertEqual(error.exception.args[0], ids[1])
+        self.assertEqual(id_mappings.map_ids({1: 2}, [1]), [2])
+
+        for team_name in ("team1", "team2"):
+            id_mappings.verify_id_mapping(self.path, team_name, self.label_ids)
+
+    def test_label_ids_rewritten_only_when_changed(self):
+        id_mappings.generate_id_mappings(self.label_ids, ["team1"], self.path, seed=42, workers=1)
+        label_ids_file = os.path.join(self.path, id_mappings.LABEL_IDS_FILE)
+        with patch.object(id_mappings, "_save_atomic") as save:
+            id_mappings.generate_id_mappings(self.label_ids, [], self.path, seed=42, workers=1)
+        save.assert_not_called()
+
+        id_mappings.generate_id_mappings(self.label_ids[:-1], [], self.path, seed=42, workers=1)
+        np.testing.assert_array_equal(np.load(label_ids_file), self.label_ids[:-1])
+        self.assertEqual(sorted(os.listdir(self.path)), ["label_ids.npy", "team1_mappings.npy", "team1_mappings.seed"])
+
+    def test_regenerate_from_seed(self):
+        id_mappings.generate_id_mappings(self.label_ids, ["team1", "team2"], self.path, seed=42, workers=2)
+        stored = id_mappings.load_id_mapping(self.path, "team2")
+        regenerated = id_mappings.regenerate_id_mapping(self.path, "team2", seed=42)
+        np.testing.assert_array_equal(stored.values, regenerated.values)
+
+        other = id_mappings.regenerate_id_mapping(self.path, "team2", seed=43)
+        self.assertFalse(np.array_equal(stored.values, other.values))
+
+    def test_missing_mapping_regenerated_from_stored_seed(self):
+        datasets_repository = DatasetsRepository(base_path=self.path, challenge_name="DO2025")
+        with patch.object(settings, "ID_MAPPINGS_SEED", None), patch.object(settings, "PROVISIONING_WORKERS", 1), \
+                patch.object(DatasetsRepository, "get_labels", return_value=self.labels_df):
+            seed = datasets_repository.generate_id_mappings(["team1"])
+        self.assertEqual(id_mappings.load_seed(datasets_repository.path, "team1"), seed)
+        stored = datasets_repository.get_id_mappings("team1")
+        os.remove(os.path.join(datasets_repository.path, id_mappings.MAPPINGS_FILE.format(team_name="team1")))
+
+        with patch.object(settings, "ID_MAPPINGS_SEED", None):
+            np.testing.assert_array_equal(datasets_repository.get_id_mappings("team1").values, stored.values)
+        with patch.object(settings, "ID_MAPPINGS_SEED", seed + 1), self.assertRaises(BadRequest):
+            datasets_repository.get_id_mappings("team1")
+        self.assertIsNone(id_mappings.load_seed(datasets_repository.path, "team2"))
+        with self.assertRaises(BadRequest):
+            datasets_repository.get_id_mappings("team2")
+
+    def test_verify_permutation(self):
+        id_mappings.verify_permutation(np.array([2, 0, 1]), 3)
+        for permutation in ([0, 1], [0, 1, 1], [0, 1, 3], [-1, 0, 1]):
+            with self.assertRaises(ValueError):
+                id_mappings.verify_permutation(np.array(permutation), 3)
+
+    def test_duplicate_label_ids(self):
+        with self.assertRaises(ValueError):
+            id_mappings.get_label_ids(pd.DataFrame({"score": [1.0, 2.0]}, index=[1, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
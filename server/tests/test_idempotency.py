@@ -0,0 +1,142 @@
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from flask import Flask, jsonify
+from pymongo.errors import DuplicateKeyError
+from werkzeug.exceptions import BadRequest, Conflict
+
+from app.models.memory_db import MemoryDatabase
+from app.models.models import IdempotencyRecord
+from app.repositories.idempotency_repository import IdempotencyRepository
+from app.routes.error_handler import json_error_handler
+from app.routes.utils import login_required, idempotent
+
+
+class FakeIdempotencyStore:
+    """Dict backed stand-in for the idempotency_keys collection."""
+
+    def __init__(self):
+        self.records = {}
+
+    def reserve(self, team_id, key, fingerprint):
+        existing = self.records.get((team_id, key))
+        if existing:
+            return IdempotencyRecord(**existing)
+        self.records[(team_id, key)] = {"team_id": team_id, "key": key, "fingerprint": fingerprint, "status": "pending"}
+        return None
+
+    def complete(self, team_id, key, status_code, body, mimetype):
+        self.records[(team_id, key)].update(status="completed", status_code=status_code, body=body, mimetype=mimetype)
+        return 1
+
+    def release(self, team_id, key):
+        return int(self.records.pop((team_id, key), None) is not None)
+
+
+class TestIdempotency(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.register_error_handler(BadRequest, lambda e: json_error_handler(e, 400, "Bad Request"))
+        self.app.register_error_handler(Conflict, lambda e: json_error_handler(e, 409, "Conflict"))
+        self.calls = 0
+
+        @self.app.route('/lab_experiment', methods=['POST'])
+        @login_required
+        @idempotent
+        def lab_experiment(secret_key):
+            self.calls += 1
+            if self.app.config.get("FAIL"):
+                raise BadRequest("Not enough tokens")
+            return jsonify({"available_tokens": 100 - self.calls}), 200
+
+        self.client = self.app.test_client()
+        self.store = FakeIdempotencyStore()
+        patchers = [
+            patch('app.routes.utils.TeamsRepository.get_team_by_secret_key',
+                  return_value=SimpleNamespace(id="team1", name="team1")),
+            patch('app.routes.utils.IdempotencyRepository.reserve', side_effect=self.store.reserve),
+            patch('app.routes.utils.IdempotencyRepository.complete', side_effect=self.store.complete),
+            patch('app.routes.utils.IdempotencyRepository.release', side_effect=self.store.release),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, payload, key="key-1"):
+        headers = {"X-TOKEN": "secret123"}
+        if key:
+            headers["Idempotency-Key"] = key
+        return self.client.post('/lab_experiment', json=payload, headers=headers)
+
+    def test_without_key_is_not_deduplicated(self):
+        self.post({"ids": [1]}, key=None)
+        self.post({"ids": [1]}, key=None)
+        self.assertEqual(self.calls, 2)
+
+    def test_replay_returns_stored_response(self):
+        first = self.post({"ids": [1]})
+        second = self.post({"ids": [1]})
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(json.loads(second.data), json.loads(first.data))
+        self.assertEqual(second.headers.get("Idempotent-Replayed"), "true")
+
+    def test_key_reused_with_different_payload(self):
+        self.post({"ids": [1]})
+        response = self.post({"ids": [2]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("different request", response.get_data(as_text=True))
+        self.assertEqual(self.calls, 1)
+
+    def test_pending_key_conflicts(self):
+        self.post({"ids": [1]})
+        # Simulate the first request still being processed by another worker
+        self.store.records[("team1", "key-1")]["status"] = "pending"
+        response = self.post({"ids": [1]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.calls, 1)
+
+    def test_errors_release_the_key(self):
+        self.app.config["FAIL"] = True
+        response = self.post({"ids": [1]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.store.records, {})
+        self.app.config["FAIL"] = False
+        response = self.post({"ids": [1]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, 2)
+
+
+class TestIdempotencyRepository(unittest.TestCase):
+    def setUp(self):
+        db = MemoryDatabase()
+        db.get_collection("idempotency_keys").create_index(["team_id", "key"], unique=True)
+        self.repository = IdempotencyRepository(db)
+
+    def test_pending_lease(self):
+        self.assertIsNone(self.repository.reserve("team1", "key-1", "a"))
+        self.assertEqual(self.repository.reserve("team1", "key-1", "a").status, "pending")
+
+        # The worker died mid-request: once the lease expires the key is taken over
+        self.repository.collection.update_one(
+            {"key": "key-1"}, {"$set": {"pending_until": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+        self.assertIsNone(self.repository.reserve("team1", "key-1", "b"))
+        self.assertEqual(self.repository.reserve("team1", "key-1", "b").fingerprint, "b")
+
+        self.repository.complete("team1", "key-1", 200, b"{}", "application/json")
+        self.repository.collection.update_one(
+            {"key": "key-1"}, {"$set": {"pending_until": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+        self.assertEqual(self.repository.reserve("team1", "key-1", "b").status, "completed")
+
+    def test_reserve_gives_up(self):
+        # The stored record keeps disappearing between the insert and the lookup
+        with patch.object(self.repository.collection, "insert_one", side_effect=DuplicateKeyError("dup")):
+            with self.assertRaises(Conflict):
+                self.repository.reserve("team1", "key-1", "a")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -100,6 +100,30 @@ class TestMainRoutes(unittest.TestCase):
         self.assertEqual(data[0]['available_tokens'], 50)
         self.assertEqual(data[0]['requested_ids'], [1, 2])
 
+    @patch('app.repositories.task_repository.TaskRepository.get_available_tokens_by_team')
+    @patch('app.repositories.task_repository.TaskRepository.get_task_version')
+    @patch('app.repositories.teams_repository.TeamsRepository.get_team_by_secret_key')
+    def test_remained_budget_conditional_get(self, mock_get_team, mock_get_version, mock_get_tokens):
+        """Test /remained_budget answers a matching If-None-Match with 304."""
+        mock_get_team.return_value = SimpleNamespace(id="1", name="team1", secret_key="secret123")
+        mock_get_version.return_value = "task1:3"
+        mock_get_tokens.return_value = {"available_tokens": 50, "benchmarks": [], "available_benchmarks": 3}
+        headers = {"X-TOKEN": "secret123"}
+
+        response = self.client.get('/remained_budget', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers.get("ETag")
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.client.get('/remained_budget', headers={**headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(mock_get_tokens.call_count, 1)
+
+        mock_get_version.return_value = "task1:4"
+        response = self.client.get('/remained_budget', headers={**headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get("ETag"), etag)
+
     # ---------------------------
     # Tests for /get_labels endpoint
     # ---------------------------
@@ -227,6 +251,64 @@ class TestMainRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("Not enough tokens", response.get_data(as_text=True))
 
+    # ---------------------------
+    # Tests for /lab_experiment endpoint
+    # ---------------------------
+    def _lab_experiment_mocks(self, mock_pickle_load, mock_get_task, mock_get_team, mock_purchase):
+        mock_get_team.return_value = SimpleNamespace(id="1", name="team1", secret_key="secret123")
+        mock_get_task.return_value = SimpleNamespace(id="1", status="pending", requested_correct_ids=[], available_tokens=100)
+        mock_purchase.return_value = (97, 3)
+        df = pd.DataFrame({"score": [10.0, 20.0, 30.0]}, index=[100, 101, 102])
+        mock_pickle_load.side_effect = [df, {0: 100, 1: 101, 2: 102}]
+
+    @patch('app.repositories.task_repository.TaskRepository.purchase_labels')
+    @patch('app.repositories.teams_repository.TeamsRepository.get_team_by_secret_key')
+    @patch('app.repositories.task_repository.TaskRepository.get_task_by_team_and_challenge')
+    @patch('app.repositories.datasets_repository.pickle.load')
+    @patch("builtins.open", new_callable=mock_open)
+    def test_lab_experiment_json(self, mock_file, mock_pickle_load, mock_get_task, mock_get_team, mock_purchase):
+        """Test /lab_experiment returns all labels in a single JSON document."""
+        self._lab_experiment_mocks(mock_pickle_load, mock_get_task, mock_get_team, mock_purchase)
+        response = self.client.post('/lab_experiment', json={"ids": [2, 0, 1, 0]}, headers={"X-TOKEN": "secret123"})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.get_data(as_text=True))
+        self.assertEqual(data["labels"], {"0": 10.0, "1": 20.0, "2": 30.0})
+        self.assertEqual((data["available_tokens"], data["tokens_spent"]), (97, 3))
+        self.assertEqual(mock_purchase.call_args.args[1], [2, 0, 1])
+
+    @patch('app.repositories.task_repository.TaskRepository.purchase_labels')
+    @patch('app.repositories.teams_repository.TeamsRepository.get_team_by_secret_key')
+    @patch('app.repositories.task_repository.TaskRepository.get_task_by_team_and_challenge')
+    @patch('app.repositories.datasets_repository.pickle.load')
+    @patch("builtins.open", new_callable=mock_open)
+    def test_lab_experiment_ndjson(self, mock_file, mock_pickle_load, mock_get_task, mock_get_team, mock_purchase):
+        """Test /lab_experiment streams label chunks followed by a trailer record."""
+        self._lab_experiment_mocks(mock_pickle_load, mock_get_task, mock_get_team, mock_purchase)
+        headers = {"X-TOKEN": "secret123", "Accept": "application/x-ndjson"}
+        with patch.object(settings, "LAB_EXPERIMENT_STREAM_CHUNK_SIZE", 2):
+            response = self.client.post('/lab_experiment', json={"ids": [0, 1, 2]}, headers=headers)
+            records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        self.assertEqual(records, [
+            {"labels": {"0": 10.0, "1": 20.0}},
+            {"labels": {"2": 30.0}},
+            {"available_tokens": 97, "tokens_spent": 3},
+        ])
+
+    @patch('app.repositories.task_repository.TaskRepository.purchase_labels')
+    @patch('app.repositories.teams_repository.TeamsRepository.get_team_by_secret_key')
+    @patch('app.repositories.task_repository.TaskRepository.get_task_by_team_and_challenge')
+    @patch('app.repositories.datasets_repository.pickle.load')
+    @patch("builtins.open", new_callable=mock_open)
+    def test_lab_experiment_unknown_id_is_not_charged(self, mock_file, mock_pickle_load, mock_get_task, mock_get_team, mock_purchase):
+        """Test /lab_experiment rejects unknown ids before charging the budget."""
+        self._lab_experiment_mocks(mock_pickle_load, mock_get_task, mock_get_team, mock_purchase)
+        response = self.client.post('/lab_experiment', json={"ids": [0, 7]}, headers={"X-TOKEN": "secret123"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Index 7 not found in the dataset", response.get_data(as_text=True))
+        mock_purchase.assert_not_called()
+
     # ---------------------------
     # Tests for /benchmark endpoint
     # ---------------------------
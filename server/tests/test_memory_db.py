@@ -0,0 +1,162 @@
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError
+
+from app.models.memory_db import MemoryDatabase
+from app.repositories.challanges_repository import ChallengeRepository
+from app.repositories.task_repository import TaskRepository
+from app.repositories.teams_repository import TeamsRepository
+
+
+class TestMemoryCollection(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.collection = self.db.get_collection("items")
+
+    def test_unique_index(self):
+        self.collection.create_index(["team_id", "key"], unique=True)
+        self.collection.insert_one({"team_id": "t", "key": "k", "n": 1})
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.insert_one({"team_id": "t", "key": "k"})
+        other_id = self.collection.insert_one({"team_id": "t", "key": "other"}).inserted_id
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.update_one({"_id": other_id}, {"$set": {"key": "k"}})
+        self.assertEqual(self.collection.find_one({"_id": other_id})["key"], "other")
+        self.assertEqual(self.collection.find_one({"team_id": "t", "key": "k"})["n"], 1)
+
+        with self.assertRaises(BulkWriteError) as error:
+            self.collection.insert_many([{"team_id": "u", "key": "k"}, {"team_id": "t", "key": "k"}])
+        self.assertEqual(error.exception.details["nInserted"], 1)
+
+    def test_concurrent_conditional_updates(self):
+        document_id = self.collection.insert_one({"tokens": 100}).inserted_id
+
+        def spend():
+            for _ in range(50):
+                while True:
+                    tokens = self.collection.find_one({"_id": document_id})["tokens"]
+                    if self.collection.find_one_and_update({"_id": document_id, "tokens": tokens},
+                                                           {"$inc": {"tokens": -1}}):
+                        break
+
+        threads = [threading.Thread(target=spend) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.collection.find_one({"_id": document_id})["tokens"], 0)
+
+    def test_ttl_and_capped(self):
+        self.collection.create_index("created_at", expireAfterSeconds=60)
+        self.collection.insert_one({"created_at": datetime.now(timezone.utc) - timedelta(minutes=2)})
+        self.assertEqual(self.collection.count_documents({}), 0)
+
+        events = self.db.create_collection("events", capped=True, size=200)
+        with self.assertRaises(CollectionInvalid):
+            self.db.create_collection("events", capped=True, size=200)
+        for n in range(20):
+            events.insert_one({"n": n})
+        self.assertLess(events.estimated_document_count(), 20)
+        self.assertEqual(events.find_one({}, sort=[("$natural", -1)])["n"], 19)
+
+    def test_snapshot(self):
+        self.collection.create_index("name", unique=True)
+        self.collection.insert_one({"name": "a", "at": datetime(2025, 1, 1)})
+        events = self.db.create_collection("events", capped=True, size=200)
+        events.insert_one({"n": 0})
+        path = os.path.join(tempfile.mkdtemp(), "db.pkl")
+        self.db.save(path)
+
+        restored_db = MemoryDatabase(path)
+        restored = restored_db.get_collection("items")
+        self.assertEqual(restored.find_one({"name": "a"})["at"], datetime(2025, 1, 1))
+        with self.assertRaises(DuplicateKeyError):
+            restored.insert_one({"name": "a"})
+        for n in range(1, 20):
+            restored_db.get_collection("events").insert_one({"n": n})
+        self.assertLess(restored_db.get_collection("events").estimated_document_count(), 20)
+
+
+class TestRepositoriesInMemory(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.db.get_collection("tasks").create_index(["team_id", "challenge_id"], unique=True)
+        challenge_repository = ChallengeRepository(self.db)
+        with unittest.mock.patch("app.repositories.challanges_repository.os.makedirs"):
+            self.challenge_id = challenge_repository.create_challenge("Memory", "Test", 10, 3)
+        self.team_id, *_ = TeamsRepository(self.db).create_teams(["team1"])[0]
+        self.task_repository = TaskRepository(self.db)
+        self.task_id = self.task_repository.create_tasks([self.team_id], self.challenge_id)[0]
+
+    def test_purchase_labels(self):
+        task = self.task_repository.get_task_by_id(self.task_id)
+        self.assertEqual(self.task_repository.purchase_labels(task, [1, 2, 3], price=1), (7, 3))
+        stale = task
+        self.assertEqual(self.task_repository.purchase_labels(stale, [3, 4], price=1), (6, 1))
+        task = self.task_repository.get_task_by_id(self.task_id)
+        self.assertEqual(task.requested_correct_ids, [1, 2, 3, 4])
+        self.assertEqual(task.version, 2)
+
+    def test_start_time_matches_its_etag(self):
+        from flask import Flask
+        from app.routes.main import main_blueprint
+
+        app = Flask(__name__)
+        app.register_blueprint(main_blueprint, url_prefix='/api')
+        client = app.test_client()
+        challenge_repository = ChallengeRepository(self.db)
+        with unittest.mock.patch("app.routes.main.db", self.db), \
+                unittest.mock.patch("app.routes.main.settings.CHALLENGE_NAME", "Memory"):
+            challenge_repository.get_challenge_by_name("Memory")
+            self.assertEqual(client.get('/api/start_time', headers={"X-Token": "secret"}).status_code, 404)
+            # another worker starts the challenge: this worker's cached challenge is not invalidated
+            self.db.get_collection("challenges").update_one(
+                {"title": "Memory"}, {"$set": {"start_time": datetime(2025, 1, 1, tzinfo=timezone.utc),
+                                               "updated_at": datetime.now(timezone.utc)}})
+            response = client.get('/api/start_time', headers={"X-Token": "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["start_time"], 1735689600000)
+        self.assertIsNone(challenge_repository.get_challenge_by_name("Memory").start_time)
+
+    def test_admin_reads_the_updated_challenge(self):
+        from flask import Flask
+        from app.config.core import settings
+        from app.routes.challanges import challenges_blueprint
+
+        app = Flask(__name__)
+        app.register_blueprint(challenges_blueprint, url_prefix='/api/challenges')
+        client = app.test_client()
+        with unittest.mock.patch("app.routes.challanges.db", self.db):
+            ChallengeRepository(self.db).get_challenge_by_name("Memory")
+            # another worker updates the challenge: this worker's cached challenge is not invalidated
+            self.db.get_collection("challenges").update_one({"title": "Memory"}, {"$set": {"initial_tokens": 20}})
+            response = client.get('/api/challenges/', query_string={"title": "Memory"},
+                                  headers={"X-API-KEY": settings.ADMIN_API_KEY})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["initial_tokens"], 20)
+
+    def test_tasks_version_of_a_challenge(self):
+        with unittest.mock.patch("app.repositories.challanges_repository.os.makedirs"):
+            other_challenge_id = ChallengeRepository(self.db).create_challenge("Other", "Test", 10, 3)
+        team_id, *_ = TeamsRepository(self.db).create_teams(["team2"])[0]
+        self.task_repository.create_tasks([team_id], self.challenge_id)
+        version = self.task_repository.get_tasks_version(self.challenge_id)
+        self.assertTrue(version.endswith(":2"))
+
+        # an older task of this challenge is replaced by a task of another challenge
+        self.task_repository.delete_task(self.task_id)
+        self.task_repository.create_tasks([team_id], other_challenge_id)
+        self.assertNotEqual(self.task_repository.get_tasks_version(self.challenge_id), version)
+
+    def test_duplicate_task(self):
+        with self.assertRaises(Exception):
+            self.task_repository.create_tasks([self.team_id], self.challenge_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import gzip
+import json
+import unittest
+
+from flask import Flask, Response, request, jsonify
+from flask_compress import Compress
+
+from app.middleware import GzipRequestMiddleware
+from app.routes.utils import stream_json_array
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['COMPRESS_ALGORITHM'] = ['zstd', 'gzip']
+        self.app.config['COMPRESS_ALGORITHM_STREAMING'] = ['zstd', 'gzip']
+        self.app.config['COMPRESS_MIN_SIZE'] = 1024
+        self.app.config['COMPRESS_STREAMS'] = True
+        Compress(self.app)
+        self.app.wsgi_app = GzipRequestMiddleware(self.app.wsgi_app, max_size=64 * 1024)
+
+        @self.app.route('/echo', methods=['POST'])
+        def echo():
+            return jsonify({"ids": request.get_json()["ids"]})
+
+        @self.app.route('/items')
+        def items():
+            return stream_json_array({"id": i} for i in range(1000))
+
+        @self.app.route('/labels')
+        def labels():
+            return Response((json.dumps({"id": i}) + "\n" for i in range(1000)), mimetype="application/x-ndjson")
+
+        self.client = self.app.test_client()
+
+    def post_gzip(self, body: bytes):
+        return self.client.post('/echo', data=gzip.compress(body), headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        })
+
+    def test_plain_request_body(self):
+        response = self.client.post('/echo', json={"ids": [1, 2]})
+        self.assertEqual(json.loads(response.data), {"ids": [1, 2]})
+
+    def test_gzip_request_body(self):
+        response = self.post_gzip(json.dumps({"ids": [1, 2, 3]}).encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"ids": [1, 2, 3]})
+
+    def test_decompression_bomb_rejected(self):
+        response = self.post_gzip(b'{"ids": [' + b" " * (128 * 1024) + b"]}")
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("exceeds", json.loads(response.data)["message"])
+
+    def test_invalid_gzip_body(self):
+        response = self.client.post('/echo', data=b"not gzip", headers={"Content-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unsupported_encoding(self):
+        response = self.client.post('/echo', data=b"{}", headers={"Content-Encoding": "br"})
+        self.assertEqual(response.status_code, 415)
+
+    def test_response_compression_threshold(self):
+        small = self.client.post('/echo', json={"ids": [1]}, headers={"Accept-Encoding": "gzip"})
+        self.assertIsNone(small.headers.get("Content-Encoding"))
+
+        ids = list(range(5000))
+        large = self.client.post('/echo', json={"ids": ids}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(large.headers.get("Content-Encoding"), "gzip")
+        self.assertEqual(json.loads(gzip.decompress(large.data)), {"ids": ids})
+
+        preferred = self.client.post('/echo', json={"ids": ids}, headers={"Accept-Encoding": "gzip, zstd"})
+        self.assertEqual(preferred.headers.get("Content-Encoding"), "zstd")
+
+    def test_streamed_json_is_compressed(self):
+        response = self.client.get('/items', headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers.get("Content-Encoding"), "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.data)), [{"id": i} for i in range(1000)])
+
+        # NDJSON chunks are flushed as they are produced
+        response = self.client.get('/labels', headers={"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.headers.get("Content-Encoding"))
+        self.assertEqual(len(response.data.splitlines()), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import unittest
+from datetime import datetime
+
+from flask import Flask
+from werkzeug.exceptions import BadRequest
+
+from app.models.models import Team
+from app.routes.utils import get_page_args, stream_json_array
+
+TEAM_FIELDS = ['name', 'created_at']
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def page_args(self, query_string):
+        with self.app.test_request_context('/', query_string=query_string):
+            return get_page_args(TEAM_FIELDS)
+
+    def test_defaults(self):
+        self.assertEqual(self.page_args({}), (None, None, None))
+
+    def test_valid_arguments(self):
+        after = "680f47978e62eff32ad3f308"
+        self.assertEqual(
+            self.page_args({"after": after, "limit": "50", "fields": "id, name"}),
+            (after, 50, ["name"]),
+        )
+        self.assertEqual(self.page_args({"fields": "id"}), (None, None, ["_id"]))
+
+    def test_invalid_arguments(self):
+        for query_string in ({"after": "nope"}, {"limit": "0"}, {"limit": "-1"}, {"limit": "abc"},
+                             {"limit": "1000000"}, {"fields": "name,secret_key"}):
+            with self.assertRaises(BadRequest):
+                self.page_args(query_string)
+
+    def test_stream_json_array(self):
+        created_at = datetime(2025, 3, 18, 9, 7, 5)
+        items = iter([
+            Team(_id="1", name="team1", created_at=created_at),
+            {"id": "2", "name": "team2"},
+        ])
+        with self.app.test_request_context('/'):
+            response = stream_json_array(items, exclude_none=True)
+            self.assertTrue(response.is_streamed)
+            body = "".join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in response.response)
+        self.assertEqual(json.loads(body), [
+            {"id": "1", "name": "team1", "created_at": "Tue, 18 Mar 2025 09:07:05 GMT"},
+            {"id": "2", "name": "team2"},
+        ])
+
+    def test_stream_empty_array(self):
+        with self.app.test_request_context('/'):
+            response = stream_json_array(iter([]))
+            body = "".join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in response.response)
+        self.assertEqual(json.loads(body), [])
+
+    def test_stream_failure_is_logged(self):
+        def items():
+            yield {"id": "1"}
+            raise RuntimeError("cursor died")
+
+        with self.app.test_request_context('/teams'):
+            response = stream_json_array(items())
+            chunks = iter(response.response)
+            self.assertEqual(next(chunks), "[")
+            self.assertEqual(next(chunks), '{"id": "1"}')
+            with self.assertLogs("flask_app", level="ERROR") as logs, self.assertRaises(RuntimeError):
+                next(chunks)
+        self.assertIn("GET /teams failed after 1 items", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import pstats
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import greenlet
+from flask import Flask, jsonify
+from werkzeug.exceptions import BadRequest, NotFound, Unauthorized
+
+from app.config.core import settings
+from app.profiling import list_profiles, profiled
+from app.routes.error_handler import json_error_handler
+from app.routes.profiles import profiles_blueprint
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.register_error_handler(BadRequest, lambda e: json_error_handler(e, 400, "Bad Request"))
+        self.app.register_error_handler(Unauthorized, lambda e: json_error_handler(e, 401, "Unauthorized"))
+        self.app.register_error_handler(NotFound, lambda e: json_error_handler(e, 404, "Not Found"))
+        self.app.register_blueprint(profiles_blueprint, url_prefix='/api/profiles')
+
+        @self.app.route('/api/lab_experiment', methods=['POST'])
+        @profiled
+        def lab_experiment():
+            if self.app.config.get("FAIL"):
+                raise BadRequest("Not enough tokens")
+            for _ in range(self.app.config.get("SWITCHES", 0)):
+                greenlet.greenlet(lambda: None).switch()
+            return jsonify({"labels": {str(i): i / 10 for i in range(100)}}), 200
+
+        self.client = self.app.test_client()
+        self.directory = tempfile.TemporaryDirectory()
+        self.admin = {"X-API-KEY": settings.ADMIN_API_KEY}
+        patchers = [
+            patch.object(settings, 'PROFILE_DIR', self.directory.name),
+            patch.object(settings, 'PROFILE_SAMPLE_RATE', 0),
+            patch.object(settings, 'PROFILE_MAX_FILES', 3),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+
+    def test_not_profiled_by_default(self):
+        response = self.client.post('/api/lab_experiment')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        response = self.client.post('/api/lab_experiment', headers={"X-Profile": "1", "X-API-KEY": "wrong"})
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(list_profiles(), [])
+
+    def test_admin_header(self):
+        response = self.client.post('/api/lab_experiment', headers={"X-Profile": "1", **self.admin})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()["labels"]), 100)
+        name = response.headers["X-Profile-Id"]
+        self.assertRegex(name, r"-lab_experiment-")
+
+        profiles = self.client.get('/api/profiles/', headers=self.admin).get_json()
+        self.assertEqual([profile["name"] for profile in profiles], [name])
+        self.assertEqual(profiles[0]["endpoint"], "lab_experiment")
+
+        download = self.client.get(f'/api/profiles/{name}', headers=self.admin)
+        self.assertEqual(download.status_code, 200)
+        with tempfile.NamedTemporaryFile(suffix=".prof") as f:
+            f.write(download.data)
+            f.flush()
+            functions = [function for _, _, function in pstats.Stats(f.name).stats]
+        self.assertIn("lab_experiment", functions)
+        download.close()
+
+    def test_sampling_and_rotation(self):
+        with patch.object(settings, 'PROFILE_SAMPLE_RATE', 1):
+            for _ in range(5):
+                response = self.client.post('/api/lab_experiment')
+                self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(len(list_profiles()), 3)
+
+    def test_greenlet_switches(self):
+        response = self.client.post('/api/lab_experiment', headers={"X-Profile": "1", **self.admin})
+        self.assertEqual(response.headers["X-Profile-Greenlet-Switches"], "0")
+        self.app.config["SWITCHES"] = 2
+        response = self.client.post('/api/lab_experiment', headers={"X-Profile": "1", **self.admin})
+        self.assertEqual(response.headers["X-Profile-Greenlet-Switches"], "2")
+        self.assertIsNone(greenlet.gettrace())
+
+    def test_failed_request_is_saved(self):
+        self.app.config["FAIL"] = True
+        response = self.client.post('/api/lab_experiment', headers={"X-Profile": "1", **self.admin})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(list_profiles()), 1)
+
+    def test_endpoints_require_admin(self):
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 401)
+        self.assertEqual(self.client.get('/api/profiles/x.prof').status_code, 401)
+        self.assertEqual(self.client.get('/api/profiles/..%2Fapp.log', headers=self.admin).status_code, 404)
+        self.assertEqual(self.client.get('/api/profiles/20250101T000000-submit-0123abcd.prof',
+                                         headers=self.admin).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
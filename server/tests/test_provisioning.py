@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from flask import Flask
+from werkzeug.exceptions import BadRequest
+from werkzeug.security import check_password_hash
+
+from app.config.core import settings
+from app.models.memory_db import MemoryDatabase
+from app.repositories.challanges_repository import ChallengeRepository
+from app.repositories.teams_repository import TeamsRepository
+from app.routes.error_handler import json_error_handler
+from app.routes.teams import teams_blueprint
+
+
+class TestCreateTeams(unittest.TestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.find.return_value = []
+        self.collection.insert_many.side_effect = lambda documents: MagicMock(
+            inserted_ids=[ObjectId() for _ in documents])
+        db = MagicMock()
+        db.get_collection.return_value = self.collection
+        self.teams_repository = TeamsRepository(db)
+
+    def test_create_teams(self):
+        teams = self.teams_repository.create_teams(["team1", "team2"])
+
+        self.collection.insert_many.assert_called_once()
+        documents = self.collection.insert_many.call_args.args[0]
+        self.assertEqual([team[1] for team in teams], ["team1", "team2"])
+        for (team_id, name, password, secret_key), document in zip(teams, documents):
+            self.assertEqual(document["name"], name)
+            self.assertTrue(check_password_hash(document["password"], password))
+            self.assertEqual(secret_key, self.teams_repository.generate_token(password))
+
+    @patch("app.repositories.teams_repository.settings.PROVISIONING_PARALLEL_THRESHOLD", 2)
+    def test_parallel_hashing(self):
+        hashes = TeamsRepository._hash_passwords(["a", "b", "c"])
+        self.assertTrue(all(check_password_hash(h, p) for h, p in zip(hashes, ["a", "b", "c"])))
+
+    def test_duplicate_names(self):
+        with self.assertRaises(BadRequest):
+            self.teams_repository.create_teams(["team1", "team1"])
+
+        self.collection.find.return_value = [{"name": "team1"}]
+        with self.assertRaises(BadRequest):
+            self.teams_repository.create_teams(["team1", "team2"])
+        self.collection.insert_many.assert_not_called()
+
+
+class TestBulkProvisioning(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.db.get_collection("teams").create_index("name", unique=True)
+        self.db.get_collection("tasks").create_index(["team_id", "challenge_id"], unique=True)
+        self.datasets_path = tempfile.TemporaryDirectory()
+        self.addCleanup(self.datasets_path.cleanup)
+        self.challenge_path = os.path.join(self.datasets_path.name, settings.CHALLENGE_NAME)
+        patchers = [
+            patch("app.routes.teams.db", self.db),
+            patch.object(settings, "DATASETS_PATH", self.datasets_path.name),
+            patch.object(settings, "PROVISIONING_WORKERS", 1),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.challenge_id = ChallengeRepository(self.db).create_challenge(settings.CHALLENGE_NAME, "Test", 10, 3)
+
+        app = Flask(__name__)
+        app.register_error_handler(BadRequest, lambda e: json_error_handler(e, 400, "Bad Request"))
+        app.register_blueprint(teams_blueprint, url_prefix='/api/teams')
+        self.client = app.test_client()
+
+    def create(self, **body):
+        return self.client.post('/api/teams/bulk', json={"challenge_id": self.challenge_id, **body},
+                                headers={"X-API-KEY": settings.ADMIN_API_KEY})
+
+    def write_labels(self):
+        labels_df = pd.DataFrame({"score": np.arange(5.0)}, index=[3, 1, 4, 5, 9])
+        labels_df.to_pickle(os.path.join(self.challenge_path, "labels_df.pkl"))
+
+    def test_invalid_payload(self):
+        response = self.client.post('/api/teams/bulk', data="names", content_type="application/json",
+                                    headers={"X-API-KEY": settings.ADMIN_API_KEY})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/teams/bulk', data="null", content_type="application/json",
+                                    headers={"X-API-KEY": settings.ADMIN_API_KEY})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["message"], "Invalid JSON payload")
+
+    def test_missing_labels_creates_nothing(self):
+        response = self.create(count=3, prefix="Lost")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Failed to read labels file", response.get_json()["message"])
+        self.assertEqual(self.db.get_collection("teams").count_documents({}), 0)
+
+        self.write_labels()
+        response = self.create(count=3, prefix="Lost")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data.decode().splitlines()), 4)
+        self.assertEqual(self.db.get_collection("tasks").count_documents({}), 3)
+
+    def test_failed_tasks_are_rolled_back(self):
+        self.write_labels()
+        with patch("app.routes.teams.TaskRepository.create_tasks", side_effect=BadRequest("Task already exists")):
+            response = self.create(names=["a", "b"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.db.get_collection("teams").count_documents({}), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.challenge_path, "a_mappings.npy")))
+        self.assertFalse(os.path.exists(os.path.join(self.challenge_path, "a_mappings.seed")))
+
+        self.assertEqual(self.create(names=["a", "b"]).status_code, 200)
+
+    def test_existing_names_keep_their_mappings(self):
+        self.write_labels()
+        self.assertEqual(self.create(names=["a"]).status_code, 200)
+        mapping_file = os.path.join(self.challenge_path, "a_mappings.npy")
+        mapping = np.load(mapping_file)
+        response = self.create(names=["a", "b"])
+        self.assertEqual(response.status_code, 400)
+        np.testing.assert_array_equal(np.load(mapping_file), mapping)
+        self.assertFalse(os.path.exists(os.path.join(self.challenge_path, "b_mappings.npy")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from flask import Flask, jsonify
+from flask_limiter import Limiter
+
+from app.config.core import settings
+from app.routes.rate_limits import ids_cost, get_token
+
+
+class TestRateLimits(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def test_ids_cost_without_ids(self):
+        """Requests without an ids list cost a single unit."""
+        with self.app.test_request_context('/', method='POST', json={}):
+            self.assertEqual(ids_cost(), 1)
+        with self.app.test_request_context('/', method='POST', data='not json'):
+            self.assertEqual(ids_cost(), 1)
+
+    def test_ids_cost_scales_with_payload(self):
+        """Cost is one unit per started RATE_LIMIT_IDS_PER_UNIT ids."""
+        per_unit = settings.RATE_LIMIT_IDS_PER_UNIT
+        with self.app.test_request_context('/', method='POST', json={'ids': list(range(per_unit))}):
+            self.assertEqual(ids_cost(), 1)
+        with self.app.test_request_context('/', method='POST', json={'ids': list(range(per_unit + 1))}):
+            self.assertEqual(ids_cost(), 2)
+        with self.app.test_request_context('/', method='POST', json={'ids': list(range(100 * per_unit))}):
+            self.assertEqual(ids_cost(), 100)
+
+    def test_requests_without_token_are_limited_per_address(self):
+        with self.app.test_request_context('/', headers={"X-TOKEN": "team1"}, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            self.assertEqual(get_token(), "team1")
+        with self.app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+            self.assertEqual(get_token(), "10.0.0.1")
+        with self.app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.2'}):
+            self.assertEqual(get_token(), "10.0.0.2")
+
+    def test_weighted_limit_rejects_large_batches(self):
+        """A large batch consumes the same budget as many small ones."""
+        limiter = Limiter(key_func=get_token, storage_uri="memory://", strategy=settings.RATE_LIMIT_STRATEGY)
+        limiter.init_app(self.app)
+
+        @self.app.route('/lab', methods=['POST'])
+        @limiter.limit("5 per minute", cost=ids_cost)
+        def lab():
+            return jsonify({"ok": True})
+
+        client = self.app.test_client()
+        per_unit = settings.RATE_LIMIT_IDS_PER_UNIT
+        headers = {"X-TOKEN": "team1"}
+        response = client.post('/lab', json={'ids': list(range(4 * per_unit))}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = client.post('/lab', json={'ids': list(range(2 * per_unit))}, headers=headers)
+        self.assertEqual(response.status_code, 429)
+        response = client.post('/lab', json={'ids': [1]}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        # Other teams have their own budget
+        response = client.post('/lab', json={'ids': list(range(5 * per_unit))}, headers={"X-TOKEN": "team2"})
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
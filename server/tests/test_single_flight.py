@@ -0,0 +1,92 @@
+import threading
+import time
+import unittest
+
+from app.repositories.utils import single_flight
+
+
+class SlowRepository:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    @single_flight(ttl=0.2, stale_ttl=0.5)
+    def get(self, key):
+        self.calls += 1
+        time.sleep(self.delay)
+        if key == "missing":
+            raise KeyError(key)
+        return f"{key}:{self.calls}"
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        SlowRepository.get.invalidate()
+        self.repository = SlowRepository()
+
+    def run_concurrently(self, fn, count=20):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_one_call(self):
+        results = self.run_concurrently(lambda: self.repository.get("a"))
+        self.assertEqual(self.repository.calls, 1)
+        self.assertEqual(set(results), {"a:1"})
+
+    def test_different_keys_are_not_coalesced(self):
+        self.assertEqual(self.repository.get("a"), "a:1")
+        self.assertEqual(self.repository.get("b"), "b:2")
+
+    def test_errors_are_shared_and_not_cached(self):
+        errors = []
+
+        def call():
+            try:
+                self.repository.get("missing")
+            except KeyError as e:
+                errors.append(e)
+
+        self.run_concurrently(call, count=5)
+        self.assertEqual(len(errors), 5)
+        self.assertEqual(self.repository.calls, 1)
+        with self.assertRaises(KeyError):
+            self.repository.get("missing")
+        self.assertEqual(self.repository.calls, 2)
+
+    def test_stale_while_revalidate(self):
+        self.assertEqual(self.repository.get("a"), "a:1")
+        time.sleep(0.25)
+        # Stale value is served immediately while one refresh runs in the background
+        self.assertEqual(self.repository.get("a"), "a:1")
+        time.sleep(0.1)
+        self.assertEqual(self.repository.get("a"), "a:2")
+        time.sleep(0.8)
+        # Past the stale window the caller waits for a fresh value
+        self.assertEqual(self.repository.get("a"), "a:3")
+
+    def test_keyed_by_collection(self):
+        class CollectionRepository(SlowRepository):
+            def __init__(self, collection):
+                super().__init__(delay=0)
+                self.collection = collection
+
+        first, same, other = (CollectionRepository(name) for name in ("db1.items", "db1.items", "db2.items"))
+        first.get("a")
+        same.get("a")
+        other.get("a")
+        # a new repository of the same collection reuses the result, another collection does not
+        self.assertEqual((first.calls, same.calls, other.calls), (1, 0, 1))
+
+    def test_invalidate(self):
+        self.repository.get("a")
+        SlowRepository.get.invalidate()
+        self.assertEqual(self.repository.get("a"), "a:2")
+
+
+if __name__ == '__main__':
+    unittest.main()
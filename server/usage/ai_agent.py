@@ -1,331 +1,332 @@
+import argparse
 import json
 import logging
-import requests
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 
+# the challenge client package: pip install -e ../client
+from src.client import APIErrorResponse, DOChallengeClient
+from src.configs import Config
+from src.label_cache import LabelCache
 
-class ChatAssistant:
-    def __init__(self, client):
-        self.client = client
-        self.model = "gpt-4o"
-        self.api_host = "http://10.5.0.204:5000/api"  # Centralized API host for all endpoints
-
-        # Define tool signatures with updated descriptions
-        self.tool_signatures = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_labels",
-                    "description": "Fetch labels using a secret key and a list of indexes. Checks available tokens before calling.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "secret_key": {
-                                "type": "string",
-                                "description": "The secret key for authentication."
-                            },
-                            "indexes": {
-                                "type": "array",
-                                "items": {"type": "integer"},
-                                "description": "A list of indexes to fetch labels for."
-                            }
-                        },
-                        "required": ["secret_key", "indexes"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "benchmark",
-                    "description": "Call the benchmark API with exactly 2000 indexes.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "secret_key": {
-                                "type": "string",
-                                "description": "The secret key for authentication."
-                            },
-                            "indexes": {
-                                "type": "array",
-                                "items": {"type": "integer"},
-                                "description": "A list of exactly 2000 indexes for benchmarking. Make sure to validate the length."
-                            }
-                        },
-                        "required": ["secret_key", "indexes"]
+SECRET_KEY_ENV = "DO_CHALLENGE_SECRET_KEY"
+
+SYSTEM_PROMPT = f"""
+# DO 2025 Challenge - AI Agent Task Description
+
+## Overview
+You are an autonomous agent participating in the **DO 2025 Challenge**. Your goal is to find the compounds
+with the highest labels: buy labels with lab experiments, choose the best ids and submit them for benchmarking.
+
+## Tools
+- `lab_experiment(ids)`: returns the labels of the given ids. Every id costs **1 token** the first time;
+  ids you already bought are free. Large lists are split into batches for you.
+- `submit(ids)`: benchmarks exactly **{Config.SUBMISSION_LENGTH}** distinct ids and returns the score.
+  There are only **three** benchmarks, and a repeated submission is answered without using one.
+- `remained_budget()`: returns the tokens and benchmarks left. Every tool result already includes them,
+  so you rarely need it.
+
+Independent tool calls of one turn run concurrently, so request several batches of labels at once.
+
+## Workflow
+Retrieve labels, pick the {Config.SUBMISSION_LENGTH} most promising ids, submit them, and stop when the
+benchmarks are used or the score stops improving. Answer without tool calls when you are done.
+"""
+
+TOOL_SIGNATURES = [
+    {
+        "type": "function",
+        "function": {
+            "name": "lab_experiment",
+            "description": "Fetch the labels of a list of ids. Each id costs 1 token the first time it is requested.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ids": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                        "description": "The ids to fetch labels for."
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "available_tokens",
-                    "description": "Fetch the number of available tokens from the API endpoint.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "secret_key": {
-                                "type": "string",
-                                "description": "The secret key for authentication."
-                            }
-                        },
-                        "required": ["secret_key"]
+                },
+                "required": ["ids"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "submit",
+            "description": f"Benchmark exactly {Config.SUBMISSION_LENGTH} distinct ids.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ids": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                        "description": f"Exactly {Config.SUBMISSION_LENGTH} distinct ids."
                     }
-                }
+                },
+                "required": ["ids"]
             }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "remained_budget",
+            "description": "Fetch the number of available tokens and benchmarks.",
+            "parameters": {"type": "object", "properties": {}}
+        }
+    }
+]
+
+
+class OpenAIBackend:
+    """
+    LLM backend calling the chat completions API of an OpenAI client.
+    """
+
+    def __init__(self, client, model: str = "gpt-4o", temperature: float = 1):
+        self.client = client
+        self.model = model
+        self.temperature = temperature
+
+    def complete(self, messages, tools):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            tools=tools,
+            temperature=self.temperature,
+        )
+        return response.choices[0].message
+
+
+class ScriptedBackend:
+    """
+    Local LLM stand-in that replays a script, to run the agent loop offline. Every turn
+    is either a list of (tool name, arguments) pairs, answered as tool calls, or a string,
+    answered as the final message. The script ends with a final message.
+    """
+
+    def __init__(self, turns):
+        self.turns = list(turns)
+        self.turn = 0
+
+    def complete(self, messages, tools):
+        turn = self.turns[self.turn] if self.turn < len(self.turns) else "Done."
+        self.turn += 1
+        if isinstance(turn, str):
+            return SimpleNamespace(role="assistant", content=turn, tool_calls=None)
+        tool_calls = [
+            SimpleNamespace(id=f"call_{uuid.uuid4().hex[:12]}", type="function",
+                            function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+            for name, arguments in turn
         ]
+        return SimpleNamespace(role="assistant", content=None, tool_calls=tool_calls)
+
+
+class ChatAssistant:
+    def __init__(self, backend, challenge_client: DOChallengeClient, max_workers: int = Config.BATCH_WORKERS,
+                 label_cache: LabelCache = None):
+        """
+        Pass a label_cache to answer repeated lab experiments locally; it is attached to
+        the challenge client unless the client already has one.
+        """
+        self.backend = backend
+        self.challenge_client = challenge_client
+        if label_cache is not None and challenge_client.label_cache is None:
+            challenge_client.label_cache = label_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.tool_signatures = TOOL_SIGNATURES
+        # budget as of the last response, updated by every tool call instead of re-queried
+        self.budget_lock = threading.Lock()
+        self.available_tokens = None
+        self.available_benchmarks = None
+        self.turn_budget = set()
+        self.tool_calls = 0
+
+    def close(self):
+        self.executor.shutdown()
+
+    def update_budget(self, response):
+        """
+        The concurrent calls of a turn answer in any order, and the budget only goes
+        down while they run, so within a turn the lowest reported value is kept.
+        """
+        with self.budget_lock:
+            for field in ("available_tokens", "available_benchmarks"):
+                value = getattr(response, field, None)
+                if value is None:
+                    continue
+                if field in self.turn_budget:
+                    value = min(value, getattr(self, field))
+                setattr(self, field, value)
+                self.turn_budget.add(field)
+
+    def budget(self):
+        return {"available_tokens": self.available_tokens, "available_benchmarks": self.available_benchmarks}
 
     def handle_tool_call(self, function_name, args):
         """
         Process a tool call and return the result.
         """
-        tool_name = function_name
         try:
-            tool_args = json.loads(args)
+            tool_args = json.loads(args or "{}")
         except json.JSONDecodeError as e:
             logging.error(f"Invalid JSON arguments: {args}")
             return f"Error: Invalid JSON arguments - {e}"
 
-        logging.info(f"Handling tool call: {tool_name} with args: {tool_args}")
-        print(f"Handling tool call: {tool_name} with args: {tool_args}")
-
-        if tool_name == "get_labels":
-            return self.perform_get_labels(tool_args["secret_key"], tool_args["indexes"])
-        elif tool_name == "benchmark":
-            return self.perform_benchmark(tool_args["secret_key"], tool_args["indexes"])
-        elif tool_name == "available_tokens":
-            return self.perform_available_tokens(tool_args["secret_key"])
-
-        logging.warning(f"Unknown tool call: {tool_name}")
-        return f"Unknown tool call: {tool_name}"
-
-    def perform_get_labels(self, secret_key, indexes):
-        """
-        Call the get_labels API endpoint after checking available tokens.
-        """
-        # Check available tokens before requesting labels
-        available = json.loads(self.perform_available_tokens(secret_key))
-        # ["available_tokens"]
-        try:
-            available_tokens = int(available[0]["available_tokens"])
-        except ValueError:
-            logging.error("Failed to parse available tokens")
-            return f"Error: Failed to parse available tokens: {available}"
-
-        if available_tokens < len(indexes):
-            error_msg = f"Not enough tokens. Required: {len(indexes)}, Available: {available_tokens}"
-            logging.error(error_msg)
-            return error_msg
-
-        url = f"{self.api_host}/get_labels"
-        headers = {"x-token": secret_key}
-        body = {"challenge_name": "DO2025", "indexes": indexes}
+        logging.info(f"Handling tool call: {function_name}")
         try:
-            response = requests.post(url, headers=headers, json=body)
-            response.raise_for_status()
-            logging.info("Successfully fetched labels")
-            return response.text
-        except requests.RequestException as e:
-            logging.error(f"Error in perform_get_labels: {e}")
-            return f"Error fetching labels: {e}"
-
-    def perform_available_tokens(self, secret_key):
+            if function_name == "lab_experiment":
+                return self.perform_lab_experiment(tool_args["ids"])
+            elif function_name == "submit":
+                return self.perform_submit(tool_args["ids"])
+            elif function_name == "remained_budget":
+                return self.perform_remained_budget()
+        except KeyError as e:
+            return f"Error: Missing argument {e}"
+        except ValueError as e:
+            return f"Error: {e}"
+
+        logging.warning(f"Unknown tool call: {function_name}")
+        return f"Unknown tool call: {function_name}"
+
+    def perform_lab_experiment(self, ids):
         """
-        Call the available tokens API endpoint.
+        Labels of the ids, answered from the label cache when they were bought before.
+        The budget is checked locally against the ids that are not cached.
         """
-        url = f"{self.api_host}/available_tokens"
-        headers = {"x-token": secret_key}
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            logging.info("Successfully fetched available tokens")
-            return response.text.strip()
-        except requests.RequestException as e:
-            logging.error(f"Error in perform_available_tokens: {e}")
-            return f"Error fetching tokens: {e}"
-
-    def perform_benchmark(self, secret_key, indexes):
-        """
-        Call the benchmark API endpoint. Requires exactly 2000 indexes.
-        """
-        if len(indexes) != 2000:
-            error_msg = "Error: Invalid number of indexes for benchmark. Expected 2000 indexes."
+        client = self.challenge_client
+        new_ids = len(set(ids))
+        if client.label_cache is not None:
+            new_ids -= len(client.label_cache.get(client.secret_key, set(ids)))
+        if self.available_tokens is not None and new_ids > self.available_tokens:
+            error_msg = f"Not enough tokens. Required: {new_ids}, Available: {self.available_tokens}"
             logging.error(error_msg)
             return error_msg
 
-        url = f"{self.api_host}/benchmark"
-        headers = {"x-token": secret_key}
-        body = {"challenge_name": "DO2025", "indexes": indexes}
-        try:
-            response = requests.post(url, headers=headers, json=body)
-            response.raise_for_status()
-            logging.info("Successfully called benchmark")
-            return response.text
-        except requests.RequestException as e:
-            logging.error(f"Error in perform_benchmark: {e}")
-            return f"Error in benchmark: {e}"
-
-    def perform_submit_predictions(self, secret_key, predictions):
+        response = client.lab_experiment_batched(ids)
+        if isinstance(response, APIErrorResponse):
+            return response.model_dump_json()
+        self.update_budget(response)
+        return json.dumps({"labels": response.labels, **self.budget()})
+
+    def perform_submit(self, ids):
+        response = self.challenge_client.submit(ids)
+        if isinstance(response, APIErrorResponse):
+            return response.model_dump_json()
+        self.update_budget(response)
+        return response.model_dump_json()
+
+    def perform_remained_budget(self):
+        response = self.challenge_client.remained_budget()
+        if isinstance(response, APIErrorResponse):
+            return response.model_dump_json()
+        self.update_budget(response)
+        return response.model_dump_json()
+
+    def run_tool_calls(self, tool_calls):
         """
-        Call the submit predictions API endpoint. Predictions must be exactly 2000.
+        Runs the tool calls of one turn concurrently and returns their tool messages in order.
         """
-        if len(predictions) != 2000:
-            error_msg = "Error: Invalid number of predictions. Expected exactly 2000."
-            logging.error(error_msg)
-            return error_msg
-
-        url = f"{self.api_host}/submit"
-        headers = {"x-token": secret_key}
-        body = {"predictions": predictions}
-        try:
-            response = requests.post(url, headers=headers, json=body)
-            response.raise_for_status()
-            logging.info("Successfully submitted predictions")
-            return response.text
-        except requests.RequestException as e:
-            logging.error(f"Error in perform_submit_predictions: {e}")
-            return f"Error submitting predictions: {e}"
-
-    def chat_loop(self, messages, temperature=1):
+        with self.budget_lock:
+            self.turn_budget.clear()
+        results = self.executor.map(
+            lambda tool_call: self.handle_tool_call(tool_call.function.name, tool_call.function.arguments),
+            tool_calls,
+        )
+        self.tool_calls += len(tool_calls)
+        return [{"role": "tool", "content": result, "tool_call_id": tool_call.id}
+                for tool_call, result in zip(tool_calls, results)]
+
+    def chat_loop(self, messages, max_turns: int = 50):
         """
-        Continuously call the completions API while handling tool calls.
+        Calls the backend and runs its tool calls until it answers without any.
+        Returns the final answer, or None when the backend fails or max_turns is reached.
         """
-        while True:
+        if self.available_tokens is None:
+            self.perform_remained_budget()
+        for _ in range(max_turns):
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    tools=self.tool_signatures,
-                    temperature=temperature,
-                )
+                message = self.backend.complete(messages, self.tool_signatures)
             except Exception as e:
                 logging.error(f"Error during chat completion: {e}")
-                break
-
-            logging.info("Received response from completions API")
-            choice = response.choices[0]
-            messages.append(choice.message)
-
-            # Process any tool calls, if present
-            if hasattr(choice.message, "tool_calls") and choice.message.tool_calls:
-                for tool_call in choice.message.tool_calls:
-                    tool_result = self.handle_tool_call(tool_call.function.name, tool_call.function.arguments)
-                    print(f"Tool call: {tool_call.function.name} result: {tool_result}")
-                    messages.append({
-                        "role": "tool",
-                        "content": tool_result,
-                        "tool_call_id": tool_call.id
-                    })
-            else:
-                # Final response without tool calls ends the loop
-                print("Final response:", choice.message.content)
+                return None
+            messages.append(message)
+
+            if not getattr(message, "tool_calls", None):
+                logging.info(f"Final response: {message.content}")
+                return message.content
+            messages.extend(self.run_tool_calls(message.tool_calls))
+        logging.warning(f"No final response after {max_turns} turns")
+        return None
+
+
+def benchmark_script(turns: int, calls_per_turn: int, ids_per_call: int, compounds: int):
+    """
+    Script of a label-hungry agent: turns of concurrent lab experiments over ids that partly
+    repeat earlier ones, then a submission of the first ids and a final answer.
+    """
+    script = []
+    for turn in range(turns):
+        start = turn * calls_per_turn * ids_per_call // 2
+        script.append([
+            ("lab_experiment", {"ids": [(start + call * ids_per_call + i) % compounds for i in range(ids_per_call)]})
+            for call in range(calls_per_turn)
+        ])
+    script.append([("submit", {"ids": list(range(Config.SUBMISSION_LENGTH))}), ("remained_budget", {})])
+    script.append("Done.")
+    return script
 
 
 if __name__ == "__main__":
-    from openai import OpenAI
-
-    logging.basicConfig(level=logging.INFO)
-
-    client = OpenAI()
-    assistant = ChatAssistant(client)
-
-    # System message with the challenge description and API guidelines
-    system_message = {
-        "role": "system",
-        "content": """
-# DO 2025 Challenge - AI Agent Task Description
-
-YOUR_SECRET_KEY are c-8ZAi_6N5GfgNaSZtKdoR5CrlOqpseM_dUyv1EMaEM=
-## Overview  
-You are an autonomous OpenAI agent participating in the **DO 2025 Challenge**. Your goal is to process label data, generate evaluation IDs using your internal completions capabilities, and submit predictions via the benchmark API.
-
-## API Host & Authentication  
-All API endpoints are hosted at: **http://localhost:5000/api**  
-
-### Authentication  
-- Every API request **must** include a secret key in the request headers.  
-- Set the secret key in the `X-Token` header as follows:  
-  ```
-  X-Token: YOUR_SECRET_KEY
-  ```
-
-## Task Steps  
-
-### 1. Retrieve Labels  
-- **API Call:**  
-  ```http
-  GET http://localhost:5000/api/get_labels
-  ```
-- **Headers:**  
-  ```http
-  X-Token: YOUR_SECRET_KEY
-  ```
-- **Token Cost:** Each label request costs **1 token** from your **10,000-token** budget.  
-- **Validation:** Ensure the API response is valid (check status codes and data integrity).  
-- **Extraction:** Parse the response and extract the necessary labels.  
-
-You can get labels for up to **10,000 indexes** in a single request. You must call 2000 indexes at a time.
-You can get labels in random order not just sequential order.
-You must check the available tokens before making label requests.
-
-### 2. Check Available Tokens  
-- **API Call:**  
-  ```http
-  GET http://localhost:5000/api/available_tokens
-  ```
-- **Headers:**  
-  ```http
-  X-Token: YOUR_SECRET_KEY
-  ```
-- **Strategy:** Optimize label requests to stay within your **10,000-token** limit.  
-
-### 3. Generate Evaluation IDs (Internal Completions)  
-- **Processing:** Based on the retrieved labels, generate predictions for evaluation IDs using internal completions logic. 
-- **Constraints:** You **must not** use external completion API calls.  
-- **Output Format:** Ensure that the predicted IDs match the expected format.  
-- **Submission Length:** The final submission must contain exactly **2,000 indexes**.
-You can generate submission indexes in random or some logical order not just sequential order.
-
-### 4. Submit Predictions  
-Submit 2000 labels if you have them. If you don't have 2000 labels, you can not submit. So do not try it.
-- **API Call:**  
-  ```http
-  POST http://localhost:5000/api/submit
-  ```
-- **Headers:**  
-  ```http
-  X-Token: YOUR_SECRET_KEY
-  ```
-- **Payload Format:**  
-  ```json
-  {
-    "predictions": [id1, id2, ..., id2000]
-  }
-  ```
-- **Error Handling:** Handle and log any errors or unsuccessful responses.
-
-## Benchmarks  
-There are **three** available benchmarks for evaluation. Your performance will be assessed based on prediction accuracy and token efficiency.
-From benchmark you must generate 2000 indexes and submit them to the benchmark API.
-
-## Execution Guidelines  
-- **API Host:** All API calls must be made to **http://localhost:5000/api**.  
-- **Authentication:** Every request **must** include the secret key in the `X-Token` header.  
-- **Budget Management:** You have a **10,000-token limit**; each label request costs **1 token**.  
-- **Token Monitoring:** Use `GET http://localhost:5000/api/available_tokens` to track remaining tokens.  
-- **Workflow:** Follow this structured process: **Retrieve Labels → Generate IDs → Submit Predictions**.  
-- **Submission Size:** Your submission must contain exactly **2,000 indexes**.  
-- **Logging & Debugging:** Implement error handling and log key steps.  
-- **Challenge Rules:** Adhere to format specifications and challenge constraints.
-
-Your performance in the **DO 2025 Challenge** depends on precise label retrieval, efficient token usage, and accurate evaluation ID predictions.  
-Execute each step carefully to maximize success.
-        """
-    }
-
+    parser = argparse.ArgumentParser(description="Run the challenge agent, or benchmark its loop offline.")
+    parser.add_argument("--secret-key", default=os.environ.get(SECRET_KEY_ENV))
+    parser.add_argument("--base-url", default=Config.BASE_URL)
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--workers", type=int, default=Config.BATCH_WORKERS, help="Concurrent tool calls")
+    parser.add_argument("--stub", action="store_true",
+                        help="Replay a scripted backend against an in-process simulation of the server")
+    parser.add_argument("--turns", type=int, default=20, help="Tool-calling turns of the scripted backend")
+    parser.add_argument("--calls-per-turn", type=int, default=4)
+    parser.add_argument("--ids-per-call", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING if args.stub else logging.INFO)
+
+    if args.stub:
+        from src.simulation import ChallengeSimulation
+
+        simulation = ChallengeSimulation.synthetic(compounds=100_000, seed=0)
+        challenge_client = simulation.client()
+        backend = ScriptedBackend(benchmark_script(args.turns, args.calls_per_turn, args.ids_per_call, 100_000))
+    else:
+        from openai import OpenAI
+
+        if not args.secret_key:
+            parser.error(f"--secret-key or ${SECRET_KEY_ENV} is required")
+        challenge_client = DOChallengeClient(args.secret_key)
+        challenge_client.base_url = args.base_url.rstrip("/")
+        backend = OpenAIBackend(OpenAI(), model=args.model)
+
+    assistant = ChatAssistant(backend, challenge_client, max_workers=args.workers, label_cache=LabelCache())
     messages = [
-        system_message,
-        {"role": "user",
-         "content": "Please solve the task, retrieve labels using 1000 indexes, and submit predictions only with 2000 indexes."}
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "Please solve the task: retrieve labels in batches of 1000 ids, "
+                                    f"and submit only exactly {Config.SUBMISSION_LENGTH} ids."},
     ]
-
-    assistant.chat_loop(messages)
+    start = time.perf_counter()
+    try:
+        answer = assistant.chat_loop(messages)
+    finally:
+        assistant.close()
+        challenge_client.close()
+    elapsed = time.perf_counter() - start
+    turns = sum(1 for message in messages if getattr(message, "role", None) == "assistant")
+    print(f"answer={answer!r} turns={turns} tool_calls={assistant.tool_calls} "
+          f"elapsed={elapsed:.3f}s turns_per_s={turns / elapsed:.1f} budget={assistant.budget()}")
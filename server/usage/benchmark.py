@@ -1,16 +1,249 @@
+import argparse
+import csv
+import json
+import os
 import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-api = "http://localhost:5000/api"
 
-url = f"{api}/benchmark"
-headers = {"Content-Type": "application/json", "x-token": "7PUv5IaUK0ty8H7iF_wAo3pwa94xPQ85LTwMpS4h1FU="}
-body = {
-    "challenge_name": "DO2025",
-    "indexes": [random.choice(range(500000)) for i in range(2000)]
+ENDPOINTS = {
+    "lab_experiment": ("POST", "/lab_experiment"),
+    "submit": ("POST", "/submit"),
+    "remained_budget": ("GET", "/remained_budget"),
+    "requested_ids": ("GET", "/requested_ids"),
+    "tasks": ("GET", "/tasks"),
 }
+DEFAULT_MIX = "lab_experiment=4,submit=1,remained_budget=10,requested_ids=3,tasks=2"
+
+
+def parse_mix(mix: str):
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name}, expected one of {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def read_tokens(teams_csv: str):
+    with open(teams_csv, newline="") as f:
+        return [row["secret_key"] for row in csv.DictReader(f)]
+
+
+def percentile(sorted_values: list, fraction: float):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def process_rss(pid: int):
+    """
+    Resident memory in bytes of a process and all of its children, e.g. the gunicorn
+    master and its workers. Linux only.
+    """
+    children = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children[parent].append(int(entry))
+
+    rss, pending = 0, [pid]
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                rss += int(f.read().split()[1]) * page_size
+        except OSError:
+            continue
+        pending.extend(children[current])
+    return rss
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, pid: int, interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.samples.append(process_rss(self.pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.samples.append(process_rss(self.pid))
+        return {"start": self.samples[0], "end": self.samples[-1], "peak": max(self.samples)}
+
+
+class LoadTest:
+    def __init__(self, api: str, tokens: list, weights: dict, compounds: int, lab_ids: int, submit_ids: int):
+        self.api = api.rstrip("/")
+        self.tokens = tokens
+        self.names = list(weights)
+        self.weights = list(weights.values())
+        self.compounds = compounds
+        self.lab_ids = lab_ids
+        self.submit_ids = submit_ids
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.results = defaultdict(list)
+
+    def _session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _body(self, name: str, rng: random.Random):
+        if name == "lab_experiment":
+            return {"ids": rng.sample(range(self.compounds), self.lab_ids)}
+        if name == "submit":
+            return {"ids": rng.sample(range(self.compounds), self.submit_ids)}
+        return None
+
+    def request(self, rng: random.Random):
+        name = rng.choices(self.names, self.weights)[0]
+        method, path = ENDPOINTS[name]
+        headers = {"X-TOKEN": rng.choice(self.tokens)}
+        body = self._body(name, rng)
+        start = time.perf_counter()
+        try:
+            response = self._session().request(method, self.api + path, json=body, headers=headers, timeout=60)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        latency = time.perf_counter() - start
+        with self.lock:
+            self.results[name].append((status, latency))
+
+    def run(self, concurrency: int, duration: float, total_requests: int = None, seed: int = 0):
+        deadline = time.monotonic() + duration
+        remaining = [total_requests]
+
+        def worker(index: int):
+            rng = random.Random(seed + index)
+            while time.monotonic() < deadline:
+                if total_requests is not None:
+                    with self.lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                self.request(rng)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(worker, range(concurrency)))
+        return time.perf_counter() - start
+
+    def budget(self):
+        """
+        Budget of the first team before the run. Once the teams run out of tokens or
+        benchmarks, lab_experiment and submit only measure their 400 error path.
+        """
+        response = self._session().get(self.api + ENDPOINTS["remained_budget"][1],
+                                       headers={"X-TOKEN": self.tokens[0]}, timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def report(self, elapsed: float):
+        def is_error(status):
+            return status is None or status >= 400
+
+        def latency_percentiles(samples, prefix=""):
+            latencies = sorted(latency for _, latency in samples)
+            return {f"{prefix}p{int(fraction * 100)}_ms": percentile(latencies, fraction) * 1000 if latencies else None
+                    for fraction in (0.50, 0.95, 0.99)}
+
+        def summarize(samples):
+            statuses = defaultdict(int)
+            for status, _ in samples:
+                statuses[str(status)] += 1
+            successes = [sample for sample in samples if not is_error(sample[0])]
+            errors = [sample for sample in samples if is_error(sample[0])]
+            return {
+                "requests": len(samples),
+                "throughput": len(samples) / elapsed if elapsed else 0,
+                # latencies of successful requests; errors are cheaper and reported on their own
+                **latency_percentiles(successes),
+                **latency_percentiles(errors, prefix="error_"),
+                "error_rate": len(errors) / len(samples) if samples else 0,
+                "rate_limited": statuses.get("429", 0),
+                "statuses": dict(statuses),
+            }
+
+        endpoints = {name: summarize(samples) for name, samples in sorted(self.results.items())}
+        total = summarize([sample for samples in self.results.values() for sample in samples])
+        return {"elapsed": elapsed, "total": total, "endpoints": endpoints}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
 
 if __name__ == "__main__":
-    response = requests.post(url, json=body, headers=headers)
+    parser = argparse.ArgumentParser(description="Drive the team endpoints with many synthetic teams.")
+    parser.add_argument("--api", default="http://localhost:5000/api")
+    parser.add_argument("--teams", required=True, help="teams.csv written by synthetic.py or challenge.py")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"Relative weights of the endpoints, default {DEFAULT_MIX}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--compounds", type=int, default=1_000_000, help="Ids are drawn from range(compounds)")
+    parser.add_argument("--lab-ids", type=int, default=1000, help="Ids per /lab_experiment request")
+    parser.add_argument("--submit-ids", type=int, default=3000, help="Ids per /submit request")
+    parser.add_argument("--server-pid", type=int, help="gunicorn master pid, to report the server RSS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    load_test = LoadTest(args.api, read_tokens(args.teams), args.mix, args.compounds, args.lab_ids, args.submit_ids)
+    budget = load_test.budget()
+    print(f"budget of the first team: {budget['available_tokens']} tokens, "
+          f"{budget['available_benchmarks']} benchmarks")
+    sampler = MemorySampler(args.server_pid) if args.server_pid else None
+    if sampler:
+        sampler.start()
+    elapsed = load_test.run(args.concurrency, args.duration, args.requests, args.seed)
+
+    results = load_test.report(elapsed)
+    results["budget"] = budget
+    results["server_rss"] = sampler.stop() if sampler else None
+    results["revision"] = git_revision()
+    results["config"] = {key: value for key, value in vars(args).items() if key not in ("teams", "output")}
+
+    total = results["total"]
+    print(f"{'endpoint':<16}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'errors':>10}{'err p50':>10}{'err p95':>10}{'429':>8}")
+    for name, summary in [*results["endpoints"].items(), ("total", total)]:
+        print(f"{name:<16}{summary['requests']:>10}{summary['throughput']:>10.1f}"
+              f"{summary['p50_ms'] or 0:>10.1f}{summary['p95_ms'] or 0:>10.1f}{summary['p99_ms'] or 0:>10.1f}"
+              f"{summary['error_rate']:>10.2%}{summary['error_p50_ms'] or 0:>10.1f}"
+              f"{summary['error_p95_ms'] or 0:>10.1f}{summary['rate_limited']:>8}")
+    if results["server_rss"]:
+        print(f"server RSS: {results['server_rss']['start'] / 2 ** 20:.0f} MB -> "
+              f"{results['server_rss']['end'] / 2 ** 20:.0f} MB (peak {results['server_rss']['peak'] / 2 ** 20:.0f} MB)")
 
-    print("Response:", response.json())
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
@@ -1,76 +1,50 @@
-import time
+import argparse
+
 import requests
 
-api = "http://localhost:5000/api"
 HEADERS = {"Content-Type": "application/json", "X-API-KEY": "DeepOriginAdmin"}
 
-TEAM_NAMES = ["DeepThought1", "DeepThought2"]
-
 
-def create_challenge():
-    url = f"{api}/challenges"
-    body = {"title": "DO2025", "description": "Test"}
-    response = requests.post(url, json=body, headers=HEADERS, verify=False)
+def get_or_create_challenge(api, title):
+    response = requests.get(f"{api}/challenges", params={"title": title}, headers=HEADERS, verify=False)
+    if response.status_code != 404:
+        response.raise_for_status()
+        return response.json()["id"]
 
+    body = {"title": title, "description": "Test"}
+    response = requests.post(f"{api}/challenges", json=body, headers=HEADERS, verify=False)
     response.raise_for_status()
     return response.json()["challenge_id"]
 
 
-def create_team(name):
-    url = f"{api}/teams"
-    body = {"name": name}
-    response = requests.post(url, json=body, headers=HEADERS, verify=False)
-
+def create_teams(api, challenge_id, names=None, count=None, prefix=None, generate_mappings=True):
+    body = {"challenge_id": challenge_id, "generate_mappings": generate_mappings}
+    if names:
+        body["names"] = names
+    else:
+        body["count"] = count
+        body["prefix"] = prefix
+    response = requests.post(f"{api}/teams/bulk", json=body, headers=HEADERS, verify=False)
     response.raise_for_status()
-    return response.json()["team_id"], response.json()["password"]
-
-
-def create_task(team_id, challenge_id):
-    url = f"{api}/tasks"
-    body = {"team_id": team_id, "challenge_id": challenge_id}
-    response = requests.post(url, json=body, headers=HEADERS, verify=False)
-
-    response.raise_for_status()
-    return response.json()["task_id"]
-
-
-def login(team_name, password):
-    url = f"{api}/login"
-    body = {"name": team_name, "password": password}
-    response = requests.post(url, json=body, headers={"Content-Type": "application/json"})
-    response.raise_for_status()
-    return response.json()["secret_key"]
+    return response.content
 
 
 if __name__ == "__main__":
-    challenge_id = create_challenge()
-    secrets = []
-
-    for team_name in TEAM_NAMES:
-        team_id, team_pass = create_team(team_name)
-        time.sleep(3)  # Increased delay
-
-        # Retry mechanism for create_task
-        for attempt in range(3):
-            try:
-                create_task(team_id, challenge_id)
-                break
-            except requests.exceptions.ConnectionError:
-                wait_time = 2 ** attempt
-                print(f"Task creation failed. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-        else:
-            print("Failed after 3 retries.")
-
-        time.sleep(3)
-
-        team_secret_key = login(team_name, team_pass)
-        secrets.append(
-            f"Team: {team_name}\nID: {team_id}\nPassword: {team_pass}\nSecret Key: {team_secret_key}\n{'*' * 50}\n")
-
-        time.sleep(2)
-
-    with open("secrets.txt", "w") as f:
-        f.writelines(secrets)
-
-    print("Secrets saved to secrets.txt")
+    parser = argparse.ArgumentParser(description="Provision the challenge teams and their tasks in one request.")
+    parser.add_argument("--api", default="http://localhost:5000/api")
+    parser.add_argument("--challenge", default="DO2025", help="Title of the challenge, created if missing")
+    parser.add_argument("--names", nargs="+", help="Team names")
+    parser.add_argument("--count", type=int, default=2, help="Number of teams to create when --names is not given")
+    parser.add_argument("--prefix", default="DeepThought")
+    parser.add_argument("--no-mappings", action="store_true", help="Do not generate the id mappings")
+    parser.add_argument("--output", default="secrets.csv")
+    args = parser.parse_args()
+
+    challenge_id = get_or_create_challenge(args.api, args.challenge)
+    credentials = create_teams(args.api, challenge_id, names=args.names, count=args.count, prefix=args.prefix,
+                               generate_mappings=not args.no_mappings)
+
+    with open(args.output, "wb") as f:
+        f.write(credentials)
+
+    print(f"Secrets saved to {args.output}")
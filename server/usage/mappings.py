@@ -0,0 +1,45 @@
+import argparse
+import csv
+import os
+import secrets
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.repositories import id_mappings
+
+
+def read_team_names(args):
+    if args.teams:
+        return args.teams
+    with open(args.secrets, newline="") as f:
+        return [row["name"] for row in csv.DictReader(f)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate or verify the per-team id mappings of a challenge.")
+    parser.add_argument("--path", default="datasets/DO2025", help="Challenge dataset directory with labels_df.pkl")
+    team_names = parser.add_mutually_exclusive_group(required=True)
+    team_names.add_argument("--teams", nargs="+", help="Team names")
+    team_names.add_argument("--secrets", help="CSV written by challenge.py")
+    parser.add_argument("--seed", type=int, help="Challenge seed; a random one is drawn and printed when omitted")
+    parser.add_argument("--workers", type=int, help="Processes, all cores by default")
+    parser.add_argument("--verify", action="store_true", help="Only verify the existing mapping files")
+    args = parser.parse_args()
+
+    names = read_team_names(args)
+    label_ids = id_mappings.get_label_ids(pd.read_pickle(os.path.join(args.path, "labels_df.pkl")))
+    start = time.perf_counter()
+
+    if args.verify:
+        for name in names:
+            id_mappings.verify_id_mapping(args.path, name, label_ids)
+        print(f"Verified {len(names)} mappings in {time.perf_counter() - start:.2f}s")
+    else:
+        seed = args.seed if args.seed is not None else secrets.randbits(64)
+        id_mappings.generate_id_mappings(label_ids, names, args.path, seed, workers=args.workers)
+        print(f"Generated {len(names)} mappings of {len(label_ids)} ids in {time.perf_counter() - start:.2f}s")
+        print(f"Seed: {seed} (stored next to every mapping, it regenerates missing files on the server)")
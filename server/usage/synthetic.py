@@ -0,0 +1,126 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.repositories import id_mappings
+
+
+def generate_labels(compounds: int, rng: np.random.Generator):
+    """
+    labels_df with dense compound ids in shuffled order and docking-like scores.
+    """
+    ids = rng.permutation(compounds).astype(np.int64)
+    scores = rng.normal(-7.0, 1.5, compounds).round(3)
+    return pd.DataFrame({"score": scores}, index=pd.Index(ids))
+
+
+def generate_top1000(labels_df: pd.DataFrame):
+    return labels_df.nlargest(min(1000, len(labels_df)), "score")[[]]
+
+
+def generate_datasets(path: str, compounds: int, team_names: list, seed: int, workers: int = None):
+    """
+    Writes labels_df.pkl, top1000_df.pkl and the id mappings of every team into path.
+    """
+    rng = np.random.default_rng(seed)
+    labels_df = generate_labels(compounds, rng)
+    os.makedirs(path, exist_ok=True)
+    labels_df.to_pickle(os.path.join(path, "labels_df.pkl"))
+    generate_top1000(labels_df).to_pickle(os.path.join(path, "top1000_df.pkl"))
+    label_ids = id_mappings.get_label_ids(labels_df)
+    id_mappings.generate_id_mappings(label_ids, team_names, path, seed, workers=workers)
+    return label_ids
+
+
+def populate_database(db, challenge_name: str, team_names: list, label_ids: np.ndarray, purchased: int,
+                      tokens: int, seed: int, benchmarks: int = None):
+    """
+    Creates the challenge, the teams and their tasks, each task with `purchased` ids already
+    bought. Returns (name, team_id, task_id, password, secret_key) rows.
+    """
+    from pymongo import UpdateOne
+
+    from app.config.core import settings
+    from app.repositories.challanges_repository import ChallengeRepository
+    from app.repositories.task_repository import TaskRepository
+    from app.repositories.teams_repository import TeamsRepository
+
+    challenge_repository = ChallengeRepository(db)
+    challenge_id = challenge_repository.create_challenge(challenge_name, "Synthetic challenge", tokens,
+                                                         benchmarks or settings.CHALLENGE_BENCHMARKS)
+    teams = TeamsRepository(db).create_teams(team_names)
+    task_ids = TaskRepository(db).create_tasks([team_id for team_id, *_ in teams], challenge_id)
+
+    if purchased:
+        rng = np.random.default_rng(seed)
+        db.get_collection("tasks").bulk_write([
+            UpdateOne({"_id": task["_id"]}, {"$set": {
+                "requested_correct_ids": rng.choice(label_ids, purchased, replace=False).tolist(),
+                "available_tokens": tokens - purchased * settings.CORRECT_LABEL_PRICE,
+            }})
+            for task in db.get_collection("tasks").find({"challenge_id": challenge_id}, {"_id": 1})
+        ], ordered=False)
+
+    return [(name, team_id, task_id, password, secret_key)
+            for (team_id, name, password, secret_key), task_id in zip(teams, task_ids)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a challenge-scale synthetic dataset for benchmarking.")
+    parser.add_argument("--output", help="Datasets directory, a new temporary directory by default")
+    parser.add_argument("--challenge", default="DO2025")
+    parser.add_argument("--compounds", type=int, default=1_000_000, help="Size of labels_df, 1k to 10M")
+    parser.add_argument("--teams", type=int, default=10, help="Number of teams, 2 to 5k")
+    parser.add_argument("--prefix", default="Synthetic")
+    parser.add_argument("--purchased", type=int, default=0, help="Ids already bought by every team")
+    parser.add_argument("--tokens", type=int, default=10 ** 12,
+                        help="Initial tokens of every team, large by default so load tests do not run out")
+    parser.add_argument("--benchmarks", type=int, default=10 ** 9,
+                        help="Free benchmarks of every team, large by default so load tests do not run out")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Processes, all cores by default")
+    parser.add_argument("--backend", choices=["mongo", "memory", "none"], default="mongo",
+                        help="mongo populates the database configured by the MONGO_* settings, point it at a "
+                             "throwaway local Mongo. memory writes an in-memory database snapshot next to the "
+                             "files. none only writes the dataset files")
+    args = parser.parse_args()
+
+    if args.purchased > args.compounds:
+        parser.error("--purchased cannot exceed --compounds")
+    output = args.output or tempfile.mkdtemp(prefix="do2025-synthetic-")
+    team_names = [f"{args.prefix}{i}" for i in range(1, args.teams + 1)]
+
+    start = time.perf_counter()
+    label_ids = generate_datasets(os.path.join(output, args.challenge), args.compounds, team_names, args.seed,
+                                  workers=args.workers)
+    print(f"Wrote {args.compounds} compounds and {args.teams} mappings in {time.perf_counter() - start:.2f}s")
+
+    if args.backend != "none":
+        if args.backend == "memory":
+            os.environ["STORAGE_BACKEND"] = "memory"
+            os.environ["MEMORY_DB_SNAPSHOT"] = os.path.join(output, "db.pkl")
+        from app.models.db import create_collections, create_indexes, get_database
+
+        start = time.perf_counter()
+        create_collections()
+        create_indexes()
+        rows = populate_database(get_database(), args.challenge, team_names, label_ids, args.purchased,
+                                 args.tokens, args.seed, args.benchmarks)
+        with open(os.path.join(output, "teams.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "team_id", "task_id", "password", "secret_key"])
+            writer.writerows(rows)
+        if args.backend == "memory":
+            get_database().save()
+            print(f"STORAGE_BACKEND=memory MEMORY_DB_SNAPSHOT={os.environ['MEMORY_DB_SNAPSHOT']}")
+        print(f"Created {len(rows)} teams and tasks in {time.perf_counter() - start:.2f}s")
+
+    print(f"DATASETS_PATH={output}")